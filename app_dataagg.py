@@ -1,12 +1,17 @@
 import os
+import asyncio
 import duckdb
+import pandas as pd
 
 from shiny import App, Inputs, Outputs, Session, render, ui, req, reactive
 from shinywidgets import render_plotly
 import faicons as fa
 
-from utils.data_processing import load_csv, run_tests, export_data, radiacion
+from utils.data_processing import load_csv, run_file_tests, run_frame_tests, export_data, radiacion, load_to_duckdb
 from utils.plots import graficado_plotly, graficado_radiacion
+from utils.instrumentation import StageProfiler
+from utils.config import load_instrumentation_settings
+from utils.tasks import run_in_thread, run_cancellable, threadsafe_progress
 from components.panels import panel_subir_archivo, panel_pruebas_archivo, panel_cargar_datos
 from components.helper_text import info_modal
 
@@ -48,80 +53,142 @@ def server(input: Inputs, output: Outputs, session: Session):
     # rv_nans    = reactive.Value(None)
     # rv_nats    = reactive.Value(None)
     rv_types   = reactive.Value(None)
+    rv_tiempos = reactive.Value(None)
 
     @reactive.Effect
     @reactive.event(input.info_icon)
     def _():
         info_modal()
 
-    # full pipeline on file upload
-    @output
-    @render.ui
-    @reactive.event(input.archivo)
-    async def upload_status():
-        archivo = req(input.archivo())[0]["datapath"]
-        total_steps = 5
+    def _tabla_radiacion(df):
+        df_rad = radiacion(df)
+        df_rad.index = df_rad.index.tz_localize(None)
+        return (
+            df_rad.reset_index()
+                .sort_values("TIMESTAMP")
+                .rename(columns={"index": "TIMESTAMP"})
+        )
+
+    # full pipeline on file upload (runs in the worker pool)
+    @reactive.extended_task
+    async def procesar_archivo(archivo, nombre_archivo):
+        total_steps = 6
+
+        settings = load_instrumentation_settings()
+        prof = StageProfiler(trace_memory=settings["trace_memory"])
+
+        def medido(nombre, func):
+            def _run(*args):
+                with prof.stage(nombre, len(args[0]) if isinstance(args[0], pd.DataFrame) else None):
+                    return func(*args)
+            return _run
 
         with ui.Progress(min=0, max=total_steps) as p:
-            p.set(1, message="1/4 leyendo y formateando el archivo…")
-            df = load_csv(archivo)
-            rv_loaded.set(df)
-
-            p.set(2, message="2/4 ejecutando pruebas de integridad…")
-            tests = run_tests(df, archivo)
-            rv_tests.set(tests)
-
-            p.set(3, message="3/4 generando gráficos interactivos…")
-            rv_plotly.set(graficado_plotly(archivo))
-            rv_rad_plot.set(graficado_radiacion(archivo))
-
-            p.set(4, message="4/5 analizando tipos de columnas…")
-            rv_types.set(
-                df.dtypes
-                    .rename_axis("Columna")
-                    .reset_index(name="Tipo")
+            p.set(0, message="leyendo y formateando el archivo…")
+
+            async def etapa(func, *args, mensaje):
+                resultado = await run_in_thread(func, *args)
+                p.inc(1, message=mensaje)
+                return resultado
+
+            async def juntas(*etapas):
+                # con trace_memory las etapas corren una tras otra: el pico de
+                # tracemalloc es global y sólo vale para etapas que corren solas
+                if settings["trace_memory"]:
+                    return [await e for e in etapas]
+                return await asyncio.gather(*etapas)
+
+            async def etapas_df():
+                df = await etapa(load_csv, archivo, prof, mensaje="archivo leído")
+                # pruebas sobre el df, gráficos y radiación en paralelo
+                tests, fig_plotly, fig_rad, df_rad = await juntas(
+                    etapa(run_frame_tests, df, prof, mensaje="pruebas de integridad listas"),
+                    etapa(medido("grafico_variables", graficado_plotly), df, mensaje="gráfico interactivo listo"),
+                    etapa(medido("grafico_radiacion", graficado_radiacion), df, mensaje="gráfico de radiación listo"),
+                    etapa(medido("tabla_radiacion", _tabla_radiacion), df, mensaje="radiación solar calculada"),
+                )
+                return df, tests, fig_plotly, fig_rad, df_rad
+
+            # las pruebas de archivo no necesitan el df: corren junto con la lectura
+            file_tests, (df, frame_tests, fig_plotly, fig_rad, df_rad) = await juntas(
+                etapa(run_file_tests, archivo, prof, mensaje="pruebas de archivo listas"),
+                etapas_df(),
             )
 
-            p.set(5, message="5/5 calculando radiación solar…")
-            df_rad = radiacion(df)
-            df_rad.index = df_rad.index.tz_localize(None)
-            rv_rad.set(
-                df_rad.reset_index()
-                    .sort_values("TIMESTAMP")
-                    .rename(columns={"index": "TIMESTAMP"})
+        if settings["log_path"]:
+            await run_in_thread(prof.write_jsonl, settings["log_path"], archivo=nombre_archivo)
+
+        return {
+            "df": df,
+            "tests": {**file_tests, **frame_tests},
+            "plotly": fig_plotly,
+            "rad_plot": fig_rad,
+            "types": df.dtypes.rename_axis("Columna").reset_index(name="Tipo"),
+            "rad": df_rad,
+            "tiempos": prof.to_frame(),
+        }
+
+    # load into DuckDB (runs in the worker pool, cancellable between chunks)
+    @reactive.extended_task
+    async def cargar_bd(archivo):
+        df_load = await run_in_thread(export_data, archivo)
+        with ui.Progress(min=1, max=len(df_load)) as p:
+            p.set(message="Iniciando carga…")
+            return await run_cancellable(
+                load_to_duckdb, df_load, "esolmet.db",
+                progress=threadsafe_progress(p),
             )
 
-            # p.set(6, message="6/7 localizando NaN y NaT…")
-            # rv_nans.set(_df_nans(df_fmt, archivo))
-            # rv_nats.set(_df_nats(df_fmt))
+    @reactive.Effect
+    @reactive.event(input.archivo)
+    def _():
+        archivo = req(input.archivo())[0]
+        # un archivo nuevo cancela el procesamiento y la carga en curso
+        procesar_archivo.cancel()
+        cargar_bd.cancel()
+        procesar_archivo(archivo["datapath"], archivo["name"])
+
+    @reactive.Effect
+    def _():
+        if procesar_archivo.status() != "success":
+            return
+        res = procesar_archivo.result()
+        rv_loaded.set(res["df"])
+        rv_tests.set(res["tests"])
+        rv_plotly.set(res["plotly"])
+        rv_rad_plot.set(res["rad_plot"])
+        rv_types.set(res["types"])
+        rv_rad.set(res["rad"])
+        rv_tiempos.set(res["tiempos"])
+
+    @reactive.Effect
+    @reactive.event(input.btn_load)
+    def _():
+        cargar_bd(req(input.archivo())[0]["datapath"])
 
-    # load into DuckDB
     @output
     @render.ui
-    @reactive.event(input.btn_load)
-    async def load_status():
-        df_load = export_data(req(input.archivo())[0]["datapath"])
-        with ui.Progress(min=1, max=len(df_load)) as p:
-            p.set(message="Iniciando carga…")
-            con = duckdb.connect('esolmet.db')
-            con.execute("""
-                CREATE TABLE IF NOT EXISTS lecturas (
-                    fecha TIMESTAMP,
-                    variable VARCHAR,
-                    valor DOUBLE,
-                    PRIMARY KEY (fecha, variable)
-                );
-            """)
-            con.execute("BEGIN TRANSACTION;")
-            chunk = 5000
-            for i in range(0, len(df_load), chunk):
-                c = df_load.iloc[i : i + chunk]
-                con.register('tmp', c)
-                con.execute("INSERT INTO lecturas SELECT * FROM tmp;")
-                p.set(i + chunk, message=f"Cargando filas {i+1}-{min(i+chunk, len(df_load))}…")
-            con.execute("COMMIT;")
-            con.close()
-        return ui.tags.div("Carga completada", class_="text-success")
+    def upload_status():
+        status = procesar_archivo.status()
+        if status == "running":
+            return ui.tags.div("Procesando archivo…", class_="text-muted")
+        if status == "error":
+            return ui.tags.div(f"Error al procesar el archivo: {procesar_archivo.error.get()}", class_="text-danger")
+        return None
+
+    @output
+    @render.ui
+    def load_status():
+        status = cargar_bd.status()
+        if status == "running":
+            return ui.tags.div("Cargando en base de datos…", class_="text-muted")
+        if status == "success":
+            return ui.tags.div("Carga completada", class_="text-success")
+        if status == "error":
+            return ui.tags.div(f"Error en la carga: {cargar_bd.error.get()}", class_="text-danger")
+        if status == "cancelled":
+            return ui.tags.div("Carga cancelada", class_="text-warning")
+        return None
 
     # delete DB file
     @output
@@ -164,6 +231,10 @@ def server(input: Inputs, output: Outputs, session: Session):
     def df_radiacion():
         return rv_rad.get()
 
+    @render.data_frame
+    def df_tiempos():
+        return rv_tiempos.get()
+
     # @render.data_frame
     # def df_nans():
     #     return rv_nans.get()
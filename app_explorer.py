@@ -15,7 +15,16 @@ from utils.config import load_settings
 from shinywidgets import render_widget
 from shiny import ui
 import pandas as pd 
-from utils.wind_rose import  create_wind_rose_period_plotly, create_wind_rose_by_speed_period,create_seasonal_wind_roses_by_speed_plotly,  run_wind_simulation, create_seasonal_generation_figures, create_generation_heatmap,create_monthly_energy_figure, create_wind_rose_by_speed_day,create_wind_rose_by_speed_night, create_typical_wind_heatmap,create_seasonal_wind_heatmaps
+from utils.wind_rose import generation_summary, create_seasonal_generation_figures, create_generation_heatmap, create_monthly_energy_figure, create_wind_rose_period_cube, create_wind_rose_by_speed_cube, create_seasonal_wind_roses_cube, create_wind_rose_by_speed_day_night, typical_heatmap_figure, seasonal_heatmap_figures, sam_wind_csv_text, compare_turbines, create_turbine_comparison_figure
+from utils.wind_sweep import run_sweep, parse_grid_values, create_sweep_tornado_figure, create_sweep_sensitivity_figure
+from utils.wind_years import run_multi_year_simulation, create_annual_energy_figure
+from utils.wind_farm import search_farm_layouts, create_layout_figure
+from utils.sim_jobs import simulation_queue
+from utils.sim_store import cached_wind_simulation, data_version, simulation_key, load_sim_result, purge_sim_results
+from utils.power_curve import quick_estimate
+from utils.wind_cube import load_or_build_wind_cube
+from utils.solar import solar_elevation
+from utils.typical_year import typical_year
 import duckdb
 import PySAM.Windpower as wp
 import json
@@ -40,6 +49,15 @@ esolmet.index = pd.to_datetime(esolmet.index)
 esolmet = esolmet.sort_index()
 print(">>> Columnas en esolmet:", list(esolmet.columns))
 
+# Histograma precalculado dirección × velocidad para las rosas de viento
+wind_cube = load_or_build_wind_cube(conn, esolmet, dir_col="wd", speed_col="ws")
+# Versión de los datos para los resultados de simulación guardados en
+# DuckDB (utils.sim_store); los de datos anteriores se purgan
+esolmet_version = data_version(esolmet)
+purge_sim_results(conn, keep=esolmet_version)
+# Elevación solar de cada registro, calculada una sola vez (rosas día/noche)
+esolmet_elevation = solar_elevation(esolmet.index, latitude, longitude, gmt)
+
 
 
 app_ui = ui.page_fillable(
@@ -73,125 +91,484 @@ def server(input, output, session):
     @render_widget
     def wind_rose_period():
         start_date, end_date = input.wind_date_range()
-        return create_wind_rose_period_plotly(
-            esolmet,
-            dir_col='wd',
-            start=start_date,
-            end=end_date
+        return create_wind_rose_period_cube(wind_cube, start=start_date, end=end_date)
+
+    @reactive.Calc
+    def day_night_roses():
+        # día y noche astronómicos, ambas rosas en una sola pasada; van sobre
+        # el DataFrame y no sobre el cubo porque el cubo es horario y la
+        # salida/puesta del sol parte las horas
+        start, end = input.wind_period_range()
+        return create_wind_rose_by_speed_day_night(
+            esolmet, esolmet_elevation, dir_col="wd", speed_col="ws", start=start, end=end
         )
 
     @render_widget
     def wind_rose_day():
-        start, end = input.wind_period_range()
-        return create_wind_rose_by_speed_day(
-            esolmet,
-            dir_col="wd",
-            speed_col="ws",
-            dir_bins=16,
-            speed_bins=None,   
-            start=start,
-            end=end,
-        )
+        return day_night_roses()["Día"]
 
     @render_widget
     def wind_rose_night():
-
-        start, end = input.wind_period_range()
-        return create_wind_rose_by_speed_night(
-            esolmet,
-            dir_col="wd",
-            speed_col="ws",
-            dir_bins=16,
-            speed_bins=None,
-            start=start,
-            end=end,
-        )
-
+        return day_night_roses()["Noche"]
 
     @render_widget
     def wind_rose_speed_period():
         start_date, end_date = input.wind_date_range()
-        return create_wind_rose_by_speed_period(
-            esolmet, dir_col='wd', speed_col='ws',
-            start=start_date, end=end_date
-        )
+        return create_wind_rose_by_speed_cube(wind_cube, start=start_date, end=end_date)
+
+    @reactive.Calc
+    def seasonal_roses():
+        # las cuatro rosas estacionales se calculan juntas una vez por cambio de años
+        start_year, end_year = input.season_year_range()
+        return create_seasonal_wind_roses_cube(wind_cube, f"{start_year}-01-01", f"{end_year}-12-31")
 
     @render_widget
     def rose_spring():
-        start_year, end_year = input.season_year_range()
-        df = esolmet.loc[f"{start_year}-01-01": f"{end_year}-12-31"]
-        figs = create_seasonal_wind_roses_by_speed_plotly(df)
-        return figs["Primavera"]
+        return seasonal_roses()["Primavera"]
 
     @render_widget
     def rose_summer():
-        start_year, end_year = input.season_year_range()
-        df = esolmet.loc[f"{start_year}-01-01": f"{end_year}-12-31"]
-        figs = create_seasonal_wind_roses_by_speed_plotly(df)
-        return figs["Verano"]
+        return seasonal_roses()["Verano"]
 
     @render_widget
     def rose_autumn():
-        start_year, end_year = input.season_year_range()
-        df = esolmet.loc[f"{start_year}-01-01": f"{end_year}-12-31"]
-        figs = create_seasonal_wind_roses_by_speed_plotly(df)
-        return figs["Otoño"]
+        return seasonal_roses()["Otoño"]
 
     @render_widget
     def rose_winter():
-        start_year, end_year = input.season_year_range()
-        df = esolmet.loc[f"{start_year}-01-01": f"{end_year}-12-31"]
-        figs = create_seasonal_wind_roses_by_speed_plotly(df)
-        return figs["Invierno"]
+        return seasonal_roses()["Invierno"]
     
+    @reactive.Calc
+    def wind_typical_year():
+        # acumuladores día del año × hora del rango: los comparten el heatmap
+        # anual y los cuatro estacionales
+        start, end = input.heatmap_speed_range()
+        return typical_year(esolmet, "ws", start, end)
+
+    @reactive.Calc
+    def wind_seasonal_heatmaps():
+        return seasonal_heatmap_figures(wind_typical_year())
+
     @output
     @render_widget
     def heatmap_wind_annual():
-        start, end = input.heatmap_speed_range()
-        return create_typical_wind_heatmap(esolmet, speed_col="ws", start=start, end=end)
+        return typical_heatmap_figure(wind_typical_year())
+
     @output
     @render_widget
     def heatmap_wind_primavera():
-        start, end = input.heatmap_speed_range()
-        return create_seasonal_wind_heatmaps(esolmet, "ws", start=start, end=end)["Primavera"]
-
+        return wind_seasonal_heatmaps()["Primavera"]
 
     @output
     @render_widget
     def heatmap_wind_verano():
-        start, end = input.heatmap_speed_range()
-        return create_seasonal_wind_heatmaps(esolmet, "ws", start=start, end=end)["Verano"]
+        return wind_seasonal_heatmaps()["Verano"]
 
     @output
     @render_widget
     def heatmap_wind_otono():
-        start, end = input.heatmap_speed_range()
-        return create_seasonal_wind_heatmaps(esolmet, "ws", start=start, end=end)["Otoño"]
+        return wind_seasonal_heatmaps()["Otoño"]
 
     @output
     @render_widget
     def heatmap_wind_invierno():
-        start, end = input.heatmap_speed_range()
-        return create_seasonal_wind_heatmaps(esolmet, "ws", start=start, end=end)["Invierno"]
+        return wind_seasonal_heatmaps()["Invierno"]
 
+    @reactive.Calc
+    def quick_estimates():
+        # todas las turbinas de una vez: cambiar de modelo sólo elige la fila
+        return quick_estimate(
+            esolmet,
+            ini_path="configuration.ini",
+            wind_turbine_file="wind_simulation/wind-turbines.json",
+            wind_inputs_file="wind_simulation/windpower-inputs.json",
+        )
+
+    @output
+    @render.table
+    def quick_estimate_table():
+        estimates = quick_estimates()
+        if "error" in estimates:
+            return pd.DataFrame([{"Resultado": "Error", "Valor": estimates["error"]}])
+        summary = estimates["summary"]
+        row = summary[summary["Turbina"] == input.turbine_model()]
+        if row.empty:
+            return None
+        return pd.DataFrame({
+            "Resultado": ["Energía anual estimada (kWh)", "Factor de capacidad estimado (%)"],
+            "Valor": [
+                f"{row['Energía anual estimada (kWh)'].iloc[0]:,.0f}",
+                f"{row['Factor de capacidad estimado (%)'].iloc[0]:.1f}",
+            ],
+        })
+
+    # la simulación corre en segundo plano (utils.sim_jobs): el servidor
+    # sigue atendiendo otras pestañas y sesiones mientras tanto
+    sim_job = reactive.value(None)
+
+    @ui.bind_task_button(button_id="run_sim")
+    @reactive.extended_task
+    async def sim_task(job, stored=None):
+        if stored is not None:
+            return stored
+        return await job.result_async()
+
+    @reactive.effect
+    @reactive.event(input.run_sim)
+    def _start_sim():
+        turbine = input.turbine_model()
+        # un resultado ya guardado (de esta u otra sesión) no pasa por la cola
+        try:
+            stored = load_sim_result(conn, simulation_key(turbine, esolmet_version))
+        except Exception:
+            stored = None
+        if stored is not None:
+            sim_job.set(None)
+            sim_task.invoke(None, stored)
+            return
+
+        job = simulation_queue().submit(
+            cached_wind_simulation,
+            con=conn,
+            esolmet_df=esolmet,
+            turbine_name=turbine,
+            ini_path="configuration.ini",
+            wind_turbine_file="wind_simulation/wind-turbines.json",
+            wind_inputs_file="wind_simulation/windpower-inputs.json",
+            version=esolmet_version,
+        )
+        sim_job.set(job)
+        sim_task.invoke(job)
+
+    @reactive.effect
+    @reactive.event(input.cancel_sim)
+    def _cancel_sim():
+        cancel_job(sim_job.get())
+
+    def job_status(job):
+        # estado de un trabajo de la cola (se refresca mientras no termina)
+        queue = simulation_queue()
+        if job is None:
+            return f"Simulaciones en el servidor: {queue.depth()}"
+        if not job.done():
+            reactive.invalidate_later(0.5)
+        ahead = queue.position(job)
+        estado = f"En cola ({ahead} antes)" if ahead else f"{job.message} ({job.progress:.0%})"
+        return f"{estado} · simulaciones en el servidor: {queue.depth()}"
+
+    def cancel_job(job):
+        if job is not None and not job.done():
+            job.cancel()
+
+    @output
+    @render.text
+    def sim_status():
+        return job_status(sim_job.get())
 
     @reactive.Calc
     def sim_results():
-        n_clicks = input.run_sim()
-        if n_clicks is None or n_clicks == 0:
+        if sim_task.status() != "success":
             return None
+        return sim_task.result()
 
-        with reactive.isolate():
-            modelo = input.turbine_model()
+    @reactive.Calc
+    def gen_summary():
+        # un solo post-proceso de la serie horaria para todas las gráficas de producción
+        results = sim_results()
+        if results is None or "error" in results or results.get("gen") is None:
+            return None
+        return generation_summary(results["gen"])
 
-        return run_wind_simulation(
+    @reactive.Calc
+    def seasonal_figures():
+        summary = gen_summary()
+        if summary is None:
+            return None
+        return create_seasonal_generation_figures(summary)
+
+    compare_job = reactive.value(None)
+
+    @ui.bind_task_button(button_id="run_compare")
+    @reactive.extended_task
+    async def compare_task(job):
+        return await job.result_async()
+
+    @reactive.effect
+    @reactive.event(input.run_compare)
+    def _start_compare():
+        modelos = list(input.compare_models() or [])
+        job = simulation_queue().submit(
+            compare_turbines,
             esolmet_df=esolmet,
-            turbine_name=modelo,
+            turbine_names=modelos or None,
+            ini_path="configuration.ini",
+            wind_turbine_file="wind_simulation/wind-turbines.json",
+            wind_inputs_file="wind_simulation/windpower-inputs.json",
+        )
+        compare_job.set(job)
+        compare_task.invoke(job)
+
+    @reactive.effect
+    @reactive.event(input.cancel_compare)
+    def _cancel_compare():
+        cancel_job(compare_job.get())
+
+    @output
+    @render.text
+    def compare_status():
+        return job_status(compare_job.get())
+
+    @reactive.Calc
+    def compare_results():
+        if compare_task.status() != "success":
+            return None
+        return compare_task.result()
+
+    @output
+    @render.table
+    def compare_table():
+        results = compare_results()
+        if results is None:
+            return None
+        if "error" in results:
+            return pd.DataFrame([{"Resultado": "Error", "Valor": results["error"]}])
+        ranking = results["ranking"]
+        if results["errors"]:
+            fallidas = pd.DataFrame({"Turbina": list(results["errors"]),
+                                     "Error": list(results["errors"].values())})
+            ranking = pd.concat([ranking, fallidas], ignore_index=True)
+        return ranking
+
+    @output
+    @render_widget
+    def compare_monthly_plot():
+        results = compare_results()
+        if results is None or "error" in results or results["ranking"].empty:
+            return None
+        return create_turbine_comparison_figure(results["monthly"], results["ranking"])
+
+    multi_year_job = reactive.value(None)
+
+    @ui.bind_task_button(button_id="run_multi_year")
+    @reactive.extended_task
+    async def multi_year_task(job):
+        return await job.result_async()
+
+    @reactive.effect
+    @reactive.event(input.run_multi_year)
+    def _start_multi_year():
+        job = simulation_queue().submit(
+            run_multi_year_simulation,
+            esolmet,
+            input.turbine_model(),
+            ini_path="configuration.ini",
+            wind_turbine_file="wind_simulation/wind-turbines.json",
+            wind_inputs_file="wind_simulation/windpower-inputs.json",
+        )
+        multi_year_job.set(job)
+        multi_year_task.invoke(job)
+
+    @reactive.effect
+    @reactive.event(input.cancel_multi_year)
+    def _cancel_multi_year():
+        cancel_job(multi_year_job.get())
+
+    @output
+    @render.text
+    def multi_year_status():
+        return job_status(multi_year_job.get())
+
+    @reactive.Calc
+    def multi_year_results():
+        if multi_year_task.status() != "success":
+            return None
+        return multi_year_task.result()
+
+    @output
+    @render.table
+    def multi_year_summary():
+        results = multi_year_results()
+        if results is None:
+            return None
+        if "error" in results:
+            return pd.DataFrame([{"Resultado": "Error", "Valor": results["error"]}])
+        return pd.DataFrame({
+            "Resultado": list(results["summary"]),
+            "Valor": list(results["summary"].values()),
+        })
+
+    @output
+    @render.table
+    def multi_year_table():
+        results = multi_year_results()
+        if results is None or "error" in results:
+            return None
+        return results["years"]
+
+    @output
+    @render_widget
+    def multi_year_plot():
+        results = multi_year_results()
+        if results is None or "error" in results:
+            return None
+        return create_annual_energy_figure(results["years"], results["summary"])
+
+    farm_job = reactive.value(None)
+
+    @ui.bind_task_button(button_id="run_farm")
+    @reactive.extended_task
+    async def farm_task(job):
+        return await job.result_async()
+
+    @reactive.effect
+    @reactive.event(input.run_farm)
+    def _start_farm():
+        # búsqueda rápida y confirmación con PySAM en segundo plano
+        job = simulation_queue().submit(
+            search_farm_layouts,
+            esolmet,
+            input.turbine_model(),
+            int(input.farm_turbines() or 1),
+            wake_model=int(input.farm_wake_model()),
+            max_extent=float(input.farm_max_extent() or 0),
             ini_path="configuration.ini",
             wind_turbine_file="wind_simulation/wind-turbines.json",
             wind_inputs_file="wind_simulation/windpower-inputs.json",
-            output_csv="wind_simulation/sam_wind.csv",
         )
+        farm_job.set(job)
+        farm_task.invoke(job)
+
+    @reactive.effect
+    @reactive.event(input.cancel_farm)
+    def _cancel_farm():
+        cancel_job(farm_job.get())
+
+    @output
+    @render.text
+    def farm_status():
+        return job_status(farm_job.get())
+
+    @reactive.Calc
+    def farm_results():
+        if farm_task.status() != "success":
+            return None
+        return farm_task.result()
+
+    @output
+    @render.table
+    def farm_screen_table():
+        results = farm_results()
+        if results is None:
+            return None
+        if "error" in results:
+            return pd.DataFrame([{"Resultado": "Error", "Valor": results["error"]}])
+        return results["ranking"]
+
+    @output
+    @render.table
+    def farm_sam_table():
+        results = farm_results()
+        if results is None or "error" in results:
+            return None
+        if "error" in results["sam"]:
+            return pd.DataFrame([{"Resultado": "Error", "Valor": results["sam"]["error"]}])
+        return results["sam"]["results"]
+
+    @output
+    @render_widget
+    def farm_layout_plot():
+        results = farm_results()
+        if results is None or "error" in results or not results["layouts"]:
+            return None
+        x, y = results["layouts"][0]
+        return create_layout_figure(x, y, title="Mejor arreglo")
+
+    sweep_job = reactive.value(None)
+
+    @ui.bind_task_button(button_id="run_sweep")
+    @reactive.extended_task
+    async def sweep_task(job, error=None):
+        if error is not None:
+            return error
+        return await job.result_async()
+
+    @reactive.effect
+    @reactive.event(input.run_sweep)
+    def _start_sweep():
+        textos = {
+            "hub_height": input.sweep_hub_heights(),
+            "shear_exponent": input.sweep_shear(),
+            "loss_scale": input.sweep_losses(),
+        }
+        try:
+            grid = {k: parse_grid_values(v) for k, v in textos.items()}
+        except ValueError as e:
+            sweep_job.set(None)
+            sweep_task.invoke(None, {"error": str(e)})
+            return
+        # parámetros sin valores: se dejan como en la simulación normal
+        grid = {k: v for k, v in grid.items() if v}
+
+        # en segundo plano; al cancelar, lo simulado queda guardado y el
+        # siguiente barrido con la misma malla lo reanuda
+        job = simulation_queue().submit(
+            run_sweep,
+            esolmet,
+            input.turbine_model(),
+            grid,
+            ini_path="configuration.ini",
+            wind_turbine_file="wind_simulation/wind-turbines.json",
+            wind_inputs_file="wind_simulation/windpower-inputs.json",
+        )
+        sweep_job.set(job)
+        sweep_task.invoke(job)
+
+    @reactive.effect
+    @reactive.event(input.cancel_sweep)
+    def _cancel_sweep():
+        cancel_job(sweep_job.get())
+
+    @output
+    @render.text
+    def sweep_status():
+        return job_status(sweep_job.get())
+
+    @reactive.Calc
+    def sweep_results():
+        if sweep_task.status() != "success":
+            return None
+        return sweep_task.result()
+
+    @output
+    @render.table
+    def sweep_table():
+        results = sweep_results()
+        if results is None:
+            return None
+        if "error" in results:
+            return pd.DataFrame([{"Resultado": "Error", "Valor": results["error"]}])
+        return results["results"].dropna(axis=1, how="all")
+
+    @output
+    @render_widget
+    def sweep_tornado_plot():
+        results = sweep_results()
+        if results is None or "error" in results:
+            return None
+        return create_sweep_tornado_figure(results["results"], results["base"])
+
+    @output
+    @render_widget
+    def sweep_sensitivity_plot():
+        results = sweep_results()
+        if results is None or "error" in results:
+            return None
+        return create_sweep_sensitivity_figure(results["results"], results["base"])
+
+    @render.download(filename="sam_wind.csv")
+    def download_sam_wind():
+        # exportación explícita del recurso en formato SAM (alturas de medición)
+        yield sam_wind_csv_text(esolmet, ini_path="configuration.ini")
 
     @output
     @render.table
@@ -233,7 +610,8 @@ def server(input, output, session):
         if "error" in results:
             return ui.tags.pre(results["error"])
 
-        monthly = results.get("Monthly Energy")
+        summary = gen_summary()
+        monthly = summary if summary is not None else results.get("Monthly Energy")
         if monthly is None:
             return ui.tags.pre("No hay datos mensuales disponibles.")
 
@@ -243,9 +621,8 @@ def server(input, output, session):
             return ui.tags.pre(str(e))
 
         return fig
-    @output
-    @render.ui
-    def seasonal_primavera():
+
+    def seasonal_figure(season):
         results = sim_results()
         if results is None:
             return None
@@ -253,66 +630,33 @@ def server(input, output, session):
         if "error" in results:
             return ui.tags.pre(results["error"])
 
-        gen_array = results.get("gen")
-        if gen_array is None:
+        figures = seasonal_figures()
+        if figures is None:
             return ui.tags.pre("No hay datos horarios de generación.")
+        return figures[season]
 
-        figures = create_seasonal_generation_figures(gen_array)
-        return figures["Primavera"]
+    @output
+    @render.ui
+    def seasonal_primavera():
+        return seasonal_figure("Primavera")
 
 
     @output
     @render.ui
     def seasonal_verano():
-        results = sim_results()
-        if results is None:
-            return None
-
-        if "error" in results:
-            return ui.tags.pre(results["error"])
-
-        gen_array = results.get("gen")
-        if gen_array is None:
-            return ui.tags.pre("No hay datos horarios de generación.")
-
-        figures = create_seasonal_generation_figures(gen_array)
-        return figures["Verano"]
+        return seasonal_figure("Verano")
 
 
     @output
     @render.ui
     def seasonal_otono():
-        results = sim_results()
-        if results is None:
-            return None
-
-        if "error" in results:
-            return ui.tags.pre(results["error"])
-
-        gen_array = results.get("gen")
-        if gen_array is None:
-            return ui.tags.pre("No hay datos horarios de generación.")
-
-        figures = create_seasonal_generation_figures(gen_array)
-        return figures["Otoño"]
+        return seasonal_figure("Otoño")
 
 
     @output
     @render.ui
     def seasonal_invierno():
-        results = sim_results()
-        if results is None:
-            return None
-
-        if "error" in results:
-            return ui.tags.pre(results["error"])
-
-        gen_array = results.get("gen")
-        if gen_array is None:
-            return ui.tags.pre("No hay datos horarios de generación.")
-
-        figures = create_seasonal_generation_figures(gen_array)
-        return figures["Invierno"]
+        return seasonal_figure("Invierno")
 
 
     @output
@@ -325,10 +669,10 @@ def server(input, output, session):
         if "error" in results:
             return ui.tags.pre(results["error"])
 
-        gen_array = results.get("gen")
-        if gen_array is None:
+        summary = gen_summary()
+        if summary is None:
             return ui.tags.pre("No hay datos horarios de generación.")
 
-        fig = create_generation_heatmap(gen_array)
+        fig = create_generation_heatmap(summary)
         return fig
 app = App(app_ui, server)
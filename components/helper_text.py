@@ -48,7 +48,9 @@ def info_modal():
                         tags.li("Codificación UTF-8 válida."),
                         tags.li("Sin valores NaT en columnas de fecha."),
                         tags.li("Sin duplicados en filas."),
-                        tags.li("Columnas con tipo float cuando corresponde.")
+                        tags.li("Columnas con tipo float cuando corresponde."),
+                        tags.li("Marcas de tiempo en una malla regular (se ajustan las cercanas y los huecos quedan como NaN)."),
+                        tags.li("Reloj del registrador sin desfase respecto al mediodía solar de la GHI.")
                     )
                 ),
                 tags.li(
@@ -2,11 +2,21 @@ from shiny import ui
 from shinywidgets import output_widget
 import faicons as fa  
 from utils.data_processing import load_esolmet_data
+from utils.config import load_turbine_settings, load_wind_farm_settings
+from utils.turbine_catalog import load_turbine_catalog
+from utils.wind_farm import WAKE_MODELS
 import pandas as pd
 import duckdb
 import os
 import duckdb
 db_path = "esolmet.db"
+
+# modelos del catálogo de turbinas (wind-turbines.json + biblioteca de SAM)
+TURBINE_MODELS = load_turbine_catalog(
+    "wind_simulation/wind-turbines.json",
+    library=load_turbine_settings()["library"],
+).names
+
 if os.path.exists(db_path):
     try:
         conn = duckdb.connect(database=db_path)
@@ -159,25 +169,23 @@ def panel_eolica():
                             ui.input_select("turbine_model",
                                 "Selecciona modelo de turbina:",
 
-                                choices=[
-                                    "GE 1.5MWsle",
-                                    "Nordex S77 1.5MW",
-                                    "Fuhrlander FL 1.5MW",
-                                    "BergeyExcel 8.9kW-7 (Distributed)",
-                                    "NREL2019COE 100kW-27.6(Distributed)",
-                                    "VestasV29 225kW-29(Distributed)",
-                                    "NREL2019COE 20kW-12.4(Distributed)",
-                                    "VestasV47 660kW-47",
-                                    "Ampair600 0.73kW-1.7"
-                                ]
+                                choices=TURBINE_MODELS
                             ),
                             class_="mb-3"
                         ),
+                        # vista previa sin PySAM (curva de potencia sobre el año típico)
+                        ui.h5("Estimación rápida"),
+                        ui.output_table("quick_estimate_table"),
                         ui.div(
-                            ui.input_action_button("run_sim", "Ejecutar simulación"),
-                            class_="mb-4"
+                            ui.input_task_button("run_sim", "Ejecutar simulación",
+                                                 label_busy="Simulando..."),
+                            ui.input_action_button("cancel_sim", "Cancelar", class_="ms-2"),
+                            ui.download_button("download_sam_wind", "Descargar recurso SAM (CSV)",
+                                               class_="ms-2"),
+                            class_="mb-2"
                             # 2) Botón para “correr” la simulación con PySAM
                         ),
+                        ui.div(ui.output_text("sim_status"), class_="text-muted mb-4"),
                             # Salidas de texto donde mostraremos los resultados
                         ui.h4("Resultados de la simulación"),
                         ui.output_table("prod_results_table"),
@@ -221,6 +229,110 @@ def panel_eolica():
                             output_widget("prod_heatmap")
                         ),
                     ),
+
+                # comparación de todas (o algunas) turbinas contra el mismo recurso
+                ui.row(
+                    ui.column(
+                        12,
+                        ui.h4("Comparación de turbinas", class_="mt-4 mb-2"),
+                        ui.input_selectize("compare_models",
+                            "Turbinas a comparar (vacío = todas):",
+                            choices=TURBINE_MODELS,
+                            multiple=True,
+                        ),
+                        ui.input_task_button("run_compare", "Comparar turbinas",
+                            label_busy="Simulando...",
+                        ),
+                        ui.input_action_button("cancel_compare", "Cancelar", class_="ms-2"),
+                        ui.div(ui.output_text("compare_status"), class_="text-muted mt-2"),
+                        ui.output_table("compare_table", class_="mt-3"),
+                        ui.h5("Rendimiento mensual (kWh/kW)"),
+                        output_widget("compare_monthly_plot"),
+                    ),
+                ),
+
+                # variabilidad interanual: un recurso por año del registro
+                ui.row(
+                    ui.column(
+                        4,
+                        ui.h4("Variabilidad interanual", class_="mt-4 mb-2"),
+                        ui.input_task_button("run_multi_year", "Simular año por año (P50/P90)",
+                            label_busy="Simulando...",
+                        ),
+                        ui.input_action_button("cancel_multi_year", "Cancelar", class_="ms-2"),
+                        ui.div(ui.output_text("multi_year_status"), class_="text-muted mt-2"),
+                        ui.output_table("multi_year_summary", class_="mt-3"),
+                        ui.output_table("multi_year_table"),
+                    ),
+                    ui.column(
+                        8,
+                        ui.h5("Energía anual por año", class_="mt-4"),
+                        output_widget("multi_year_plot"),
+                    ),
+                ),
+
+                # parque: búsqueda rápida de arreglos y confirmación con PySAM
+                ui.row(
+                    ui.column(
+                        4,
+                        ui.h4("Parque eólico", class_="mt-4 mb-2"),
+                        ui.input_numeric("farm_turbines", "Número de turbinas:", value=4, min=1, max=30),
+                        ui.input_numeric("farm_max_extent", "Extensión máxima del terreno (m, 0 = sin límite):",
+                            value=load_wind_farm_settings()["max_extent"] or 0, min=0, step=100,
+                        ),
+                        ui.input_select("farm_wake_model", "Modelo de estela (SAM):",
+                            choices={str(k): v for k, v in WAKE_MODELS.items()},
+                        ),
+                        ui.input_task_button("run_farm", "Buscar arreglos",
+                            label_busy="Buscando...",
+                        ),
+                        ui.input_action_button("cancel_farm", "Cancelar", class_="ms-2"),
+                        ui.div(ui.output_text("farm_status"), class_="text-muted mt-2"),
+                    ),
+                    ui.column(
+                        8,
+                        ui.h5("Mejor arreglo", class_="mt-4"),
+                        output_widget("farm_layout_plot"),
+                    ),
+                ),
+                ui.row(
+                    ui.column(
+                        12,
+                        ui.h5("Búsqueda rápida (estela de Jensen)"),
+                        ui.output_table("farm_screen_table"),
+                        ui.h5("Tres mejores arreglos en PySAM"),
+                        ui.output_table("farm_sam_table"),
+                    ),
+                ),
+
+                # barrido de sensibilidad de la turbina seleccionada
+                ui.row(
+                    ui.column(
+                        4,
+                        ui.h4("Análisis de sensibilidad", class_="mt-4 mb-2"),
+                        ui.input_text("sweep_hub_heights",
+                            "Alturas de buje (m, vacío = la de la turbina):", value=""),
+                        ui.input_text("sweep_shear",
+                            "Exponentes de cortante:", value="0.10, 0.14, 0.20"),
+                        ui.input_text("sweep_losses",
+                            "Factores de pérdidas:", value="0.5, 1, 1.5"),
+                        ui.input_task_button("run_sweep", "Ejecutar barrido",
+                            label_busy="Simulando...",
+                        ),
+                        ui.input_action_button("cancel_sweep", "Cancelar", class_="ms-2"),
+                        ui.div(ui.output_text("sweep_status"), class_="text-muted mt-2"),
+                    ),
+                    ui.column(
+                        8,
+                        ui.h5("Tornado (energía anual)", class_="mt-4"),
+                        output_widget("sweep_tornado_plot"),
+                        ui.h5("Sensibilidad por parámetro"),
+                        output_widget("sweep_sensitivity_plot"),
+                    ),
+                ),
+                ui.row(
+                    ui.column(12, ui.output_table("sweep_table", class_="mt-3")),
+                ),
             ),
         ),
     )
@@ -275,7 +387,11 @@ def panel_pruebas_archivo():
                 output_widget("plot_radiacion"),
                 full_screen=True,
             ),
-            col_widths=[5, 7],
+            ui.card(
+                ui.card_header("Tiempos de procesamiento por etapa"),
+                ui.output_data_frame("df_tiempos"),
+            ),
+            col_widths=[5, 7, 12],
         ),
         
     )
@@ -35,3 +35,160 @@ def load_settings(path: str = "configuration.ini"):
     air_pressure_height    = sec.getfloat("air_pressure_height",    fallback=10.0)
     return (variables, latitude, longitude, gmt, name, alias, site_id, data_tz, wind_speed_height, air_temperature_height, air_pressure_height)
 
+
+
+def load_gap_settings(path: str = "configuration.ini") -> dict:
+    """
+    Lee la sección [gap_filling] del INI y devuelve:
+      - interp_max_hours: float  (huecos que se interpolan)
+      - max_gap_hours: float | None (huecos mayores se quedan en NaN; vacío = sin límite)
+      - circular: list[str]       (columnas angulares, p. ej. wd)
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    sec = config["gap_filling"] if "gap_filling" in config else {}
+    max_gap = sec.get("max_gap_hours", "168").strip()
+    return {
+        "interp_max_hours": float(sec.get("interp_max_hours", 3)),
+        "max_gap_hours": float(max_gap) if max_gap else None,
+        "circular": ast.literal_eval(sec.get("circular", '["wd"]')),
+    }
+
+
+def load_grid_settings(path: str = "configuration.ini") -> dict:
+    """
+    Lee la sección [time_grid] del INI y devuelve:
+      - interval: str | None      (p. ej. "10min"; None = detectar)
+      - tolerance_seconds: float
+      - label: str                ("end" o "start")
+      - smoothing_days: int
+      - offset_threshold_minutes: float
+      - correct_clock: bool
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    sec = config["time_grid"] if "time_grid" in config else config["DEFAULT"]
+    return {
+        "interval": sec.get("interval", "").strip() or None,
+        "tolerance_seconds": sec.getfloat("tolerance_seconds", fallback=60.0),
+        "label": sec.get("label", fallback="end"),
+        "smoothing_days": sec.getint("smoothing_days", fallback=15),
+        "offset_threshold_minutes": sec.getfloat("offset_threshold_minutes", fallback=10.0),
+        "correct_clock": sec.getboolean("correct_clock", fallback=False),
+    }
+
+
+def load_instrumentation_settings(path: str = "configuration.ini") -> dict:
+    """
+    Lee la sección [instrumentation] del INI y devuelve:
+      - trace_memory: bool
+      - log_path: str | None  (JSON lines con los tiempos por etapa)
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    sec = config["instrumentation"] if "instrumentation" in config else config["DEFAULT"]
+    return {
+        "trace_memory": sec.getboolean("trace_memory", fallback=False),
+        "log_path": sec.get("log_path", "").strip() or None,
+    }
+
+
+def load_wind_resource_settings(path: str = "configuration.ini") -> dict:
+    """
+    Lee la sección [wind_resource] del INI y devuelve:
+      - shear_law: str            ("power" o "log")
+      - shear_exponent: float     (ley de potencia)
+      - roughness_length: float   (z0 en m, ley logarítmica)
+      - cache_dir: str | None     (caché en disco del año típico)
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    sec = config["wind_resource"] if "wind_resource" in config else config["DEFAULT"]
+    return {
+        "shear_law": sec.get("shear_law", fallback="power").strip(),
+        "shear_exponent": sec.getfloat("shear_exponent", fallback=0.14),
+        "roughness_length": sec.getfloat("roughness_length", fallback=0.03),
+        "cache_dir": sec.get("cache_dir", "").strip() or None,
+    }
+
+
+def load_turbine_settings(path: str = "configuration.ini") -> dict:
+    """
+    Lee la sección [turbines] del INI y devuelve:
+      - library: str | None  (CSV de turbinas de SAM que se agrega al catálogo)
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    sec = config["turbines"] if "turbines" in config else config["DEFAULT"]
+    return {
+        "library": sec.get("library", "").strip() or None,
+    }
+
+
+def load_sweep_settings(path: str = "configuration.ini") -> dict:
+    """
+    Lee la sección [sweep] del INI y devuelve:
+      - results_dir: str | None  (resultados parciales de los barridos;
+        None = no se guardan y no se pueden reanudar)
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    sec = config["sweep"] if "sweep" in config else config["DEFAULT"]
+    return {
+        "results_dir": sec.get("results_dir", "").strip() or None,
+    }
+
+
+def load_multi_year_settings(path: str = "configuration.ini") -> dict:
+    """
+    Lee la sección [multi_year] del INI y devuelve:
+      - first_year: int        (primer año que se simula)
+      - min_coverage: float    (fracción mínima de horas con ws medido
+        para incluir un año)
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    sec = config["multi_year"] if "multi_year" in config else config["DEFAULT"]
+    return {
+        "first_year": sec.getint("first_year", fallback=2010),
+        "min_coverage": sec.getfloat("min_coverage", fallback=0.8),
+    }
+
+
+def load_wind_farm_settings(path: str = "configuration.ini") -> dict:
+    """
+    Lee la sección [wind_farm] del INI (búsqueda rápida de arreglos) y
+    devuelve:
+      - spacings: list[float]      (separaciones candidatas, en diámetros)
+      - rotation_step: float       (paso de giro de las mallas, °)
+      - dir_bins: int              (sectores de dirección)
+      - thrust_coefficient: float  (Ct del modelo de Jensen)
+      - wake_decay: float          (apertura de la estela, k)
+      - max_extent: float | None   (distancia máxima entre turbinas, m;
+                                    None = sin límite)
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    sec = config["wind_farm"] if "wind_farm" in config else config["DEFAULT"]
+    return {
+        "spacings": [float(v) for v in ast.literal_eval(sec.get("spacings", "[3, 4, 5, 6, 7, 8, 10]"))],
+        "rotation_step": sec.getfloat("rotation_step", fallback=15.0),
+        "dir_bins": sec.getint("dir_bins", fallback=36),
+        "thrust_coefficient": sec.getfloat("thrust_coefficient", fallback=0.8),
+        "wake_decay": sec.getfloat("wake_decay", fallback=0.075),
+        "max_extent": sec.getfloat("max_extent", fallback=0.0) or None,
+    }
+
+
+def load_background_settings(path: str = "configuration.ini") -> dict:
+    """
+    Lee la sección [background] del INI y devuelve:
+      - max_jobs: int  (simulaciones que corren a la vez en el servidor;
+        las demás esperan en cola)
+    """
+    config = configparser.ConfigParser()
+    config.read(path)
+    sec = config["background"] if "background" in config else config["DEFAULT"]
+    return {
+        "max_jobs": max(1, sec.getint("max_jobs", fallback=2)),
+    }
@@ -1,7 +1,11 @@
 import pandas as pd
 import numpy as np
+import duckdb
 import validation_tools as vt
-from utils.config import load_settings
+from utils.config import load_settings, load_grid_settings
+from utils.time_grid import regularize_time_grid
+from utils.instrumentation import StageProfiler, stage
+from utils.wind_cube import update_wind_cube
 import glob
 
 variables, latitude, longitude, gmt, name, alias_map, \
@@ -24,7 +28,7 @@ def _detect_csv(filepath: str) -> dict:
     return {"encoding": encoding, "skiprows": skiprows}
 
 
-def load_csv(filepath: str) -> pd.DataFrame:
+def load_csv(filepath: str, profiler: StageProfiler | None = None) -> pd.DataFrame:
     """
     Carga y limpia CSV en formato ancho:
       1. lee y parsea fechas
@@ -35,115 +39,165 @@ def load_csv(filepath: str) -> pd.DataFrame:
       6. convierte todas las columnas (índice excluido) a float
       7. elimina duplicados (basados en índice y valores)
       8. ordena por TIMESTAMP
-      9. limpieza para columnas de radiación (dni, ghi, dhi):
+      9. regulariza la malla temporal (ajuste de marcas, desfase de reloj,
+         huecos como NaN explícitos); el reporte queda en df.attrs["time_grid"]
+     10. limpieza para columnas de radiación (dni, ghi, dhi):
          - valores < 0 → 0
          - valores > constante solar → NaN
          - valores > 0 cuando altitud solar ≤ 0 → NaN
+    Si se pasa un StageProfiler, cada paso queda medido como una etapa.
     """
     # 1. leer crudo 
-    params = _detect_csv(filepath)
-    common_kwargs = dict(
-        filepath_or_buffer=filepath,
-        skiprows=params["skiprows"],
-        dayfirst=False,
-        low_memory=False,
-        encoding=params["encoding"],
-    )
-    try:
-        df = pd.read_csv(**common_kwargs)
-    except UnicodeDecodeError:
-        common_kwargs["encoding"] = "latin-1"
-        df = pd.read_csv(**common_kwargs)
+    with stage(profiler, "parse") as etapa:
+        params = _detect_csv(filepath)
+        common_kwargs = dict(
+            filepath_or_buffer=filepath,
+            skiprows=params["skiprows"],
+            dayfirst=False,
+            low_memory=False,
+            encoding=params["encoding"],
+        )
+        try:
+            df = pd.read_csv(**common_kwargs)
+        except UnicodeDecodeError:
+            common_kwargs["encoding"] = "latin-1"
+            df = pd.read_csv(**common_kwargs)
+        etapa["filas_salida"] = len(df)
 
     # 2. renombrar primera columna a TIMESTAMP y definir datetime
-    df.rename(columns={df.columns[0]: "TIMESTAMP"}, inplace=True)
-    df["TIMESTAMP"] = pd.to_datetime(df["TIMESTAMP"], errors="coerce")
-
-    # 3. descartar filas con TIMESTAMP NaT y filtrar año mínimo
-    df = df.dropna(subset=["TIMESTAMP"])
-    df = df[df["TIMESTAMP"].dt.year >= MIN_YEAR]
-
-    # 4. definir TIMESTAMP como índice datetime
-    df.set_index("TIMESTAMP", inplace=True)
-
-    # 5. renombrar variables usando el diccionario
-    if alias_map:
-        df.rename(columns=alias_map, inplace=True)
-        
-
-    # 6. eliminar columnas innecesarias:
-    #    - cualquier columna que empiece con 'Unnamed'
-    #    - 'RECORD'
-    #    - columnas que no estén en ALLOWED_VARS
-    drop_cols = [
-        c for c in df.columns
-        if c.startswith("Unnamed") or c == "RECORD" or c not in ALLOWED_VARS
-    ]
-    df.drop(columns=drop_cols, inplace=True)
+    with stage(profiler, "fechas", len(df)) as etapa:
+        df.rename(columns={df.columns[0]: "TIMESTAMP"}, inplace=True)
+        df["TIMESTAMP"] = pd.to_datetime(df["TIMESTAMP"], errors="coerce")
+        etapa["filas_salida"] = len(df)
+
+    with stage(profiler, "filtrado", len(df)) as etapa:
+        # 3. descartar filas con TIMESTAMP NaT y filtrar año mínimo
+        df = df.dropna(subset=["TIMESTAMP"])
+        df = df[df["TIMESTAMP"].dt.year >= MIN_YEAR]
+
+        # 4. definir TIMESTAMP como índice datetime
+        df.set_index("TIMESTAMP", inplace=True)
+
+        # 5. renombrar variables usando el diccionario
+        if alias_map:
+            df.rename(columns=alias_map, inplace=True)
+
+        # 6. eliminar columnas innecesarias:
+        #    - cualquier columna que empiece con 'Unnamed'
+        #    - 'RECORD'
+        #    - columnas que no estén en ALLOWED_VARS
+        drop_cols = [
+            c for c in df.columns
+            if c.startswith("Unnamed") or c == "RECORD" or c not in ALLOWED_VARS
+        ]
+        df.drop(columns=drop_cols, inplace=True)
+        etapa["filas_salida"] = len(df)
 
     # 7. convertir todas las columnas (ahora que el índice es TIMESTAMP) a numérico (float)
-    for col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+    with stage(profiler, "numerico", len(df)) as etapa:
+        for col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        etapa["filas_salida"] = len(df)
 
     # 8. eliminar duplicados (basados en índice y valores de columnas)
-    df = df[~df.index.duplicated(keep="first")]  # quita duplicados en el índice
-    df = df.drop_duplicates()                     # quita duplicados completos de filas
+    with stage(profiler, "duplicados", len(df)) as etapa:
+        df = df[~df.index.duplicated(keep="first")]  # quita duplicados en el índice
+        df = df.drop_duplicates()                     # quita duplicados completos de filas
+        etapa["filas_salida"] = len(df)
 
     # 9. ordenar por TIMESTAMP
-    df.sort_index(inplace=True)
-
-    # 10. limpieza para columnas de radiación (solo dni, ghi, dhi)
+    with stage(profiler, "orden", len(df)) as etapa:
+        df.sort_index(inplace=True)
+        etapa["filas_salida"] = len(df)
+
+    # 10. malla temporal regular
+    with stage(profiler, "malla_temporal", len(df)) as etapa:
+        grid = load_grid_settings()
+        df, grid_report = regularize_time_grid(
+            df,
+            longitude=longitude,
+            gmt=gmt,
+            interval=pd.Timedelta(grid["interval"]) if grid["interval"] else None,
+            tolerance=pd.Timedelta(seconds=grid["tolerance_seconds"]),
+            label=grid["label"],
+            smoothing_days=grid["smoothing_days"],
+            threshold_minutes=grid["offset_threshold_minutes"],
+            correct_clock=grid["correct_clock"],
+        )
+        etapa["filas_salida"] = len(df)
+
+    # 11. limpieza para columnas de radiación (solo dni, ghi, dhi)
     rad_cols = [col for col in ["dni", "ghi", "dhi", "uv"] if col in df.columns]
     if rad_cols:
-        # a) valores < 0 → 0
-        df[rad_cols] = df[rad_cols].clip(lower=0)
+        with stage(profiler, "limpieza", len(df)) as etapa:
+            # a) valores < 0 → 0
+            df[rad_cols] = df[rad_cols].clip(lower=0)
 
-        # b) volver NaN los datos de rad_cols que excedan la constante solar
-        for col in rad_cols:
-            df.loc[df[col] > SOLAR_CONSTANT, col] = np.nan
+            # b) volver NaN los datos de rad_cols que excedan la constante solar
+            for col in rad_cols:
+                df.loc[df[col] > SOLAR_CONSTANT, col] = np.nan
+            etapa["filas_salida"] = len(df)
 
         # c) agregar columnas 'solar_altitude' y 'radiation' usando vt.detect_radiation
-        df = vt.detect_radiation(df)
+        with stage(profiler, "geometria_solar", len(df)) as etapa:
+            df = vt.detect_radiation(df)
+            etapa["filas_salida"] = len(df)
 
-        # d) para horas nocturnas (solar_altitude ≤ 0), convertir rad_cols > 0 a NaN
-        noche = df["solar_altitude"] <= 0
-        for col in rad_cols:
-            df.loc[noche & (df[col] > 0), col] = np.nan
+        with stage(profiler, "limpieza_nocturna", len(df)) as etapa:
+            # d) para horas nocturnas (solar_altitude ≤ 0), convertir rad_cols > 0 a NaN
+            noche = df["solar_altitude"] <= 0
+            for col in rad_cols:
+                df.loc[noche & (df[col] > 0), col] = np.nan
 
-        # e) eliminar columnas auxiliares antes de finalizar
-        df.drop(columns=["solar_altitude", "radiation"], inplace=True)
+            # e) eliminar columnas auxiliares antes de finalizar
+            df.drop(columns=["solar_altitude", "radiation"], inplace=True)
+            etapa["filas_salida"] = len(df)
 
+    df.attrs["time_grid"] = grid_report
     return df
 
 
-def run_tests(df: pd.DataFrame, filepath: str) -> dict:
+def run_file_tests(filepath: str, profiler: StageProfiler | None = None) -> dict:
     """
-    Ejecuta pruebas de calidad sobre el DataFrame y usa filepath para la extensión y el encoding.
+    Pruebas que sólo dependen del archivo (extensión y encoding).
     """
-    # 1) pruebas sobre el archivo 
-    ext = vt.detect_endswith(filepath)
-    enc = vt.detect_encoding(filepath)
-
-    # 2) integridad de datos en el df
-    nans = vt.detect_nans(df)
-    nats = vt.detect_nats(df)
-    dups = vt.detect_duplicates(df)
-
-    # 3) radiación nocturna
-    if "TIMESTAMP" in df.columns:
-        df_radiacion = df.copy()
-        df_radiacion["TIMESTAMP"] = pd.to_datetime(df_radiacion["TIMESTAMP"], errors="coerce")
-        df_radiacion = df_radiacion.set_index("TIMESTAMP")
-        rad = vt.detect_radiation(df_radiacion, config_path="configuration.ini")["radiation"].all()
-    else:
-        rad = False
-
-    # 4) tipos de columna
-    tipos = vt.detect_dtype({col: "float64" for col in df.columns if col != "TIMESTAMP"}, df)
-
+    with stage(profiler, "prueba_extension"):
+        ext = vt.detect_endswith(filepath)
+    with stage(profiler, "prueba_encoding"):
+        enc = vt.detect_encoding(filepath)
     return {
-        "Extensión .CSV":         ext,
-        "Encoding UTF-8":         enc,
+        "Extensión .CSV": ext,
+        "Encoding UTF-8": enc,
+    }
+
+
+def run_frame_tests(df: pd.DataFrame, profiler: StageProfiler | None = None) -> dict:
+    """
+    Pruebas de calidad sobre el DataFrame ya cargado.
+    """
+    # 1) integridad de datos en el df
+    with stage(profiler, "prueba_nans", len(df)):
+        nans = vt.detect_nans(df)
+    with stage(profiler, "prueba_nats", len(df)):
+        nats = vt.detect_nats(df)
+    with stage(profiler, "prueba_duplicados", len(df)):
+        dups = vt.detect_duplicates(df)
+
+    # 2) radiación nocturna
+    with stage(profiler, "prueba_radiacion", len(df)):
+        if "TIMESTAMP" in df.columns:
+            df_radiacion = df.copy()
+            df_radiacion["TIMESTAMP"] = pd.to_datetime(df_radiacion["TIMESTAMP"], errors="coerce")
+            df_radiacion = df_radiacion.set_index("TIMESTAMP")
+            rad = vt.detect_radiation(df_radiacion, config_path="configuration.ini")["radiation"].all()
+        else:
+            rad = False
+
+    # 3) tipos de columna
+    with stage(profiler, "prueba_tipos", len(df)):
+        tipos = vt.detect_dtype({col: "float64" for col in df.columns if col != "TIMESTAMP"}, df)
+
+    pruebas = {
         # "Sin valores NaN":        nans,
         "Sin valores NaT":        nats,
         "Sin valores duplicados": dups,
@@ -151,6 +205,22 @@ def run_tests(df: pd.DataFrame, filepath: str) -> dict:
         # "Radiación cero en noche": rad
     }
 
+    # 4) malla temporal (sólo si el df viene de load_csv)
+    grid_report = df.attrs.get("time_grid")
+    if grid_report and grid_report.get("intervalo") is not None:
+        tramos = grid_report["tramos_reloj"]
+        pruebas["Marcas en malla regular"] = grid_report["marcas_fuera_de_malla"] == 0
+        pruebas["Reloj sin desfase"] = all(t["desfase_min"] == 0 for t in tramos)
+
+    return pruebas
+
+
+def run_tests(df: pd.DataFrame, filepath: str, profiler: StageProfiler | None = None) -> dict:
+    """
+    Ejecuta pruebas de calidad sobre el DataFrame y usa filepath para la extensión y el encoding.
+    """
+    return {**run_file_tests(filepath, profiler), **run_frame_tests(df, profiler)}
+
 
 def export_data(filepath: str) -> pd.DataFrame:
     """
@@ -159,6 +229,8 @@ def export_data(filepath: str) -> pd.DataFrame:
       - convierte TIMESTAMP a string 'YYYY-MM-DD HH:MM:SS'
       - melt a ['fecha','variable','valor']
       - garantiza tipo float en 'valor'
+      - descarta los valores NaN: los huecos de la malla regular de
+        load_csv no se guardan (un archivo posterior puede rellenarlos)
     """
     # 1. cargar
     df = load_csv(filepath)
@@ -181,9 +253,64 @@ def export_data(filepath: str) -> pd.DataFrame:
     long_df.drop_duplicates(subset=['fecha', 'variable'], inplace=True)
     long_df['valor'] = long_df['valor'].astype(float)
 
+    # 6. sin filas vacías en 'lecturas'
+    long_df = long_df.dropna(subset=['valor']).reset_index(drop=True)
+
     return long_df
 
 
+def load_to_duckdb(
+    df_load: pd.DataFrame,
+    db_path: str = "esolmet.db",
+    chunk: int = 5000,
+    progress=None,
+    cancel_event=None,
+) -> int:
+    """
+    Inserta el DF largo de export_data en la tabla 'lecturas' en bloques,
+    dentro de una sola transacción:
+      - progress(i, message): callback opcional para reportar avance
+      - cancel_event: threading.Event opcional; si se activa se hace ROLLBACK
+    Al terminar actualiza el cubo de rosas de viento de los días cargados
+    y borra los resultados de simulación guardados.
+    Devuelve el número de filas insertadas (0 si se canceló).
+    """
+    con = duckdb.connect(db_path)
+    try:
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS lecturas (
+                fecha TIMESTAMP,
+                variable VARCHAR,
+                valor DOUBLE,
+                PRIMARY KEY (fecha, variable)
+            );
+        """)
+        con.execute("BEGIN TRANSACTION;")
+        try:
+            for i in range(0, len(df_load), chunk):
+                if cancel_event is not None and cancel_event.is_set():
+                    con.execute("ROLLBACK;")
+                    return 0
+                c = df_load.iloc[i : i + chunk]
+                con.register('tmp', c)
+                con.execute("INSERT INTO lecturas SELECT * FROM tmp;")
+                if progress is not None:
+                    progress(i + chunk, message=f"Cargando filas {i+1}-{min(i+chunk, len(df_load))}…")
+            con.execute("COMMIT;")
+        except Exception:
+            con.execute("ROLLBACK;")
+            raise
+        # el cubo de rosas de viento sólo se recalcula en los días cargados
+        if len(df_load):
+            update_wind_cube(con, df_load["fecha"].min(), df_load["fecha"].max())
+            # los resultados guardados de simulaciones (utils.sim_store) son
+            # de los datos anteriores
+            con.execute("DROP TABLE IF EXISTS simulaciones;")
+    finally:
+        con.close()
+    return len(df_load)
+
+
 def radiacion(df: pd.DataFrame, rad_columns=None) -> pd.DataFrame:
     """
     Extrae datos de radiación durante la noche (altura solar ≤ 0):
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+
+class DataWindow:
+    """
+    Ventana de fechas sobre un DataFrame con índice datetime ordenado, sin
+    copiar datos: los extremos se ubican por búsqueda binaria en el índice y
+    las columnas se entregan como vistas NumPy de sólo ese rango.
+
+    Uso:
+        win = DataWindow(esolmet, "2020-01-01", "2020-12-31", whole_days=True)
+        ws = win.values("ws")          # vista float64 del rango
+        df = win.frame("ws", "wd")     # DataFrame con sólo esas columnas
+
+    - start/end: como df.loc[start:end] (ambos inclusive); con
+      whole_days=True `end` incluye todo su día.
+    - Acepta también otra DataWindow, que se restringe al nuevo rango.
+    """
+
+    def __init__(self, df, start=None, end=None, whole_days: bool = False):
+        if isinstance(df, DataWindow):
+            base, lo, hi = df._df, df._lo, df._hi
+        else:
+            base = df
+            if not isinstance(base.index, pd.DatetimeIndex):
+                base = base.set_axis(pd.to_datetime(base.index))
+            if not base.index.is_monotonic_increasing:
+                base = base.sort_index()
+            lo, hi = 0, len(base)
+        index = base.index
+        if start is not None and start != "":
+            lo = max(lo, int(index.searchsorted(pd.Timestamp(start), side="left")))
+        if end is not None and end != "":
+            end = pd.Timestamp(end)
+            if whole_days:
+                stop = index.searchsorted(end.normalize() + pd.Timedelta(days=1), side="left")
+            else:
+                stop = index.searchsorted(end, side="right")
+            hi = min(hi, int(stop))
+        self._df = base
+        self._lo = lo
+        self._hi = max(hi, lo)
+
+    def __len__(self) -> int:
+        return self._hi - self._lo
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    @property
+    def positions(self) -> slice:
+        """Posiciones del rango en el DataFrame base (para alinear arreglos externos)."""
+        return slice(self._lo, self._hi)
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return self._df.index[self._lo:self._hi]
+
+    @property
+    def columns(self) -> pd.Index:
+        return self._df.columns
+
+    def data_range(self) -> tuple[pd.Timestamp, pd.Timestamp]:
+        """Primera y última marca de todo el DataFrame base (para mensajes de error)."""
+        return self._df.index.min(), self._df.index.max()
+
+    def values(self, col: str, dtype=float) -> np.ndarray:
+        """Vista NumPy de la columna `col` en el rango (sin copia si ya es del tipo pedido)."""
+        return self._df[col].iloc[self._lo:self._hi].to_numpy(dtype=dtype)
+
+    def frame(self, *cols: str) -> pd.DataFrame:
+        """DataFrame nuevo con sólo las columnas `cols` del rango."""
+        return pd.DataFrame({c: self.values(c, dtype=None) for c in cols}, index=self.index)
+
+
+def as_window(data, start=None, end=None, whole_days: bool = False) -> DataWindow:
+    """Envuelve un DataFrame (o restringe una DataWindow) al rango [start, end]."""
+    return DataWindow(data, start, end, whole_days=whole_days)
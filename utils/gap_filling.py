@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+# códigos de la matriz de banderas que devuelve fill_gaps
+FLAG_MEASURED = 0      # dato original
+FLAG_INTERPOLATED = 1  # hueco corto: interpolación lineal/circular
+FLAG_CLIMATOLOGY = 2   # hueco largo: promedio climatológico mes×hora
+FLAG_MISSING = -1      # hueco mayor a max_gap: se deja en NaN
+
+
+def _gap_bounds(valid: np.ndarray):
+    """
+    Para cada celda de una matriz (n, m) devuelve la fila del último dato
+    válido anterior (-1 si no hay) y la del siguiente (n si no hay),
+    columna por columna y sin ciclos de Python.
+    """
+    n = valid.shape[0]
+    rows = np.arange(n)[:, None]
+    prev = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    nxt = np.minimum.accumulate(np.where(valid, rows, n)[::-1], axis=0)[::-1]
+    return prev, nxt
+
+
+def _wrap_degrees(x: np.ndarray) -> np.ndarray:
+    """
+    Ángulos en [0, 360): el módulo de un negativo diminuto redondea a
+    360.0 exacto, que se lleva a 0.
+    """
+    x = x % 360.0
+    return np.where(x >= 360.0, 0.0, x)
+
+
+def _climatology(values: np.ndarray, valid: np.ndarray, codes: np.ndarray, n_codes: int):
+    """
+    Promedio por grupo (mes×hora) de todas las columnas con un solo bincount.
+    Devuelve una matriz (n_codes, m) con NaN donde el grupo no tiene datos.
+    """
+    m = values.shape[1]
+    flat = (codes[:, None] * m + np.arange(m)[None, :])[valid]
+    sums = np.bincount(flat, weights=values[valid], minlength=n_codes * m)
+    counts = np.bincount(flat, minlength=n_codes * m)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums / counts).reshape(n_codes, m)
+
+
+def fill_gaps(
+    df: pd.DataFrame,
+    interp_max_hours: float = 3,
+    max_gap_hours: float | None = 168,
+    circular_cols=("wd",),
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Rellena huecos de una serie regular (índice datetime con paso constante):
+      1. huecos de hasta `interp_max_hours` → interpolación lineal entre los
+         datos vecinos (circular por el arco corto para `circular_cols`)
+      2. huecos más largos, hasta `max_gap_hours` → promedio climatológico
+         mes×hora de la propia serie (media vectorial para `circular_cols`)
+      3. huecos mayores a `max_gap_hours` → se quedan en NaN
+         (max_gap_hours=None rellena todo lo que tenga climatología)
+    Todas las columnas se procesan juntas como una matriz.
+
+    Devuelve (df_rellenado, banderas) con banderas de tipo int8 y los códigos
+    FLAG_MEASURED / FLAG_INTERPOLATED / FLAG_CLIMATOLOGY / FLAG_MISSING.
+    """
+    if df.empty:
+        return df.copy(), pd.DataFrame(np.zeros(df.shape, dtype=np.int8), index=df.index, columns=df.columns)
+    if not isinstance(df.index, pd.DatetimeIndex):
+        raise TypeError("fill_gaps requiere un índice datetime.")
+
+    step = df.index[1] - df.index[0] if len(df.index) > 1 else pd.Timedelta("1h")
+    interp_steps = int(pd.Timedelta(hours=interp_max_hours) / step)
+    max_steps = np.inf if max_gap_hours is None else int(pd.Timedelta(hours=max_gap_hours) / step)
+
+    cols = list(df.columns)
+    circ = np.array([c in circular_cols for c in cols])
+    values = df.to_numpy(dtype=float, copy=True)
+    valid = ~np.isnan(values)
+    n = values.shape[0]
+
+    # 1) longitud de cada hueco a partir de los datos válidos que lo rodean
+    prev, nxt = _gap_bounds(valid)
+    gap_len = nxt - prev - 1
+    inside = (prev >= 0) & (nxt < n)
+    missing = ~valid
+
+    short = missing & inside & (gap_len <= interp_steps)
+    longer = missing & ~short & (gap_len <= max_steps)
+
+    flags = np.full(values.shape, FLAG_MEASURED, dtype=np.int8)
+    flags[missing] = FLAG_MISSING
+
+    # 2) interpolación lineal (y circular) en huecos cortos
+    if short.any():
+        p = np.clip(prev, 0, n - 1)
+        q = np.clip(nxt, 0, n - 1)
+        a = np.take_along_axis(values, p, axis=0)
+        b = np.take_along_axis(values, q, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = (np.arange(n)[:, None] - prev) / (nxt - prev)
+        delta = b - a
+        delta[:, circ] = (delta[:, circ] + 180.0) % 360.0 - 180.0
+        interp = a + w * delta
+        interp[:, circ] = _wrap_degrees(interp[:, circ])
+        values[short] = interp[short]
+        flags[short] = FLAG_INTERPOLATED
+
+    # 3) climatología mes×hora en huecos largos
+    if longer.any():
+        codes = (df.index.month.to_numpy() - 1) * 24 + df.index.hour.to_numpy()
+        # las columnas circulares se promedian como vectores unitarios
+        rad = np.deg2rad(values[:, circ])
+        aug = np.hstack([values[:, ~circ], np.sin(rad), np.cos(rad)])
+        aug_valid = np.hstack([valid[:, ~circ], valid[:, circ], valid[:, circ]])
+        clim = _climatology(aug, aug_valid, codes, 12 * 24)
+
+        n_lin = (~circ).sum()
+        n_circ = circ.sum()
+        clim_full = np.empty((clim.shape[0], len(cols)))
+        clim_full[:, ~circ] = clim[:, :n_lin]
+        clim_full[:, circ] = _wrap_degrees(np.rad2deg(
+            np.arctan2(clim[:, n_lin:n_lin + n_circ], clim[:, n_lin + n_circ:])
+        ))
+
+        fill = clim_full[codes]
+        ok = longer & ~np.isnan(fill)
+        values[ok] = fill[ok]
+        flags[ok] = FLAG_CLIMATOLOGY
+
+    filled = pd.DataFrame(values, index=df.index, columns=cols)
+    flag_df = pd.DataFrame(flags, index=df.index, columns=cols)
+    return filled, flag_df
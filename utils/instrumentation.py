@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+_TRACE_LOCK = threading.Lock()
+_TRACE_USERS = 0
+# registros de las etapas medidas que están corriendo (en cualquier perfilador)
+_RUNNING: list[dict] = []
+
+
+def _trace_start(rec: dict) -> int:
+    """
+    Arranca tracemalloc (compartido entre hilos) si nadie lo ha hecho y
+    registra la etapa como en curso. Si ya corre otra etapa medida, las
+    dos quedan marcadas como traslapadas: el pico es global al proceso y
+    reset_peak de una borra el de la otra, así que ninguna tiene un pico
+    válido. Devuelve la memoria asignada al empezar.
+    """
+    global _TRACE_USERS
+    with _TRACE_LOCK:
+        if _TRACE_USERS == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _TRACE_USERS += 1
+        if _RUNNING:
+            rec["_traslape"] = True
+            for other in _RUNNING:
+                other["_traslape"] = True
+        else:
+            tracemalloc.reset_peak()
+        _RUNNING.append(rec)
+        base, _ = tracemalloc.get_traced_memory()
+    return base
+
+
+def _trace_stop(rec: dict, base: int) -> float | None:
+    """Pico (MB) sobre `base` de la etapa, o None si corrió junto con otra."""
+    global _TRACE_USERS
+    with _TRACE_LOCK:
+        _, peak = tracemalloc.get_traced_memory()
+        _RUNNING.remove(rec)
+        _TRACE_USERS -= 1
+        if _TRACE_USERS == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+    if rec.pop("_traslape", False):
+        return None
+    return round(max(peak - base, 0) / 2**20, 2)
+
+
+class StageProfiler:
+    """
+    Registra, por etapa con nombre: tiempo de pared, filas de entrada/salida y
+    pico de memoria asignada (tracemalloc).
+
+    Uso:
+        prof = StageProfiler()
+        with prof.stage("parse") as etapa:
+            df = pd.read_csv(...)
+            etapa["filas_salida"] = len(df)
+
+    tracemalloc es global al proceso y agrega sobrecosto a todo el proceso
+    mientras está activo, por eso trace_memory es opcional. El pico sólo se
+    reporta para etapas que corren solas: si una etapa se traslapa con otra
+    (p. ej. bajo asyncio.gather) su pico_mb queda en None.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.records: list[dict] = []
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None):
+        rec = {"etapa": name, "filas_entrada": rows_in, "filas_salida": None}
+        if self.trace_memory:
+            base = _trace_start(rec)
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["segundos"] = round(time.perf_counter() - t0, 4)
+            if self.trace_memory:
+                rec["pico_mb"] = _trace_stop(rec, base)
+            else:
+                rec["pico_mb"] = None
+            self.records.append(rec)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Tabla con una fila por etapa, en orden de término."""
+        return pd.DataFrame(
+            self.records,
+            columns=["etapa", "segundos", "filas_entrada", "filas_salida", "pico_mb"],
+        ).astype({"filas_entrada": "Int64", "filas_salida": "Int64"})
+
+    def write_jsonl(self, path: str | Path, **meta) -> None:
+        """
+        Agrega una línea JSON por etapa a `path` (con `meta` y la fecha de
+        ejecución) para analizar tendencias entre archivos.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        ts = datetime.now().isoformat(timespec="seconds")
+        with path.open("a", encoding="utf-8") as f:
+            for rec in self.records:
+                f.write(json.dumps({"fecha": ts, **meta, **rec}, ensure_ascii=False, default=str) + "\n")
+
+
+@contextmanager
+def stage(profiler: StageProfiler | None, name: str, rows_in: int | None = None):
+    """
+    Atajo para instrumentar código opcionalmente: si `profiler` es None no
+    mide nada y entrega un registro descartable.
+    """
+    if profiler is None:
+        yield {}
+        return
+    with profiler.stage(name, rows_in) as rec:
+        yield rec
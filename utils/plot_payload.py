@@ -0,0 +1,125 @@
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+# atributos de datos de las trazas que pueden viajar como arreglos tipados
+_DATA_ATTRS = ("x", "y", "z", "r", "theta")
+_INT_DTYPES = (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32)
+
+
+def typed(values, dtype=np.float32) -> np.ndarray:
+    """
+    Arreglo NumPy contiguo del tipo indicado. Plotly (>= 6) serializa los
+    arreglos NumPy como binario base64 ({"dtype", "bdata"}) en lugar de
+    listas JSON; float32 basta para lo que se grafica (7 cifras).
+    """
+    return np.ascontiguousarray(values, dtype=dtype)
+
+
+def smallest_int(values) -> np.ndarray:
+    """Enteros en el tipo más chico que los contiene (u1, i1, u2, ...)."""
+    arr = np.asarray(values)
+    lo, hi = (arr.min(), arr.max()) if arr.size else (0, 0)
+    for dt in _INT_DTYPES:
+        info = np.iinfo(dt)
+        if info.min <= lo and hi <= info.max:
+            return np.ascontiguousarray(arr, dtype=dt)
+    return np.ascontiguousarray(arr, dtype=np.int64)
+
+
+def date_ms(values) -> np.ndarray:
+    """
+    Fechas como milisegundos desde 1970 (float64), que Plotly acepta en ejes
+    type="date"; evita mandar una cadena ISO por punto.
+    """
+    idx = pd.DatetimeIndex(values)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    return (idx.as_unit("ns").asi8 // 1_000_000).astype(np.float64)
+
+
+def _is_datetime(arr: np.ndarray) -> bool:
+    if arr.dtype.kind == "M":
+        return True
+    if arr.dtype == object and arr.size:
+        first = arr.flat[0]
+        return isinstance(first, (pd.Timestamp, np.datetime64)) or hasattr(first, "isoformat")
+    return False
+
+
+def _axis_key(trace, attr: str) -> str | None:
+    """Llave del eje de layout ('xaxis', 'yaxis2', ...) de una traza cartesiana."""
+    if attr not in ("x", "y") or not hasattr(trace, f"{attr}axis"):
+        return None
+    ref = getattr(trace, f"{attr}axis") or attr
+    return f"{attr}axis{ref[1:]}"
+
+
+def dedupe_traces(fig):
+    """
+    Quita las trazas repetidas (mismo tipo, ejes y datos); se conserva la
+    última, que es la que queda dibujada encima.
+    """
+    seen = set()
+    keep = []
+    for trace in reversed(fig.data):
+        key = [trace.type, getattr(trace, "xaxis", None), getattr(trace, "yaxis", None)]
+        for attr in _DATA_ATTRS:
+            v = getattr(trace, attr, None)
+            key.append(None if v is None else np.asarray(v).tobytes())
+        key = tuple(key)
+        if key not in seen:
+            seen.add(key)
+            keep.append(trace)
+    if len(keep) != len(fig.data):
+        fig.data = tuple(reversed(keep))
+    return fig
+
+
+def compact_figure(fig, float_dtype=np.float32):
+    """
+    Reduce el tamaño que la figura envía al navegador:
+      - numéricos flotantes → `float_dtype` y enteros → el tipo más chico,
+        ambos como arreglos binarios (salvo los de ejes de fecha, que
+        quedan en float64)
+      - fechas → milisegundos numéricos en un eje type="date" (el formato de
+        ticks y hover lo pone el eje, no una cadena por punto)
+      - trazas duplicadas → se quitan
+    Devuelve la misma figura, modificada.
+    """
+    dedupe_traces(fig)
+    for trace in fig.data:
+        for attr in _DATA_ATTRS:
+            v = getattr(trace, attr, None)
+            if v is None or isinstance(v, str):
+                continue
+            arr = np.asarray(v)
+            if _is_datetime(arr):
+                axis = _axis_key(trace, attr)
+                if axis is None:
+                    continue
+                new = date_ms(arr.ravel())
+                fig.layout[axis].type = "date"
+            elif arr.dtype.kind == "f":
+                axis = _axis_key(trace, attr)
+                if axis is not None and fig.layout[axis].type == "date":
+                    continue  # milisegundos: float32 no alcanza (~2 min de error)
+                new = typed(arr, float_dtype)
+            elif arr.dtype.kind in "iu":
+                new = smallest_int(arr)
+            else:
+                continue
+            # plotly ignora una asignación igual al valor actual (p. ej. una
+            # lista de enteros y el mismo arreglo u1), así que se vacía antes
+            trace[attr] = None
+            trace[attr] = new
+    return fig
+
+
+def payload_stats(fig) -> dict:
+    """Tamaño (bytes) y tiempo de serialización JSON de la figura, para medir."""
+    t0 = time.perf_counter()
+    payload = pio.to_json(fig, validate=False)
+    return {"bytes": len(payload.encode("utf-8")), "segundos": round(time.perf_counter() - t0, 4)}
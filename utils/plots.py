@@ -1,24 +1,37 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from utils.data_processing import load_csv, radiacion
+from utils.plot_payload import date_ms, typed
 
-def graficado_plotly(path_archivo: str, columnas: list[str] = None) -> go.Figure:
+
+def _cargar(path_archivo: str | pd.DataFrame) -> pd.DataFrame:
+    """
+    Devuelve el DataFrame limpio: lo lee con load_csv si recibe una ruta.
+    """
+    if isinstance(path_archivo, pd.DataFrame):
+        return path_archivo
+    return load_csv(path_archivo)
+
+
+def graficado_plotly(path_archivo: str | pd.DataFrame, columnas: list[str] = None) -> go.Figure:
     """
-    - carga el CSV con load_csv (que devuelve un DataFrame con TIMESTAMP como índice datetime)
-    - convierte el índice TIMESTAMP en columna de texto con formato "YYYY-MM-DD HH:MM"
-    - selecciona las variables a graficar (todas las columnas numéricas, salvo TIMESTAMP_str)
-    - construye un scattergl para cada variable
+    - carga el CSV con load_csv (que devuelve un DataFrame con TIMESTAMP como índice datetime);
+      si recibe un DataFrame ya cargado lo usa directamente
+    - el índice TIMESTAMP viaja como milisegundos numéricos en un eje de
+      fechas; el formato "YYYY-MM-DD HH:MM" lo ponen los ticks y el hover
+    - selecciona las variables a graficar (todas las columnas numéricas)
+    - construye un scattergl para cada variable, con valores float32
     """
 
     # 1. cargar datos (load_csv ya deja TIMESTAMP como índice datetime)
-    df = load_csv(path_archivo)
+    df = _cargar(path_archivo)
 
-    # 2. resetear índice para que TIMESTAMP vuelva a ser columna y formatearla
-    df = df.reset_index()  # ahora 'TIMESTAMP' es columna de tipo datetime
-    df["TIMESTAMP"] = df["TIMESTAMP"].dt.strftime("%Y-%m-%d %H:%M")
+    # 2. marcas de tiempo como números (sin una cadena por punto)
+    x_ms = date_ms(df.index)
 
-    # 3. determinar qué variables graficar (descartar la columna TIMESTAMP)
-    variables = columnas or [c for c in df.columns if c != "TIMESTAMP"]
+    # 3. determinar qué variables graficar
+    variables = columnas or list(df.columns)
 
     # 4. construir figura
     fig = go.Figure()
@@ -26,11 +39,12 @@ def graficado_plotly(path_archivo: str, columnas: list[str] = None) -> go.Figure
         if var not in df.columns:
             # si el usuario pidió una columna que no existe, la omitimos
             continue
-        mask = df[var].notna()
+        values = df[var].to_numpy(dtype=float)
+        mask = ~np.isnan(values)
         fig.add_trace(
             go.Scattergl(
-                x = df.loc[mask, "TIMESTAMP"],
-                y = df.loc[mask, var],
+                x = x_ms[mask],
+                y = typed(values[mask]),
                 mode = "markers",
                 name = var,
                 marker = dict(size=5),
@@ -45,8 +59,10 @@ def graficado_plotly(path_archivo: str, columnas: list[str] = None) -> go.Figure
         yaxis_title = "Valores",
     )
     fig.update_xaxes(
+        type = "date",
         showgrid = True,
         tickformat = "%Y-%m-%d %H:%M",
+        hoverformat = "%Y-%m-%d %H:%M",
         tickmode = "auto",
     )
     fig.update_yaxes(showgrid = True)
@@ -54,16 +70,16 @@ def graficado_plotly(path_archivo: str, columnas: list[str] = None) -> go.Figure
     return fig
 
 
-def graficado_radiacion(path_archivo: str, rad_columns: list[str] = None) -> go.Figure:
+def graficado_radiacion(path_archivo: str | pd.DataFrame, rad_columns: list[str] = None) -> go.Figure:
     # 1. cargar datos y calcular radiación nocturna
-    df = load_csv(path_archivo)
+    df = _cargar(path_archivo)
     df_rad = radiacion(df, rad_columns)
 
     # 2. preparar TIMESTAMP para graficar
     df_plot = df_rad.reset_index().rename(columns={'index': 'TIMESTAMP'})
     df_plot['TIMESTAMP'] = pd.to_datetime(df_plot['TIMESTAMP'], errors='coerce')
     df_plot = df_plot.dropna(subset=['TIMESTAMP'])
-    df_plot['TIMESTAMP'] = df_plot['TIMESTAMP'].dt.strftime('%Y-%m-%d %H:%M')
+    x_ms = date_ms(df_plot['TIMESTAMP'])
 
     # 3. determinar columnas a graficar (excluyendo altura_solar)
     cols_to_plot = [col for col in df_plot.columns if col not in ['TIMESTAMP', 'altura_solar']]
@@ -73,8 +89,8 @@ def graficado_radiacion(path_archivo: str, rad_columns: list[str] = None) -> go.
     for col in cols_to_plot:
         fig.add_trace(
             go.Scattergl(
-                x=df_plot['TIMESTAMP'],
-                y=df_plot[col],
+                x=x_ms,
+                y=typed(df_plot[col]),
                 mode='markers',
                 name=col,
                 marker=dict(size=5),
@@ -87,7 +103,8 @@ def graficado_radiacion(path_archivo: str, rad_columns: list[str] = None) -> go.
         xaxis_title='TIMESTAMP',
         yaxis_title='Valores',
     )
-    fig.update_xaxes(showgrid=True, tickformat='%Y-%m-%d %H:%M', tickmode='auto')
+    fig.update_xaxes(type='date', showgrid=True, tickformat='%Y-%m-%d %H:%M',
+                     hoverformat='%Y-%m-%d %H:%M', tickmode='auto')
     fig.update_yaxes(showgrid=True)
 
     return fig
@@ -0,0 +1,189 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+import PySAM.Windpower as wp
+
+# Este módulo sólo depende de PySAM: es lo que importan los procesos del
+# pool, así que arrancan rápido (sin plotly, pandas ni la configuración).
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _output(wind, name: str):
+    """
+    Salida `name` de PySAM, o None si no existe en esta versión o no se
+    asignó en la corrida (PySAM lanza Exception, no AttributeError, así que
+    getattr con valor por omisión no basta).
+    """
+    try:
+        return getattr(wind.Outputs, name)
+    except Exception:
+        return None
+
+
+def simulate_turbine(
+    turbine: dict,
+    sam_data: dict,
+    resource: dict,
+    shear: float,
+    overrides: dict | None = None,
+) -> dict:
+    """
+    Ejecuta PySAM.Windpower para una turbina con un recurso ya preparado.
+    - turbine: entrada de wind-turbines.json (name, rated_power, hub_height,
+      rotor_diameter, wind_speeds, turbine_powers)
+    - sam_data: parámetros base (windpower-inputs.json)
+    - resource: entradas de recurso de SAM (wind_resource_data o la
+      distribución), ya a la altura del buje
+    - overrides: entradas de PySAM que se fijan al final (modelo de estela,
+      pérdidas, wind_farm_xCoordinates/yCoordinates, ...); la capacidad
+      del parque es potencia nominal × número de turbinas del arreglo
+    Devuelve el dict de resultados de run_wind_simulation, o {"error": ...}.
+    """
+    wind = wp.new()
+    for key, val in sam_data.items():
+        if key != "wind_resource_filename":
+            wind.value(key, val)
+    for key, val in resource.items():
+        wind.value(key, val)
+    wind.value("wind_resource_shear", shear)
+    wind.value("wind_farm_wake_model", 0)
+
+    wind.value("wind_farm_xCoordinates", [0])
+    wind.value("wind_farm_yCoordinates", [0])
+    wind.value("wind_turbine_rotor_diameter", turbine["rotor_diameter"])
+    wind.value("wind_turbine_powercurve_windspeeds", turbine["wind_speeds"])
+    wind.value("wind_turbine_powercurve_powerout", turbine["turbine_powers"])
+    wind.value("wind_turbine_hub_ht", turbine["hub_height"])
+    for key, val in (overrides or {}).items():
+        wind.value(key, val)
+
+    farm_capacity = len(wind.value("wind_farm_xCoordinates")) * turbine["rated_power"]
+    wind.value("system_capacity", farm_capacity)
+
+    try:
+        wind.execute()
+    except Exception as e:
+        msg = str(e)
+        if "closest wind speed measurement height" in msg:
+            return {
+                "error": "No podemos realizar la simulacion con esta turbina debido a las condiciones "
+                         "de medición de viento en este sitio."
+            }
+        return { "error": f"PySAM Windpower execution error: {msg}" }
+
+    annual_energy = _output(wind, "annual_energy")
+    capacity_factor = _output(wind, "capacity_factor")
+    wake_losses = _output(wind, "wake_losses")
+    if wake_losses is None:
+        # nombre en versiones recientes de PySAM
+        wake_losses = _output(wind, "annual_wake_loss_internal_kWh")
+    turb_losses = _output(wind, "turb_losses")
+    monthly_energy = _output(wind, "monthly_energy")
+    gen_hourly = wind.Outputs.gen
+
+    if annual_energy is None or capacity_factor is None:
+        return {"error": "No se pudieron leer los resultados de PySAM."}
+
+    return {
+        "Energia Anual (kWh)": annual_energy,
+        "Factor de Capacidad": capacity_factor,
+        "Perdida por estela (kWh)": wake_losses,
+        "Perdida por turbina (kWh)": turb_losses,
+        "Monthly Energy":  monthly_energy,
+        "gen": gen_hourly,
+    }
+
+
+def _simulate_task(task: tuple) -> dict:
+    return simulate_turbine(*task)
+
+
+def _submit_all(tasks: list[tuple], max_workers: int) -> list[Future]:
+    """
+    Envía las tareas al pool de procesos persistente: se crea una vez por
+    proceso (con 'spawn', seguro aunque el servidor tenga hilos) y se
+    reutiliza, así cada comparación sólo paga el envío de las tareas. Si se
+    piden más procesos se reemplaza; el envío se hace con el candado
+    tomado para que otro hilo no reciba un pool ya cerrado (el pool viejo
+    termina las tareas que ya tenía).
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers < max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_workers = max_workers
+        return [_pool.submit(_simulate_task, task) for task in tasks]
+
+
+def submit_simulation(task: tuple) -> Future:
+    """
+    Envía una tarea al pool de procesos y devuelve su Future. Para
+    simulaciones en segundo plano: PySAM retiene el GIL mientras corre,
+    así que en un hilo del servidor congelaría a las demás sesiones.
+    """
+    return _submit_all([task], 1)[0]
+
+
+def iter_simulations(tasks: list[tuple], max_workers: int | None = None, background: bool = False):
+    """
+    simulate_turbine sobre varias tareas (turbine, sam_data, resource,
+    shear[, overrides]) en paralelo, una por proceso; con max_workers=1 o
+    una sola tarea corre en el proceso actual, salvo con background=True
+    (trabajos en segundo plano: siempre en el pool, para no retener el GIL
+    del servidor). Genera (posición, resultado) conforme terminan, para
+    guardar cada resultado sin esperar al resto.
+    """
+    if max_workers is None:
+        max_workers = min(len(tasks), os.cpu_count() or 1)
+    if not background and (max_workers <= 1 or len(tasks) <= 1):
+        for i, task in enumerate(tasks):
+            yield i, _simulate_task(task)
+        return
+    futures = {fut: i for i, fut in enumerate(_submit_all(tasks, max(max_workers, 1)))}
+    try:
+        for fut in as_completed(futures):
+            yield futures[fut], fut.result()
+    finally:
+        # si el consumidor se detiene, no dejar tareas pendientes en el pool
+        for fut in futures:
+            fut.cancel()
+
+
+def simulate_many(
+    tasks: list[tuple],
+    max_workers: int | None = None,
+    progress=None,
+    background: bool = False,
+) -> list[dict]:
+    """
+    iter_simulations con los resultados en el orden de `tasks`.
+    progress(hechas, total), si se da, se llama tras cada resultado; si
+    lanza una excepción (p. ej. JobCancelled) se cancelan las pendientes.
+    """
+    results = [None] * len(tasks)
+    sims = iter_simulations(tasks, max_workers, background)
+    try:
+        for done, (i, res) in enumerate(sims, start=1):
+            results[i] = res
+            if progress is not None:
+                progress(done, len(tasks))
+    finally:
+        sims.close()
+    return results
+
+
+@atexit.register
+def _shutdown_pool() -> None:
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,160 @@
+import asyncio
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from utils.config import load_background_settings
+
+_ids = itertools.count(1)
+_queue = None
+_queue_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Se lanza dentro del trabajo cuando el usuario lo cancela."""
+
+
+class SimulationJob:
+    """
+    Una simulación en segundo plano. El trabajo recibe el objeto como
+    `job=` y lo usa para:
+      - job.report(fracción, mensaje): avance (lanza JobCancelled si se
+        canceló, así el trabajo se detiene en la siguiente etapa)
+      - job.reporter(inicio, fin, mensaje): el mismo avance como callback
+        progress(hechas, total) para los pasos de muchas tareas
+      - job.wait(future): espera un resultado del pool de procesos sin
+        bloquear la cancelación
+    El resultado (future) siempre es un dict: el del trabajo, o
+    {"error": ...} si se canceló o falló.
+    """
+
+    def __init__(self):
+        self.id = next(_ids)
+        self.status = "en cola"
+        self.progress = 0.0
+        self.message = "En cola"
+        self.future: Future | None = None
+        self._cancel = threading.Event()
+
+    def report(self, fraction: float, message: str) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.progress = float(fraction)
+        self.message = message
+
+    def reporter(self, start: float, end: float, message: str):
+        """
+        Callback progress(hechas, total) para simulate_many y similares:
+        reporta el avance entre las fracciones `start` y `end`.
+        """
+        def progress(done: int, total: int) -> None:
+            self.report(start + (end - start) * done / max(total, 1), f"{message} ({done}/{total})")
+        return progress
+
+    def wait(self, future: Future, poll: float = 0.2):
+        """
+        Resultado de `future`; si el trabajo se cancela deja de esperar. Una
+        tarea que ya corre en el pool de procesos no se puede interrumpir:
+        el proceso sigue hasta que PySAM termina y su resultado se descarta.
+        """
+        while True:
+            if self._cancel.is_set():
+                future.cancel()
+                raise JobCancelled()
+            try:
+                return future.result(timeout=poll)
+            except FutureTimeout:
+                continue
+
+    def cancel(self) -> None:
+        """
+        Cancela el trabajo: si está en cola no llega a correr; si corre, se
+        detiene en la siguiente etapa. Durante la etapa de PySAM el trabajo
+        deja de esperar de inmediato, pero el proceso del pool sigue
+        ocupado hasta que PySAM termina (ver wait).
+        """
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.status = "cancelada"
+            self.message = "Cancelada"
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    async def result_async(self) -> dict:
+        """Para reactive.extended_task: espera el resultado sin bloquear el servidor."""
+        try:
+            return await asyncio.wrap_future(self.future)
+        except asyncio.CancelledError:
+            if self.future.cancelled():
+                # cancelado mientras estaba en cola
+                return {"error": "Simulación cancelada."}
+            self.cancel()
+            raise
+
+
+class JobQueue:
+    """
+    Cola de simulaciones compartida por todas las sesiones: a lo más
+    `max_workers` corren a la vez en hilos (la parte de PySAM va al pool de
+    procesos de utils.sam_windpower, que no retiene el GIL del servidor);
+    las demás esperan en orden de llegada.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sim")
+        self._jobs: list[SimulationJob] = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> SimulationJob:
+        """Encola fn(*args, job=<SimulationJob>, **kwargs) y devuelve el trabajo."""
+        job = SimulationJob()
+
+        def run():
+            job.status = "en curso"
+            try:
+                job.report(0.0, "Iniciando")
+                result = fn(*args, job=job, **kwargs)
+                job.status, job.progress, job.message = "lista", 1.0, "Lista"
+                return result
+            except JobCancelled:
+                job.status, job.message = "cancelada", "Cancelada"
+                return {"error": "Simulación cancelada."}
+            except Exception as e:
+                job.status, job.message = "error", str(e)
+                return {"error": f"Error en la simulación: {e}"}
+
+        with self._lock:
+            self._jobs.append(job)
+            job.future = self._executor.submit(run)
+        job.future.add_done_callback(lambda _: self._forget(job))
+        return job
+
+    def _forget(self, job: SimulationJob) -> None:
+        with self._lock:
+            if job in self._jobs:
+                self._jobs.remove(job)
+
+    def depth(self) -> int:
+        """Trabajos en cola o en curso."""
+        with self._lock:
+            return len(self._jobs)
+
+    def position(self, job: SimulationJob) -> int:
+        """Trabajos en cola antes de `job` (0 si ya corre o terminó)."""
+        with self._lock:
+            waiting = [j for j in self._jobs if j.status == "en cola"]
+        return waiting.index(job) if job in waiting else 0
+
+
+def simulation_queue(ini_path: str = "configuration.ini") -> JobQueue:
+    """Cola del proceso ([background] max_jobs), creada la primera vez que se pide."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(load_background_settings(ini_path)["max_jobs"])
+        return _queue
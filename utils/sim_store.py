@@ -0,0 +1,210 @@
+import threading
+
+import duckdb
+import pandas as pd
+
+from utils.config import load_settings, load_gap_settings, load_wind_resource_settings
+from utils.tmy_cache import cache_key, data_fingerprint
+from utils.wind_rose import _load_catalog_and_inputs, run_wind_simulation
+
+# versión del formato/algoritmo de la simulación: cambiarla deja sin uso
+# las entradas guardadas (se purgan con purge_sim_results)
+STORE_VERSION = 1
+DATA_COLS = ["ws", "wd", "tdb", "p_atm"]
+
+_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS simulaciones (
+        turbina VARCHAR,
+        configuracion VARCHAR,
+        datos VARCHAR,
+        creada TIMESTAMP DEFAULT current_timestamp,
+        energia_anual DOUBLE,
+        factor_capacidad DOUBLE,
+        perdida_estela DOUBLE,
+        perdida_turbina DOUBLE,
+        mensual DOUBLE[],
+        gen DOUBLE[],
+        PRIMARY KEY (turbina, configuracion, datos)
+    );
+"""
+
+# columna de la tabla → llave del dict de resultados de run_wind_simulation
+_COLUMNS = {
+    "energia_anual": "Energia Anual (kWh)",
+    "factor_capacidad": "Factor de Capacidad",
+    "perdida_estela": "Perdida por estela (kWh)",
+    "perdida_turbina": "Perdida por turbina (kWh)",
+    "mensual": "Monthly Energy",
+    "gen": "gen",
+}
+_lock = threading.Lock()
+
+
+def data_version(esolmet_df) -> str:
+    """Versión de los datos: hash del contenido de ws, wd, tdb y p_atm (ver data_fingerprint)."""
+    return data_fingerprint(esolmet_df, DATA_COLS)
+
+
+def simulation_key(
+    turbine_name: str,
+    version: str,
+    ini_path: str = "configuration.ini",
+    wind_turbine_file: str = "wind_simulation/wind-turbines.json",
+    wind_inputs_file: str = "wind_simulation/windpower-inputs.json",
+    resource_mode: str = "timeseries",
+    layout=None,
+    wake_model: int = 0,
+) -> tuple[str, str, str]:
+    """
+    Llave (turbina, configuración, datos) de una simulación. La
+    configuración es un hash de todo lo que cambia el resultado además de
+    los datos: la turbina del catálogo (curva, buje, rotor), el contenido de
+    windpower-inputs.json, las secciones [settings] (sitio y alturas),
+    [gap_filling] y [wind_resource] de configuration.ini, el modo de
+    recurso y el arreglo del parque.
+    """
+    catalog, sam_data = _load_catalog_and_inputs(ini_path, wind_turbine_file, wind_inputs_file)
+    _, latitude, longitude, *_, ws_height, t_height, p_height = load_settings(ini_path)
+    resource = dict(load_wind_resource_settings(ini_path))
+    resource.pop("cache_dir", None)
+    settings = {
+        "store": STORE_VERSION,
+        "turbine": catalog[turbine_name],
+        "inputs": sam_data,
+        "site": [latitude, longitude, ws_height, t_height, p_height],
+        "gap_filling": load_gap_settings(ini_path),
+        "wind_resource": resource,
+        "resource_mode": resource_mode,
+        "layout": None if layout is None else [[float(v) for v in layout[0]], [float(v) for v in layout[1]]],
+        "wake_model": int(wake_model),
+    }
+    return turbine_name, cache_key("", settings), version
+
+
+def load_sim_result(con, key: tuple[str, str, str]) -> dict | None:
+    """Resultado guardado con `key` (mismo formato que run_wind_simulation) o None."""
+    cur = con.cursor()
+    try:
+        cur.execute(_TABLE_SQL)
+        row = cur.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM simulaciones "
+            "WHERE turbina = ? AND configuracion = ? AND datos = ?;",
+            list(key),
+        ).fetchone()
+    finally:
+        cur.close()
+    if row is None:
+        return None
+    return {name: val for name, val in zip(_COLUMNS.values(), row)}
+
+
+def save_sim_result(con, key: tuple[str, str, str], result: dict) -> None:
+    """
+    Guarda (reemplaza) el resultado con `key` y purga los de otras
+    versiones de datos. Los errores no se guardan.
+    """
+    if "error" in result:
+        return
+    values = [
+        None if result.get(name) is None else
+        [float(v) for v in result[name]] if col in ("mensual", "gen") else float(result[name])
+        for col, name in _COLUMNS.items()
+    ]
+    with _lock:
+        cur = con.cursor()
+        try:
+            cur.execute(_TABLE_SQL)
+            cur.execute("DELETE FROM simulaciones WHERE datos <> ?;", [key[2]])
+            cur.execute(
+                f"INSERT OR REPLACE INTO simulaciones (turbina, configuracion, datos, {', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join(['?'] * (3 + len(_COLUMNS)))});",
+                [*key, *values],
+            )
+        finally:
+            cur.close()
+
+
+def purge_sim_results(con, keep: str | None = None) -> int:
+    """
+    Borra los resultados guardados de datos distintos a `keep` (todos si
+    es None, p. ej. al cargar datos nuevos). Devuelve cuántos se borraron.
+    """
+    with _lock:
+        cur = con.cursor()
+        try:
+            cur.execute(_TABLE_SQL)
+            if keep is None:
+                n = cur.execute("SELECT count(*) FROM simulaciones;").fetchone()[0]
+                cur.execute("DELETE FROM simulaciones;")
+            else:
+                n = cur.execute("SELECT count(*) FROM simulaciones WHERE datos <> ?;", [keep]).fetchone()[0]
+                cur.execute("DELETE FROM simulaciones WHERE datos <> ?;", [keep])
+        finally:
+            cur.close()
+    return int(n)
+
+
+def stored_simulations(con) -> pd.DataFrame:
+    """Resumen de los resultados guardados (sin las series)."""
+    cur = con.cursor()
+    try:
+        cur.execute(_TABLE_SQL)
+        return cur.execute(
+            "SELECT turbina, datos, creada, energia_anual, factor_capacidad "
+            "FROM simulaciones ORDER BY creada DESC;"
+        ).df()
+    finally:
+        cur.close()
+
+
+def cached_wind_simulation(
+    con,
+    esolmet_df,
+    turbine_name: str,
+    ini_path: str = "configuration.ini",
+    wind_turbine_file: str = "wind_simulation/wind-turbines.json",
+    wind_inputs_file: str = "wind_simulation/windpower-inputs.json",
+    resource_mode: str = "timeseries",
+    layout=None,
+    wake_model: int = 0,
+    version: str | None = None,
+    job=None,
+) -> dict:
+    """
+    run_wind_simulation con los resultados guardados en la tabla
+    'simulaciones' de DuckDB (`con`): si ya se simuló la misma turbina con
+    la misma configuración y los mismos datos (en esta u otra sesión, o
+    antes de reiniciar el servidor) se devuelve el guardado; si no, se
+    simula y se guarda. `version` es data_version(esolmet_df) ya calculada
+    (evita volver a hashear los datos en cada llamada).
+    """
+    if version is None:
+        version = data_version(esolmet_df)
+    try:
+        key = simulation_key(
+            turbine_name, version, ini_path, wind_turbine_file, wind_inputs_file,
+            resource_mode, layout, wake_model,
+        )
+    except (FileNotFoundError, ValueError, KeyError):
+        # el error con su mensaje lo da run_wind_simulation
+        key = None
+
+    if key is not None:
+        try:
+            stored = load_sim_result(con, key)
+        except duckdb.Error:
+            stored = None
+        if stored is not None:
+            return stored
+
+    result = run_wind_simulation(
+        esolmet_df, turbine_name, ini_path, wind_turbine_file, wind_inputs_file,
+        resource_mode=resource_mode, layout=layout, wake_model=wake_model, job=job,
+    )
+    if key is not None:
+        try:
+            save_sim_result(con, key, result)
+        except duckdb.Error:
+            # sin guardar, el resultado sigue siendo válido
+            pass
+    return result
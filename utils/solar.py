@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pvlib
+
+# clases de la partición día/noche (códigos de grupo para rose_histogram)
+DAY = 0
+NIGHT = 1
+TWILIGHT = 2
+PERIOD_NAMES = {DAY: "Día", NIGHT: "Noche", TWILIGHT: "Crepúsculo"}
+
+
+def solar_elevation(index: pd.DatetimeIndex, latitude: float, longitude: float, gmt: int) -> np.ndarray:
+    """
+    Elevación solar aparente (grados) para cada marca de `index` (hora local
+    estándar sin tz, UTC`gmt`). Usa el método 'ephemeris' de pvlib: ~10 veces
+    más rápido que 'nrel_numpy' y a menos de 0.5° de éste cerca del horizonte,
+    suficiente para separar día y noche. Pensado para calcularse una vez por
+    archivo y reutilizarse.
+    """
+    inv = -gmt
+    sign = "+" if inv >= 0 else "-"
+    tz = f"Etc/GMT{sign}{abs(inv)}"
+    times = index.tz_localize(tz) if index.tz is None else index.tz_convert(tz)
+    solpos = pvlib.solarposition.get_solarposition(times, latitude, longitude, method="ephemeris")
+    return solpos["apparent_elevation"].to_numpy()
+
+
+def day_night_codes(elevation: np.ndarray, twilight_deg: float | None = None) -> np.ndarray:
+    """
+    Clasifica cada muestra en DAY (sol sobre el horizonte) o NIGHT, con el
+    mismo criterio que la limpieza nocturna (elevación ≤ 0 es noche).
+    Con `twilight_deg` (p. ej. -6 para el crepúsculo civil) las muestras con
+    twilight_deg < elevación ≤ 0 forman la clase TWILIGHT.
+    """
+    codes = np.where(elevation > 0, DAY, NIGHT).astype(np.intp)
+    if twilight_deg is not None:
+        codes[(elevation <= 0) & (elevation > twilight_deg)] = TWILIGHT
+    return codes
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# pool compartido por todas las sesiones: pandas/pvlib liberan el GIL en
+# buena parte del trabajo, así que los hilos bastan para no bloquear el loop
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+_THREAD_POOL = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="esolmet")
+
+
+async def run_in_thread(func, /, *args, **kwargs):
+    """
+    Ejecuta `func(*args, **kwargs)` en el pool de hilos y espera su resultado
+    sin bloquear el event loop de Shiny.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_THREAD_POOL, partial(func, *args, **kwargs))
+
+
+def threadsafe_progress(p):
+    """
+    Envuelve un `ui.Progress` para poder actualizarlo desde un hilo del pool:
+    cada llamada se reenvía al event loop de la sesión.
+    """
+    loop = asyncio.get_running_loop()
+
+    def _set(value=None, message=None):
+        loop.call_soon_threadsafe(partial(p.set, value, message=message))
+
+    return _set
+
+
+async def run_cancellable(func, /, *args, **kwargs):
+    """
+    Igual que `run_in_thread`, pero pasa a `func` un `threading.Event` como
+    `cancel_event`; si la tarea async se cancela, se activa el evento para que
+    el hilo se detenga en su siguiente punto de control.
+    """
+    cancel_event = threading.Event()
+    try:
+        return await run_in_thread(func, *args, cancel_event=cancel_event, **kwargs)
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
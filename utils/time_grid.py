@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+NS_PER_S = 1_000_000_000
+NS_PER_DAY = 86_400 * NS_PER_S
+
+
+def detect_interval(index: pd.DatetimeIndex) -> pd.Timedelta:
+    """
+    Intervalo nominal del registrador: la diferencia más frecuente entre
+    marcas consecutivas (en segundos, sólo diferencias de hasta un día).
+    Usa un bincount, así que es lineal en el número de registros.
+    """
+    if len(index) < 2:
+        raise ValueError("Se necesitan al menos dos registros para detectar el intervalo.")
+    diffs = np.diff(index.as_unit("ns").asi8) // NS_PER_S
+    diffs = diffs[(diffs > 0) & (diffs <= 86_400)]
+    if diffs.size == 0:
+        raise ValueError("No se pudo detectar el intervalo de registro.")
+    return pd.Timedelta(seconds=int(np.bincount(diffs).argmax()))
+
+
+def _solar_noon_hours(day_ns: np.ndarray, longitude: float, gmt: int) -> np.ndarray:
+    """
+    Hora local estándar del mediodía solar para cada día (ecuación del tiempo
+    de Spencer), vectorizada.
+    """
+    doy = pd.DatetimeIndex(day_ns).dayofyear.to_numpy()
+    b = 2 * np.pi * (doy - 1) / 365
+    eot_min = 229.18 * (
+        0.000075 + 0.001868 * np.cos(b) - 0.032077 * np.sin(b)
+        - 0.014615 * np.cos(2 * b) - 0.040849 * np.sin(2 * b)
+    )
+    return 12.0 - (longitude - 15.0 * gmt) / 15.0 - eot_min / 60.0
+
+
+def detect_clock_offsets(
+    df: pd.DataFrame,
+    longitude: float,
+    gmt: int,
+    interval: pd.Timedelta,
+    ghi_col: str = "ghi",
+    label: str = "end",
+    smoothing_days: int = 15,
+    threshold_minutes: float = 10.0,
+) -> dict:
+    """
+    Estima el desfase del reloj comparando, día por día, el centroide de la
+    GHI (≈ mediodía solar en días simétricos) con el mediodía solar teórico.
+
+    Devuelve:
+      - daily: pd.Series con el desfase diario en minutos
+      - constant_offset: mediana global del desfase (min)
+      - segments: DataFrame con tramos de desfase estable
+        (inicio, fin, desfase_min, deriva_min_dia)
+    Todo se calcula con bincount por día: O(registros) + O(días).
+    """
+    empty = {
+        "daily": pd.Series(dtype=float),
+        "constant_offset": 0.0,
+        "segments": pd.DataFrame(columns=["inicio", "fin", "desfase_min", "deriva_min_dia"]),
+    }
+    if ghi_col not in df.columns or df.empty:
+        return empty
+
+    ghi = df[ghi_col].to_numpy(dtype=float)
+    t = df.index.as_unit("ns").asi8
+    ok = ~np.isnan(ghi) & (ghi > 0)
+    if not ok.any():
+        return empty
+
+    # promedios etiquetados al final del intervalo: el centro está medio paso antes
+    shift = interval.value / 2 if label == "end" else 0
+    day = t // NS_PER_DAY
+    day0 = day[0]
+    code = (day - day0)[ok]
+    hours = ((t - day * NS_PER_DAY - shift) / (3600 * NS_PER_S))[ok]
+    w = ghi[ok]
+
+    n_days = int(day[-1] - day0) + 1
+    sw = np.bincount(code, weights=w, minlength=n_days)
+    swh = np.bincount(code, weights=w * hours, minlength=n_days)
+    n = np.bincount(code, minlength=n_days)
+
+    # sólo días con suficiente cobertura diurna
+    expected = (12 * 3600 * NS_PER_S) / interval.value
+    good = n >= 0.8 * expected
+    if not good.any():
+        return empty
+
+    day_ns = (np.arange(n_days) + day0) * NS_PER_DAY
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroid = swh / sw
+    offset = (centroid - _solar_noon_hours(day_ns, longitude, gmt)) * 60.0
+    daily = pd.Series(offset[good], index=pd.DatetimeIndex(day_ns[good]), name="desfase_min")
+
+    smooth = daily.rolling(smoothing_days, center=True, min_periods=1).median()
+    # tramos: días consecutivos con el mismo desfase cuantizado al umbral
+    level = np.round(smooth.to_numpy() / threshold_minutes).astype(int)
+    breaks = np.flatnonzero(np.diff(level)) + 1
+    starts = np.r_[0, breaks]
+    ends = np.r_[breaks, len(level)]
+
+    # pendiente (min/día) de cada tramo por mínimos cuadrados con bincount
+    seg = np.repeat(np.arange(len(starts)), ends - starts)
+    x = (day_ns[good] - day_ns[good][0]) / NS_PER_DAY
+    y = daily.to_numpy()
+    cnt = np.bincount(seg)
+    sx, sy = np.bincount(seg, x), np.bincount(seg, y)
+    sxx, sxy = np.bincount(seg, x * x), np.bincount(seg, x * y)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = (cnt * sxy - sx * sy) / (cnt * sxx - sx * sx)
+    slope = np.where(cnt > 2, slope, 0.0)
+
+    segments = pd.DataFrame({
+        "inicio": daily.index[starts],
+        "fin": daily.index[ends - 1],
+        "desfase_min": level[starts] * threshold_minutes,
+        "deriva_min_dia": np.round(slope, 3),
+    })
+
+    return {
+        "daily": daily,
+        "constant_offset": float(np.median(y)),
+        "segments": segments,
+    }
+
+
+def regularize_time_grid(
+    df: pd.DataFrame,
+    longitude: float,
+    gmt: int,
+    interval: pd.Timedelta | None = None,
+    tolerance: pd.Timedelta = pd.Timedelta(seconds=60),
+    label: str = "end",
+    smoothing_days: int = 15,
+    threshold_minutes: float = 10.0,
+    correct_clock: bool = False,
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Lleva un DataFrame ordenado por índice datetime a una malla regular:
+      1. detecta el intervalo nominal (si no se indica)
+      2. detecta desfases constantes y tramos de deriva con la GHI
+         (y, si correct_clock=True, corrige cada tramo a múltiplos del intervalo)
+      3. ajusta a la malla las marcas que estén a menos de `tolerance`
+         (p. ej. 10:09:58 → 10:10:00) y descarta las que queden fuera
+      4. conserva la primera marca si dos caen en la misma celda
+      5. reindexa a la malla completa, con NaN explícitos en los huecos
+    Cada paso es lineal en el número de registros.
+
+    Devuelve (df_regular, reporte).
+    """
+    if df.empty or len(df) < 2:
+        return df, {"intervalo": None}
+    if interval is None:
+        interval = detect_interval(df.index)
+    step = interval.value
+    t = df.index.as_unit("ns").asi8.copy()
+
+    # 2) desfase de reloj a partir del mediodía solar
+    clock = detect_clock_offsets(
+        df, longitude, gmt, interval,
+        label=label, smoothing_days=smoothing_days, threshold_minutes=threshold_minutes,
+    )
+    corrected = 0
+    segments = clock["segments"]
+    if correct_clock and not segments.empty:
+        # cada día toma la corrección de su tramo (tramos ordenados por inicio)
+        bounds = segments["inicio"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+        seg = np.clip(np.searchsorted(bounds, t, side="right") - 1, 0, len(bounds) - 1)
+        shift_steps = np.round(segments["desfase_min"].to_numpy() * 60 * NS_PER_S / step).astype(np.int64)
+        delta = shift_steps[seg] * step
+        corrected = int(np.count_nonzero(delta))
+        t = t - delta
+
+    # 3) ajuste a la malla
+    snapped = (t + step // 2) // step * step
+    near = np.abs(t - snapped) <= tolerance.value
+    if not near.any():
+        raise ValueError(f"Ninguna marca de tiempo cae en la malla de {interval}.")
+    n_snapped = int(np.count_nonzero(near & (snapped != t)))
+    n_offgrid = int(np.count_nonzero(~near))
+
+    values = df.to_numpy()[near]
+    snapped = snapped[near]
+    order = np.argsort(snapped, kind="stable") if correct_clock else None
+    if order is not None:
+        snapped, values = snapped[order], values[order]
+
+    # 4) duplicados tras el ajuste
+    keep = np.r_[True, snapped[1:] != snapped[:-1]]
+    n_dups = int(np.count_nonzero(~keep))
+    snapped, values = snapped[keep], values[keep]
+
+    # 5) malla completa con NaN explícitos
+    first, last = snapped[0], snapped[-1]
+    n_grid = int((last - first) // step) + 1
+    grid = np.full((n_grid, values.shape[1]), np.nan)
+    grid[(snapped - first) // step] = values
+    index = pd.DatetimeIndex(first + np.arange(n_grid, dtype=np.int64) * step, name=df.index.name)
+    out = pd.DataFrame(grid, index=index, columns=df.columns)
+
+    report = {
+        "intervalo": interval,
+        "marcas_ajustadas": n_snapped,
+        "marcas_fuera_de_malla": n_offgrid,
+        "duplicados_tras_ajuste": n_dups,
+        "huecos_insertados": n_grid - len(snapped),
+        "marcas_corregidas_por_reloj": corrected,
+        "desfase_constante_min": round(clock["constant_offset"], 2),
+        # lista de registros: df.attrs no admite DataFrames (pandas los compara con ==)
+        "tramos_reloj": segments.to_dict("records"),
+    }
+    return out, report
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# versión del formato/algoritmo del año típico: cambiarla invalida las
+# entradas guardadas en disco
+CACHE_VERSION = 1
+_MEMO_SIZE = 8
+
+_memo: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def data_fingerprint(df: pd.DataFrame, cols) -> str:
+    """
+    Hash del contenido (índice y columnas `cols`) de un DataFrame: cambia
+    si cambia cualquier marca de tiempo o valor, no si se recrea el objeto.
+    SHA-256 porque suele tener aceleración por hardware (~2.5 veces más
+    rápido que blake2b sobre varios años de datos de 10 min).
+    """
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(pd.DatetimeIndex(df.index).as_unit("ns").asi8).view(np.uint8))
+    for col in cols:
+        h.update(col.encode())
+        h.update(np.ascontiguousarray(df[col].to_numpy(dtype=float)).view(np.uint8))
+    return h.hexdigest()[:32]
+
+
+def cache_key(fingerprint: str, settings: dict) -> str:
+    """Llave del caché: contenido de los datos + parámetros que afectan el resultado."""
+    payload = json.dumps({"v": CACHE_VERSION, "data": fingerprint, "settings": settings},
+                         sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _disk_path(cache_dir, key: str) -> Path:
+    return Path(cache_dir) / f"tmy_{key}.npz"
+
+
+def _read_disk(path: Path) -> pd.DataFrame | None:
+    try:
+        with np.load(path) as npz:
+            return pd.DataFrame({name: npz[name] for name in npz.files})
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_disk(path: Path, df: pd.DataFrame) -> None:
+    """Escritura atómica (archivo temporal + os.replace), segura entre sesiones."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".npz")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **{c: df[c].to_numpy() for c in df.columns})
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def cached_frame(key: str, builder, cache_dir=None) -> pd.DataFrame:
+    """
+    Devuelve una copia del DataFrame guardado con `key`; si no existe en
+    memoria busca en `cache_dir` y, si tampoco, lo construye con `builder()`
+    y lo guarda en ambos. La memoria guarda las últimas entradas usadas.
+    """
+    with _lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key].copy()
+
+    df = None
+    path = _disk_path(cache_dir, key) if cache_dir else None
+    if path is not None and path.exists():
+        df = _read_disk(path)
+    if df is None:
+        df = builder()
+        if path is not None:
+            _write_disk(path, df)
+
+    with _lock:
+        _memo[key] = df
+        _memo.move_to_end(key)
+        while len(_memo) > _MEMO_SIZE:
+            _memo.popitem(last=False)
+    return df.copy()
+
+
+def clear_memory_cache() -> None:
+    """Vacía el caché en memoria (el de disco se conserva)."""
+    with _lock:
+        _memo.clear()
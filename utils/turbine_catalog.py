@@ -0,0 +1,274 @@
+import csv
+import json
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+# nombres de columna aceptados al importar bibliotecas de turbinas de SAM
+# (CSV "Wind Turbines.csv": arreglos separados por '|')
+_SAM_COLUMNS = {
+    "name": ("name",),
+    "rated_power": ("kw rating", "rated power", "rated_power", "kw"),
+    "rotor_diameter": ("rotor diameter", "rotor_diameter"),
+    "hub_height": ("hub height", "hub_height"),
+    "wind_speeds": ("wind speed array", "wind_speeds", "wind speed"),
+    "turbine_powers": ("power curve array", "turbine_powers", "power curve"),
+}
+
+
+def _parse_array(text: str) -> np.ndarray:
+    return np.array([float(v) for v in re.split(r"[|;\s]+", str(text).strip()) if v], dtype=float)
+
+
+def validate_turbine(entry: dict) -> dict:
+    """
+    Normaliza y valida una turbina (formato de wind-turbines.json).
+    Lanza ValueError si la curva de potencia no sirve para PySAM:
+    velocidades y potencias de igual largo (≥ 2), finitas, velocidades
+    estrictamente crecientes y no negativas, alguna potencia positiva;
+    potencia nominal, altura de buje y diámetro positivos.
+    """
+    name = str(entry.get("name", "")).strip()
+    if not name:
+        raise ValueError("Turbina sin nombre.")
+    try:
+        speeds = np.asarray(entry["wind_speeds"], dtype=float)
+        powers = np.asarray(entry["turbine_powers"], dtype=float)
+        rated = float(entry["rated_power"])
+        hub = float(entry["hub_height"])
+        rotor = float(entry["rotor_diameter"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"{name}: dato faltante o no numérico ({e}).") from None
+
+    if speeds.ndim != 1 or speeds.shape != powers.shape or len(speeds) < 2:
+        raise ValueError(f"{name}: la curva de potencia debe tener ≥ 2 puntos y el mismo largo en velocidad y potencia.")
+    if not (np.isfinite(speeds).all() and np.isfinite(powers).all()):
+        raise ValueError(f"{name}: la curva de potencia tiene valores no finitos.")
+    if speeds[0] < 0 or not np.all(np.diff(speeds) > 0):
+        raise ValueError(f"{name}: las velocidades de la curva deben ser no negativas y crecientes.")
+    if powers.max() <= 0:
+        raise ValueError(f"{name}: la curva de potencia no tiene potencia positiva.")
+    if min(rated, hub, rotor) <= 0:
+        raise ValueError(f"{name}: potencia nominal, altura de buje y diámetro deben ser positivos.")
+    return {
+        "name": name,
+        "rated_power": rated,
+        "hub_height": hub,
+        "rotor_diameter": rotor,
+        "wind_speeds": speeds,
+        "turbine_powers": powers,
+    }
+
+
+class TurbineCatalog:
+    """
+    Catálogo de turbinas validado y en arreglos NumPy:
+      - rated_power, hub_height, rotor_diameter: un valor por turbina
+      - curvas concatenadas (speeds, powers) con `offsets`, para cientos de
+        curvas sin un arreglo por objeto
+    Índices: por nombre (dict) y por potencia nominal y altura de buje
+    (órdenes precalculados, los rangos se resuelven con searchsorted).
+
+    Uso:
+        cat = load_turbine_catalog()
+        cat.names                          # para los selectores de la UI
+        cat["VestasV47 660kW-47"]          # dict como en wind-turbines.json
+        cat.filter(min_power=100, max_hub_height=60).names
+    """
+
+    def __init__(self, entries, skipped=None):
+        entries = list(entries)
+        names = [e["name"] for e in entries]
+        dup = {n for n, c in Counter(names).items() if c > 1}
+        if dup:
+            raise ValueError(f"Turbinas repetidas en el catálogo: {', '.join(sorted(dup))}")
+        self.names = names
+        self._index = {n: i for i, n in enumerate(names)}
+        self.rated_power = np.array([e["rated_power"] for e in entries], dtype=float)
+        self.hub_height = np.array([e["hub_height"] for e in entries], dtype=float)
+        self.rotor_diameter = np.array([e["rotor_diameter"] for e in entries], dtype=float)
+        lengths = [len(e["wind_speeds"]) for e in entries]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.intp)
+        self.speeds = np.concatenate([e["wind_speeds"] for e in entries]) if entries else np.empty(0)
+        self.powers = np.concatenate([e["turbine_powers"] for e in entries]) if entries else np.empty(0)
+        self._by_power = np.argsort(self.rated_power, kind="stable")
+        self._by_hub = np.argsort(self.hub_height, kind="stable")
+        # turbinas descartadas al importar: [(nombre, motivo)]
+        self.skipped = list(skipped or [])
+
+    @classmethod
+    def from_entries(cls, raw_entries, strict: bool = True) -> "TurbineCatalog":
+        """Valida las entradas; con strict=False las inválidas se omiten (ver .skipped)."""
+        entries, skipped, seen = [], [], set()
+        for raw in raw_entries:
+            try:
+                entry = validate_turbine(raw)
+            except ValueError as e:
+                if strict:
+                    raise
+                skipped.append((str(raw.get("name", "")), str(e)))
+                continue
+            if entry["name"] in seen and not strict:
+                skipped.append((entry["name"], "nombre repetido"))
+                continue
+            seen.add(entry["name"])
+            entries.append(entry)
+        return cls(entries, skipped)
+
+    @classmethod
+    def from_json(cls, path: str) -> "TurbineCatalog":
+        """Catálogo de wind-turbines.json (todas sus turbinas deben ser válidas)."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_entries(json.load(f), strict=True)
+
+    @classmethod
+    def from_sam_csv(cls, path: str) -> "TurbineCatalog":
+        """
+        Importa una biblioteca de turbinas de SAM (CSV con Name, kW Rating,
+        Rotor Diameter, Hub Height, Wind Speed Array, Power Curve Array;
+        arreglos separados por '|'). Las filas de unidades y las turbinas
+        inválidas se omiten y quedan en .skipped.
+        """
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))
+        if not rows:
+            return cls([])
+        header = [h.strip().lower() for h in rows[0]]
+        cols = {}
+        for key, aliases in _SAM_COLUMNS.items():
+            pos = next((header.index(a) for a in aliases if a in header), None)
+            if pos is None:
+                raise ValueError(f"La biblioteca '{path}' no tiene la columna '{aliases[0]}'.")
+            cols[key] = pos
+
+        raw = []
+        for row in rows[1:]:
+            if len(row) < len(header):
+                continue
+            try:
+                float(row[cols["rated_power"]])
+            except ValueError:
+                continue  # filas de unidades/descripciones
+            entry = {k: row[i] for k, i in cols.items()}
+            try:
+                entry["wind_speeds"] = _parse_array(entry["wind_speeds"])
+                entry["turbine_powers"] = _parse_array(entry["turbine_powers"])
+            except ValueError:
+                entry["wind_speeds"] = entry["turbine_powers"] = []
+            raw.append(entry)
+        return cls.from_entries(raw, strict=False)
+
+    def merge(self, other: "TurbineCatalog") -> "TurbineCatalog":
+        """Catálogo con las turbinas de ambos; las de `self` ganan si se repite el nombre."""
+        extra = [other.get(n) for n in other.names if n not in self._index]
+        return TurbineCatalog(
+            [self.get(n) for n in self.names] + extra,
+            skipped=self.skipped + other.skipped,
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._index
+
+    def positions(self, names) -> np.ndarray:
+        """Posición en el catálogo de cada nombre de `names` (para indexar los arreglos)."""
+        return np.array([self._index[n] for n in names], dtype=np.intp)
+
+    def curve(self, name: str) -> tuple[np.ndarray, np.ndarray]:
+        """Velocidades y potencias de la curva (vistas, sin copia)."""
+        i = self._index[name]
+        sl = slice(self.offsets[i], self.offsets[i + 1])
+        return self.speeds[sl], self.powers[sl]
+
+    def get(self, name: str) -> dict:
+        """Turbina con los arreglos NumPy de su curva."""
+        i = self._index[name]
+        speeds, powers = self.curve(name)
+        return {
+            "name": name,
+            "rated_power": float(self.rated_power[i]),
+            "hub_height": float(self.hub_height[i]),
+            "rotor_diameter": float(self.rotor_diameter[i]),
+            "wind_speeds": speeds,
+            "turbine_powers": powers,
+        }
+
+    def __getitem__(self, name: str) -> dict:
+        """Turbina en el formato de wind-turbines.json (listas), lista para PySAM."""
+        t = self.get(name)
+        t["wind_speeds"] = t["wind_speeds"].tolist()
+        t["turbine_powers"] = t["turbine_powers"].tolist()
+        return t
+
+    def _range(self, order: np.ndarray, values: np.ndarray, lo, hi) -> np.ndarray:
+        sorted_vals = values[order]
+        start = 0 if lo is None else np.searchsorted(sorted_vals, lo, side="left")
+        stop = len(order) if hi is None else np.searchsorted(sorted_vals, hi, side="right")
+        keep = np.zeros(len(order), dtype=bool)
+        keep[order[start:stop]] = True
+        return keep
+
+    def select(
+        self,
+        min_power: float | None = None,
+        max_power: float | None = None,
+        min_hub_height: float | None = None,
+        max_hub_height: float | None = None,
+        name_contains: str | None = None,
+    ) -> np.ndarray:
+        """Posiciones (en el orden del catálogo) de las turbinas dentro de los rangos dados."""
+        keep = self._range(self._by_power, self.rated_power, min_power, max_power)
+        keep &= self._range(self._by_hub, self.hub_height, min_hub_height, max_hub_height)
+        if name_contains:
+            needle = name_contains.lower()
+            keep &= np.array([needle in n.lower() for n in self.names], dtype=bool)
+        return np.flatnonzero(keep)
+
+    def filter(self, **criteria) -> "TurbineCatalog":
+        """Sub-catálogo con las turbinas de select(**criteria)."""
+        return TurbineCatalog([self.get(self.names[i]) for i in self.select(**criteria)])
+
+
+def _mtime(path: str | None) -> float | None:
+    return os.path.getmtime(path) if path else None
+
+
+@lru_cache(maxsize=8)
+def _load_catalog(path: str, mtime: float, library: str | None, library_mtime: float | None) -> TurbineCatalog:
+    catalog = TurbineCatalog.from_json(path)
+    if library:
+        catalog = catalog.merge(TurbineCatalog.from_sam_csv(library))
+    return catalog
+
+
+def load_turbine_catalog(
+    path: str = "wind_simulation/wind-turbines.json",
+    library: str | None = None,
+) -> TurbineCatalog:
+    """
+    Catálogo de `path` (más la biblioteca de SAM `library`, si se da),
+    cargado y validado una vez por proceso; se vuelve a leer sólo si
+    cambia la fecha de modificación de los archivos. No modificar el
+    objeto devuelto: se comparte entre llamadas.
+    """
+    return _load_catalog(path, _mtime(path), library or None, _mtime(library))
+
+
+@lru_cache(maxsize=8)
+def _load_inputs(path: str, mtime: float) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_windpower_inputs(path: str = "wind_simulation/windpower-inputs.json") -> dict:
+    """
+    Parámetros base de PySAM (windpower-inputs.json), leídos una vez por
+    proceso. Devuelve un dict nuevo, pero sus listas se comparten: no
+    modificarlas.
+    """
+    return dict(_load_inputs(path, _mtime(path)))
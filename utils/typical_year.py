@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from utils.data_window import as_window
+
+# Año típico: una casilla por (día del año bisiesto, hora). Se guardan las 366
+# casillas para que el 29-Feb cuente en los perfiles horarios, como en los
+# groupby originales; las vistas por día del año (365) lo omiten.
+N_SLOTS = 366
+N_HOURS = 24
+FEB29 = 59
+_MONTH_OFFSETS = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+SLOT_MONTH = np.repeat(np.arange(1, 13), [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+SLOT_DAY = np.arange(N_SLOTS) - _MONTH_OFFSETS[SLOT_MONTH - 1] + 1
+# casillas de los 365 días (sin 29-Feb) y su fecha en el año de referencia 2001
+YEAR_SLOTS = np.delete(np.arange(N_SLOTS), FEB29)
+DATES_2001 = pd.date_range("2001-01-01", periods=365, freq="D")
+
+
+def slot_of(month: int, day: int) -> int:
+    """Casilla (0 … 365) de una fecha mes/día en el calendario bisiesto."""
+    return int(_MONTH_OFFSETS[month - 1] + day - 1)
+
+
+def _std(n, s, ss):
+    """Desviación estándar muestral (ddof=1) a partir de conteo, suma y suma de cuadrados."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (ss - s * s / n) / (n - 1)
+    var = np.where(n > 1, np.maximum(var, 0.0), np.nan)
+    return np.sqrt(var)
+
+
+class TypicalYear:
+    """
+    Acumuladores de una variable por casilla día del año × hora, de forma
+    (366, 24):
+      - rows: registros en la casilla (con o sin dato)
+      - count, total, total_sq: conteo, suma y suma de cuadrados de los datos
+        válidos (centrados en `shift` para estabilidad numérica)
+    La media y la desviación por celda, el perfil diario y el horario salen
+    de sumas sobre estos arreglos, sin volver a recorrer los datos.
+    """
+
+    def __init__(self, rows, count, total, total_sq, shift=0.0):
+        self.rows = rows
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+        self.shift = shift
+
+    @classmethod
+    def from_values(cls, index: pd.DatetimeIndex, values: np.ndarray) -> "TypicalYear":
+        """Acumula `values` (alineados con `index`) en una sola pasada con bincount."""
+        values = np.asarray(values, dtype=float)
+        ns = index.as_unit("ns").asi8
+        days = ns // (86_400 * 10**9)
+        hour = (ns - days * 86_400 * 10**9) // (3_600 * 10**9)
+        dates = days.astype("datetime64[D]")
+        months = dates.astype("datetime64[M]")
+        month = months.astype(np.int64) % 12 + 1
+        day = (dates - months.astype("datetime64[D]")).astype(np.int64) + 1
+        code = (_MONTH_OFFSETS[month - 1] + day - 1) * N_HOURS + hour
+
+        size = N_SLOTS * N_HOURS
+        valid = ~np.isnan(values)
+        shift = float(values[valid].mean()) if valid.any() else 0.0
+        x = values[valid] - shift
+        cv = code[valid]
+        shape = (N_SLOTS, N_HOURS)
+        return cls(
+            np.bincount(code, minlength=size).reshape(shape),
+            np.bincount(cv, minlength=size).reshape(shape),
+            np.bincount(cv, weights=x, minlength=size).reshape(shape),
+            np.bincount(cv, weights=x * x, minlength=size).reshape(shape),
+            shift,
+        )
+
+    @classmethod
+    def from_window(cls, window, col: str) -> "TypicalYear":
+        """Atajo para una DataWindow (o DataFrame) y una columna."""
+        win = as_window(window)
+        return cls.from_values(win.index, win.values(col))
+
+    def months(self, months) -> "TypicalYear":
+        """Copia restringida a ciertos meses (p. ej. una estación)."""
+        keep = np.isin(SLOT_MONTH, list(months))[:, None]
+        return TypicalYear(
+            np.where(keep, self.rows, 0),
+            np.where(keep, self.count, 0),
+            np.where(keep, self.total, 0.0),
+            np.where(keep, self.total_sq, 0.0),
+            self.shift,
+        )
+
+    def _mean(self, n, s):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(n > 0, s / n + self.shift, np.nan)
+
+    def cell_mean(self) -> np.ndarray:
+        """Media por casilla (366, 24); NaN donde no hay datos."""
+        return self._mean(self.count, self.total)
+
+    def daily_mean(self) -> np.ndarray:
+        """Media de cada día del año (366,), con todas sus horas."""
+        return self._mean(self.count.sum(axis=1), self.total.sum(axis=1))
+
+    def daily_std(self) -> np.ndarray:
+        return _std(self.count.sum(axis=1), self.total.sum(axis=1), self.total_sq.sum(axis=1))
+
+    def hourly_mean(self) -> np.ndarray:
+        """Perfil horario típico (24,), con todos los días."""
+        return self._mean(self.count.sum(axis=0), self.total.sum(axis=0))
+
+    def hourly_std(self) -> np.ndarray:
+        return _std(self.count.sum(axis=0), self.total.sum(axis=0), self.total_sq.sum(axis=0))
+
+    def day_present(self) -> np.ndarray:
+        """Días del año (366,) con al menos un registro."""
+        return self.rows.sum(axis=1) > 0
+
+    def hour_present(self, slots=None) -> np.ndarray:
+        """Horas (24,) con al menos un registro en las casillas `slots`."""
+        rows = self.rows if slots is None else self.rows[slots]
+        return rows.sum(axis=0) > 0
+
+
+def typical_year(df, col: str, start=None, end=None) -> TypicalYear:
+    """Acumuladores de año típico de `col` en el rango [start, end] de un DataFrame o DataWindow."""
+    return TypicalYear.from_window(as_window(df, start, end), col)
@@ -0,0 +1,210 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils.wind_bins import sector_codes, rose_histogram
+
+
+def fit_weibull(speed, groups=None, n_groups: int = 1, tol: float = 1e-6, max_iter: int = 50):
+    """
+    Ajuste de Weibull (k, c) por máxima verosimilitud para cada grupo de
+    muestras (p. ej. el sector de dirección), resolviendo todos los grupos a
+    la vez: cada iteración de Newton es un np.bincount por suma, sin ciclo
+    por grupo.
+
+    La ecuación de verosimilitud para k es
+        f(k) = Σ xᵏ ln x / Σ xᵏ − 1/k − media(ln x) = 0
+    (creciente en k, con raíz única) y luego c = (Σ xᵏ / n)^(1/k).
+
+    - speed: velocidades; NaN y calmas (≤ 0) no entran al ajuste
+    - groups: código 0 … n_groups-1 por muestra (o negativo para excluirla);
+      None ajusta un solo grupo
+    Devuelve (k, c, n) como arreglos de largo n_groups; k y c son NaN en los
+    grupos con menos de 2 muestras o sin dispersión.
+    """
+    x = np.asarray(speed, dtype=float)
+    g = np.zeros(len(x), dtype=np.intp) if groups is None else np.asarray(groups, dtype=np.intp)
+    keep = (x > 0) & (g >= 0)                        # NaN > 0 es falso
+    x, g = x[keep], g[keep]
+
+    n = np.bincount(g, minlength=n_groups).astype(float)
+    k = np.full(n_groups, np.nan)
+    c = np.full(n_groups, np.nan)
+    if not len(x):
+        return k, c, n
+
+    # el ajuste de k no depende de la escala: se normaliza para que xᵏ no
+    # se desborde con k grandes
+    scale = x.mean()
+    lx = np.log(x / scale)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_lx = np.bincount(g, weights=lx, minlength=n_groups) / n
+        var_lx = np.bincount(g, weights=lx * lx, minlength=n_groups) / n - mean_lx ** 2
+    ok = (n >= 2) & (var_lx > 1e-12)
+    if not ok.any():
+        return k, c, n
+
+    # arranque: aproximación de momentos de ln x (var = π²/6k²)
+    k = np.where(ok, np.pi / np.sqrt(6 * np.where(ok, var_lx, 1.0)), np.nan)
+    active = ok.copy()
+    for _ in range(max_iter):
+        kg = np.where(ok, k, 1.0)[g]
+        w = np.exp(kg * lx)
+        s0 = np.bincount(g, weights=w, minlength=n_groups)
+        s1 = np.bincount(g, weights=w * lx, minlength=n_groups)
+        s2 = np.bincount(g, weights=w * lx * lx, minlength=n_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = s1 / s0
+            f = r - 1 / k - mean_lx
+            df = (s2 / s0 - r * r) + 1 / (k * k)
+            step = f / df
+        # Newton con salvaguarda: k se mantiene positivo
+        k_new = np.where(active, np.maximum(k - step, k / 2), k)
+        delta = np.abs(k_new - k)
+        k = k_new
+        active &= ~(delta <= tol * k)
+        if not active.any():
+            break
+
+    kg = np.where(ok, k, 1.0)[g]
+    s0 = np.bincount(g, weights=np.exp(kg * lx), minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        c = np.where(ok, scale * (s0 / n) ** (1 / k), np.nan)
+    return np.where(ok, k, np.nan), c, n
+
+
+def weibull_mean(k, c):
+    """Velocidad media de una Weibull(k, c): c·Γ(1 + 1/k)."""
+    k = np.asarray(k, dtype=float)
+    gamma = np.vectorize(lambda v: math.gamma(v) if np.isfinite(v) else np.nan, otypes=[float])
+    return np.asarray(c, dtype=float) * gamma(1 + 1 / k)
+
+
+def sector_centers(dir_bins: int = 16) -> np.ndarray:
+    """Centro (grados) de cada sector, con la convención de sector_codes."""
+    width = 360 / dir_bins
+    return np.arange(dir_bins) * width + width / 2
+
+
+def sector_weibull(direction, speed, dir_bins: int = 16):
+    """
+    Weibull por sector de dirección y del conjunto, a partir de la estación.
+    Devuelve (sectores, total):
+      - sectores: DataFrame indexado por el centro del sector con
+        frecuencia (fracción de las muestras válidas), k, c, media (m/s)
+        y n (muestras con viento)
+      - total: dict con las mismas llaves para todas las direcciones, más
+        la fracción de calmas (velocidad 0, fuera del ajuste)
+    """
+    d = np.asarray(direction, dtype=float)
+    s = np.asarray(speed, dtype=float)
+    sector = sector_codes(d, dir_bins, invalid=-1)
+    sector[np.isnan(s)] = -1
+    valid = sector >= 0
+    n_valid = int(valid.sum())
+    if n_valid == 0:
+        raise ValueError("No hay muestras con velocidad y dirección para ajustar la Weibull.")
+
+    k, c, n = fit_weibull(s, sector, dir_bins)
+    freq = np.bincount(sector[valid], minlength=dir_bins) / n_valid
+    sectores = pd.DataFrame(
+        {"frecuencia": freq, "k": k, "c": c, "media": weibull_mean(k, c), "n": n.astype(int)},
+        index=pd.Index(sector_centers(dir_bins), name="Dirección"),
+    )
+
+    k_all, c_all, n_all = fit_weibull(s[valid])
+    total = {
+        "frecuencia": 1.0,
+        "k": float(k_all[0]),
+        "c": float(c_all[0]),
+        "media": float(weibull_mean(k_all, c_all)[0]),
+        "n": int(n_all[0]),
+        "calmas": float((s[valid] <= 0).sum() / n_valid),
+    }
+    return sectores, total
+
+
+def _distribution_edges(speed: np.ndarray, speed_bins=None) -> np.ndarray:
+    """Límites de clase dados, o cada 1 m/s desde 0 hasta cubrir el máximo."""
+    if speed_bins is not None:
+        return np.asarray(speed_bins, dtype=float)
+    top = np.nanmax(speed) if np.isfinite(speed).any() else 0.0
+    return np.arange(0, np.floor(top) + 2, 1.0)
+
+
+def frequency_matrix(direction, speed, dir_bins: int = 16, speed_bins=None):
+    """
+    Matriz de frecuencias sector × clase de velocidad (fracciones que suman
+    1) de los datos de la estación, con el mismo núcleo que las rosas.
+    Por omisión las clases son de 1 m/s hasta cubrir la velocidad máxima.
+    Devuelve (freq, centros_velocidad, centros_dirección).
+    """
+    s = np.asarray(speed, dtype=float)
+    edges = _distribution_edges(s, speed_bins)
+    counts = rose_histogram(direction, s, dir_bins=dir_bins, speed_bins=edges)
+    total = counts.sum()
+    if total == 0:
+        raise ValueError("No hay muestras dentro de las clases de velocidad indicadas.")
+    return counts / total, (edges[:-1] + edges[1:]) / 2, sector_centers(dir_bins)
+
+
+def weibull_frequency_matrix(sectores: pd.DataFrame, speed_bins) -> np.ndarray:
+    """
+    Matriz sector × clase de velocidad a partir del ajuste por sector:
+    frecuencia del sector × (F(v₁) − F(v₀)) de su Weibull, renormalizada
+    para sumar 1. Suaviza la matriz empírica cuando hay pocos datos.
+    """
+    edges = np.asarray(speed_bins, dtype=float)
+    k = sectores["k"].to_numpy()[:, None]
+    c = sectores["c"].to_numpy()[:, None]
+    with np.errstate(invalid="ignore"):
+        cdf = 1 - np.exp(-(edges[None, :] / c) ** k)
+    freq = sectores["frecuencia"].to_numpy()[:, None] * np.diff(cdf, axis=1)
+    freq = np.nan_to_num(freq, nan=0.0)
+    return freq / freq.sum()
+
+
+def sam_distribution(freq, speed_centers, dir_centers) -> list[list[float]]:
+    """
+    Tabla `wind_resource_distribution` de SAM: una fila [velocidad,
+    dirección, frecuencia] por celda, agrupadas por dirección como en
+    windpower-inputs.json.
+    """
+    freq = np.asarray(freq, dtype=float)
+    dirs = np.repeat(np.asarray(dir_centers, dtype=float), len(speed_centers))
+    speeds = np.tile(np.asarray(speed_centers, dtype=float), len(dir_centers))
+    return np.column_stack([speeds, dirs, freq.ravel()]).tolist()
+
+
+def sam_resource_inputs(
+    direction,
+    speed,
+    height: float,
+    dir_bins: int = 16,
+    speed_bins=None,
+    from_fit: bool = False,
+) -> dict:
+    """
+    Entradas de PySAM.Windpower para el modo de distribución
+    (wind_resource_model_choice=2) con los datos de la estación, en lugar de
+    la tabla y la Weibull fijas de windpower-inputs.json. También fija
+    weibull_k_factor/weibull_wind_speed con el ajuste del conjunto.
+
+    - height: altura (m) a la que corresponden las velocidades
+    - from_fit: la tabla sale de las Weibull por sector en lugar de las
+      frecuencias observadas
+    """
+    speed = np.asarray(speed, dtype=float)
+    edges = _distribution_edges(speed, speed_bins)
+    sectores, total = sector_weibull(direction, speed, dir_bins)
+    freq, speed_centers, dir_centers = frequency_matrix(direction, speed, dir_bins, edges)
+    if from_fit:
+        freq = weibull_frequency_matrix(sectores, edges)
+    return {
+        "wind_resource_model_choice": 2,
+        "wind_resource_distribution": sam_distribution(freq, speed_centers, dir_centers),
+        "weibull_reference_height": float(height),
+        "weibull_k_factor": total["k"],
+        "weibull_wind_speed": total["media"],
+    }
@@ -0,0 +1,97 @@
+import numpy as np
+
+
+def _uniform_codes(x: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Clase de cada valor de `x` (ya dentro de [edges[0], edges[-1]) o NaN)
+    para límites equiespaciados, por aritmética: cociente truncado y una
+    corrección contra los bordes para reproducir exactamente pd.cut(right=False).
+    """
+    n = len(edges) - 1
+    width = edges[1] - edges[0]
+    with np.errstate(invalid="ignore"):
+        q = x / width if edges[0] == 0 else (x - edges[0]) / width
+        code = q.astype(np.intp)
+    np.clip(code, 0, n - 1, out=code)
+    code -= x < edges[code]
+    # con origen en 0 y bordes k·width exactos la división redondeada sólo
+    # puede pasarse hacia arriba; si no, también se corrige hacia abajo
+    if not (edges[0] == 0 and np.array_equal(edges, np.arange(n + 1) * width)):
+        code += x >= edges[np.minimum(code + 1, n)]
+    return code
+
+
+def _is_uniform(edges: np.ndarray) -> bool:
+    widths = np.diff(edges)
+    return len(widths) > 0 and bool(np.all(np.isfinite(edges))) and np.allclose(widths, widths[0])
+
+
+def sector_codes(direction: np.ndarray, dir_bins: int = 16, invalid: int = -1) -> np.ndarray:
+    """
+    Sector (0 … dir_bins-1) de cada dirección en grados, con la misma
+    convención que pd.cut(dir % 360, np.linspace(0, 360, dir_bins + 1),
+    right=False). Devuelve `invalid` donde la dirección es NaN.
+    """
+    d = np.asarray(direction, dtype=float)
+    # NaN también queda "fuera": las comparaciones con NaN son falsas
+    idx = np.flatnonzero(~((d >= 0) & (d < 360)))
+    if idx.size:
+        # sólo se normalizan los valores fuera de [0, 360)
+        vals = np.mod(d[idx], 360.0)
+        d = d.copy()
+        d[idx] = vals
+        idx = idx[np.isnan(vals)]
+    code = _uniform_codes(d, np.linspace(0, 360, dir_bins + 1))
+    code[idx] = invalid
+    return code
+
+
+def speed_codes(speed: np.ndarray, speed_bins, invalid: int = -1) -> np.ndarray:
+    """
+    Clase de velocidad de cada muestra con límites `speed_bins` cerrados a
+    la izquierda (como pd.cut(..., right=False)). Devuelve `invalid` para
+    NaN y valores fuera de [speed_bins[0], speed_bins[-1]).
+    Con límites equiespaciados la clase se obtiene por aritmética; si no,
+    por búsqueda binaria sobre los límites.
+    """
+    s = np.asarray(speed, dtype=float)
+    edges = np.asarray(speed_bins, dtype=float)
+    if _is_uniform(edges):
+        code = _uniform_codes(s, edges)
+    else:
+        code = np.searchsorted(edges, s, side="right") - 1
+    code[~((s >= edges[0]) & (s < edges[-1]))] = invalid
+    return code
+
+
+def rose_histogram(direction, speed, dir_bins: int = 16, speed_bins=None, groups=None, n_groups: int = 1) -> np.ndarray:
+    """
+    Núcleo de las rosas de viento: cuenta las muestras por sector × clase de
+    velocidad con un solo np.bincount sobre el índice 2-D aplanado.
+    Devuelve una matriz densa de enteros (dir_bins, len(speed_bins) - 1);
+    las muestras sin dirección o con velocidad fuera de los límites no cuentan.
+
+    Con `groups` (código entero 0 … n_groups-1 por muestra, p. ej. la
+    estación) el mismo bincount separa los conteos por grupo y el resultado
+    tiene forma (n_groups, dir_bins, len(speed_bins) - 1).
+    """
+    n_speed = len(speed_bins) - 1
+    # las muestras inválidas van a una fila/columna extra que se descarta,
+    # así no hace falta filtrar con máscaras antes del bincount
+    sector = sector_codes(direction, dir_bins, invalid=dir_bins)
+    klass = speed_codes(speed, speed_bins, invalid=n_speed)
+    flat = sector * (n_speed + 1)
+    flat += klass
+    cells = (dir_bins + 1) * (n_speed + 1)
+    if groups is None:
+        counts = np.bincount(flat, minlength=cells)
+        return counts.reshape(dir_bins + 1, n_speed + 1)[:dir_bins, :n_speed]
+    flat += np.asarray(groups, dtype=np.intp) * cells
+    counts = np.bincount(flat, minlength=n_groups * cells)
+    return counts.reshape(n_groups, dir_bins + 1, n_speed + 1)[:, :dir_bins, :n_speed]
+
+
+def default_speed_bins(speed) -> list[float]:
+    """Límites cada 1.5 m/s desde 0 hasta el múltiplo de 1.5 que cubre el máximo."""
+    upper = np.ceil(np.max(speed) / 1.5) * 1.5
+    return list(np.arange(0, upper + 1e-6, 1.5))
@@ -0,0 +1,281 @@
+import numpy as np
+import pandas as pd
+
+from utils.tmy_cache import data_fingerprint
+from utils.wind_bins import sector_codes, speed_codes
+
+# malla fija del cubo: 16 sectores y velocidades cada 1.5 m/s hasta 30 m/s,
+# más una clase ">30" y una para velocidad faltante (cuenta en la rosa de
+# sólo dirección)
+N_SECTORS = 16
+SPEED_STEP = 1.5
+SPEED_MAX = 30.0
+N_SPEED = int(round(SPEED_MAX / SPEED_STEP))
+OVERFLOW_BIN = N_SPEED
+MISSING_BIN = N_SPEED + 1
+N_BINS = N_SPEED + 2
+# límites de las clases; la última, [SPEED_MAX, inf), es OVERFLOW_BIN
+SPEED_EDGES = [*np.arange(0, SPEED_MAX + 1e-6, SPEED_STEP), np.inf]
+
+NS_PER_HOUR = 3_600 * 1_000_000_000
+NS_PER_DAY = 24 * NS_PER_HOUR
+DAYS_PER_CHUNK = 366
+
+
+def _codes(index: pd.DatetimeIndex, wd: np.ndarray, ws: np.ndarray):
+    """
+    Códigos enteros (día, hora, sector, clase) de cada muestra con dirección
+    válida; las velocidades negativas se descartan como en pd.cut.
+    """
+    t = index.as_unit("ns").asi8
+    sector = sector_codes(wd, N_SECTORS)
+    speed = speed_codes(ws, SPEED_EDGES)
+    speed[np.isnan(ws)] = MISSING_BIN
+    ok = (sector >= 0) & (speed >= 0)
+    t, sector, speed = t[ok], sector[ok], speed[ok]
+    day = t // NS_PER_DAY
+    hour = (t - day * NS_PER_DAY) // NS_PER_HOUR
+    return day, hour, sector, speed
+
+
+def build_cube_counts(df: pd.DataFrame, dir_col: str = "wd", speed_col: str = "ws"):
+    """
+    Cuenta las muestras de `df` en el cubo día × hora × sector × clase.
+    Devuelve (días datetime64[D], conteos uint16 de forma (días, 24, N_SECTORS, N_BINS)).
+    El bincount se hace por bloques de días para acotar la memoria temporal.
+    """
+    if df.empty:
+        return np.array([], dtype="datetime64[D]"), np.zeros((0, 24, N_SECTORS, N_BINS), np.uint16)
+    index = df.index if isinstance(df.index, pd.DatetimeIndex) else pd.to_datetime(df.index)
+    day, hour, sector, speed = _codes(
+        index,
+        df[dir_col].to_numpy(dtype=float),
+        df[speed_col].to_numpy(dtype=float),
+    )
+    if day.size == 0:
+        return np.array([], dtype="datetime64[D]"), np.zeros((0, 24, N_SECTORS, N_BINS), np.uint16)
+
+    day0 = day.min()
+    n_days = int(day.max() - day0) + 1
+    cell = ((hour * N_SECTORS) + sector) * N_BINS + speed
+    rel = day - day0
+    per_day = 24 * N_SECTORS * N_BINS
+
+    counts = np.zeros((n_days, 24, N_SECTORS, N_BINS), dtype=np.uint16)
+    flat = counts.reshape(n_days, per_day)
+    order = np.argsort(rel, kind="stable")
+    rel, cell = rel[order], cell[order]
+    for lo in range(0, n_days, DAYS_PER_CHUNK):
+        hi = min(lo + DAYS_PER_CHUNK, n_days)
+        a, b = np.searchsorted(rel, [lo, hi])
+        chunk = np.bincount((rel[a:b] - lo) * per_day + cell[a:b], minlength=(hi - lo) * per_day)
+        flat[lo:hi] = chunk.reshape(hi - lo, per_day)
+
+    days = (np.arange(n_days) + day0).astype("datetime64[D]")
+    return days, counts
+
+
+class WindCube:
+    """
+    Histograma precalculado de viento por día × hora × sector × clase de
+    velocidad. Cualquier rosa sobre un rango de fechas es una suma de
+    rebanadas: los totales diarios acumulados hacen que un periodo cueste
+    O(1) y un filtro por horas O(días).
+    """
+
+    def __init__(self, days: np.ndarray, counts: np.ndarray):
+        self.days = days.astype("datetime64[D]")
+        self.counts = counts
+        daily = counts.sum(axis=1, dtype=np.int64)
+        self._cumulative = np.concatenate(
+            [np.zeros((1, N_SECTORS, N_BINS), np.int64), np.cumsum(daily, axis=0)]
+        )
+
+    @property
+    def empty(self) -> bool:
+        return len(self.days) == 0
+
+    def _day_slice(self, start=None, end=None) -> slice:
+        """Posiciones de los días en [start, end] (ambos inclusive) por búsqueda binaria."""
+        lo = 0 if start is None else np.searchsorted(self.days, np.datetime64(pd.Timestamp(start).date(), "D"))
+        hi = len(self.days) if end is None else np.searchsorted(
+            self.days, np.datetime64(pd.Timestamp(end).date(), "D"), side="right"
+        )
+        return slice(int(lo), int(hi))
+
+    def rose_counts(self, start=None, end=None, hours=None, months=None) -> np.ndarray:
+        """
+        Matriz (N_SECTORS, N_BINS) de conteos en [start, end], opcionalmente
+        restringida a ciertas horas del día y/o meses.
+        """
+        sl = self._day_slice(start, end)
+        if hours is None and months is None:
+            return self._cumulative[sl.stop] - self._cumulative[sl.start]
+        block = self.counts[sl]
+        if months is not None:
+            day_months = (self.days[sl].astype("datetime64[M]").astype(int) % 12) + 1
+            block = block[np.isin(day_months, list(months))]
+        if hours is not None:
+            block = block[:, list(hours)]
+        return block.sum(axis=(0, 1), dtype=np.int64)
+
+    def period(self):
+        """Primer y último día con datos."""
+        if self.empty:
+            return None, None
+        return pd.Timestamp(self.days[0]), pd.Timestamp(self.days[-1])
+
+
+def speed_edges_for(counts: np.ndarray) -> list[float]:
+    """
+    Límites de velocidad dinámicos (cada 1.5 m/s hasta la última clase con
+    datos), iguales a los que create_wind_rose_by_speed calcula con el máximo.
+    """
+    used = np.flatnonzero(counts[:, :OVERFLOW_BIN + 1].sum(axis=0))
+    last = int(used[-1]) if used.size else 0
+    return list(np.arange(0, (last + 1) * SPEED_STEP + 1e-6, SPEED_STEP))
+
+
+# --- persistencia en DuckDB -------------------------------------------------
+
+_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS rosa_cubo (
+        fecha DATE,
+        hora TINYINT,
+        sector TINYINT,
+        clase TINYINT,
+        conteo INTEGER,
+        PRIMARY KEY (fecha, hora, sector, clase)
+    );
+"""
+
+
+_META_SQL = """
+    CREATE TABLE IF NOT EXISTS rosa_cubo_huella (
+        huella VARCHAR
+    );
+"""
+
+
+def _stored_fingerprint(con) -> str | None:
+    con.execute(_META_SQL)
+    row = con.execute("SELECT huella FROM rosa_cubo_huella LIMIT 1;").fetchone()
+    return None if row is None else row[0]
+
+
+def _save_fingerprint(con, fingerprint: str | None) -> None:
+    con.execute(_META_SQL)
+    con.execute("DELETE FROM rosa_cubo_huella;")
+    if fingerprint is not None:
+        con.execute("INSERT INTO rosa_cubo_huella VALUES (?);", [fingerprint])
+
+
+def _to_long(days: np.ndarray, counts: np.ndarray) -> pd.DataFrame:
+    d, h, s, c = np.nonzero(counts)
+    return pd.DataFrame({
+        "fecha": days[d],
+        "hora": h.astype(np.int8),
+        "sector": s.astype(np.int8),
+        "clase": c.astype(np.int8),
+        "conteo": counts[d, h, s, c].astype(np.int32),
+    })
+
+
+def save_wind_cube(con, days: np.ndarray, counts: np.ndarray) -> None:
+    """
+    Guarda (reemplaza) en la tabla 'rosa_cubo' los días incluidos en `days`.
+    Sólo se almacenan las celdas distintas de cero.
+    """
+    con.execute(_TABLE_SQL)
+    if len(days) == 0:
+        return
+    con.execute(
+        "DELETE FROM rosa_cubo WHERE fecha BETWEEN ? AND ?;",
+        [pd.Timestamp(days[0]).date(), pd.Timestamp(days[-1]).date()],
+    )
+    long_df = _to_long(days, counts)
+    con.register("tmp_cubo", long_df)
+    con.execute("INSERT INTO rosa_cubo SELECT * FROM tmp_cubo;")
+    con.unregister("tmp_cubo")
+
+
+def load_wind_cube(con) -> WindCube:
+    """Reconstruye el cubo denso a partir de la tabla 'rosa_cubo'."""
+    con.execute(_TABLE_SQL)
+    long_df = con.execute(
+        "SELECT fecha, hora, sector, clase, conteo FROM rosa_cubo ORDER BY fecha"
+    ).df()
+    if long_df.empty:
+        return WindCube(np.array([], dtype="datetime64[D]"), np.zeros((0, 24, N_SECTORS, N_BINS), np.uint16))
+    fechas = long_df["fecha"].to_numpy().astype("datetime64[D]")
+    day0 = fechas.min()
+    rel = (fechas - day0).astype(np.int64)
+    n_days = int(rel.max()) + 1
+    counts = np.zeros((n_days, 24, N_SECTORS, N_BINS), dtype=np.uint16)
+    counts[rel, long_df["hora"].to_numpy(), long_df["sector"].to_numpy(), long_df["clase"].to_numpy()] = \
+        long_df["conteo"].to_numpy()
+    days = day0 + np.arange(n_days)
+    return WindCube(days, counts)
+
+
+def _wind_fingerprint(df: pd.DataFrame, dir_col: str = "wd", speed_col: str = "ws") -> str:
+    """
+    Huella (data_fingerprint) de las marcas con dirección o velocidad: no
+    depende de las marcas en que sólo hay otras variables, así coincide
+    la del DataFrame ancho de la app con la de _read_wind.
+    """
+    wind = df[[dir_col, speed_col]].dropna(how="all")
+    return data_fingerprint(wind, [dir_col, speed_col])
+
+
+def _read_wind(con, start=None, end=None) -> pd.DataFrame:
+    """
+    Dirección y velocidad de la tabla 'lecturas' en forma ancha (índice
+    fecha ordenado, columnas wd y ws), igual que el pivote de la app;
+    opcionalmente sólo en [start, end).
+    """
+    sql = "SELECT fecha, variable, valor FROM lecturas WHERE variable IN ('wd', 'ws')"
+    params = []
+    if start is not None:
+        sql += " AND fecha >= ? AND fecha < ?"
+        params = [pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime()]
+    df = con.execute(sql, params).df()
+    wide = df.pivot(index="fecha", columns="variable", values="valor").reindex(columns=["wd", "ws"])
+    wide.index = pd.to_datetime(wide.index)
+    return wide.sort_index()
+
+
+def update_wind_cube(con, start, end) -> None:
+    """
+    Recalcula el cubo para los días entre `start` y `end` a partir de la tabla
+    'lecturas' (incremental: sólo se leen y reescriben esos días) y guarda
+    la huella de los datos completos de viento, para que
+    load_or_build_wind_cube use el cubo sin reconstruirlo.
+    """
+    d0 = pd.Timestamp(start).normalize()
+    d1 = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+    wide = _read_wind(con, d0, d1)
+    if wide.empty:
+        return
+    days, counts = build_cube_counts(wide)
+    save_wind_cube(con, days, counts)
+    _save_fingerprint(con, _wind_fingerprint(_read_wind(con)))
+
+
+def load_or_build_wind_cube(con, esolmet: pd.DataFrame, dir_col: str = "wd", speed_col: str = "ws") -> WindCube:
+    """
+    Carga el cubo persistido si se construyó con los mismos datos que
+    `esolmet` (misma huella de contenido de dirección y velocidad, ver
+    _wind_fingerprint); si no existe, o los datos cambiaron aunque sea
+    dentro del mismo periodo, lo reconstruye completo y lo guarda con la
+    huella nueva.
+    """
+    fingerprint = _wind_fingerprint(esolmet, dir_col, speed_col)
+    if _stored_fingerprint(con) == fingerprint:
+        return load_wind_cube(con)
+    days, counts = build_cube_counts(esolmet, dir_col, speed_col)
+    con.execute(_TABLE_SQL)
+    con.execute("DELETE FROM rosa_cubo;")
+    save_wind_cube(con, days, counts)
+    _save_fingerprint(con, fingerprint)
+    return WindCube(days, counts)
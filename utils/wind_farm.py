@@ -0,0 +1,409 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from utils.config import load_settings, load_wind_resource_settings, load_wind_farm_settings
+from utils.plot_payload import compact_figure
+from utils.sam_windpower import simulate_many
+from utils.weibull import frequency_matrix
+from utils.wind_resource import hub_resource, density_equivalent_speed
+from utils.wind_rose import _load_catalog_and_inputs, _resource_inputs
+
+# modelos de estela de SAM (wind_farm_wake_model)
+WAKE_MODELS = {
+    0: "Simple (Pennsylvania)",
+    1: "Park (WAsP)",
+    2: "Viscosidad de remolino (Ainslie)",
+    3: "Pérdida constante",
+}
+
+
+def grid_layout(
+    n_turbines: int,
+    cols: int,
+    spacing_x: float,
+    spacing_y: float,
+    rotation: float = 0.0,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Arreglo en malla de `n_turbines` turbinas en filas de `cols`
+    (separaciones en m), girado `rotation` grados en sentido horario y con
+    la primera turbina en el origen. Devuelve (x, y) en m (x al este, y al
+    norte), como wind_farm_xCoordinates / yCoordinates de SAM.
+    """
+    k = np.arange(n_turbines)
+    gx = (k % cols) * float(spacing_x)
+    gy = (k // cols) * float(spacing_y)
+    a = np.radians(rotation)
+    return gx * np.cos(a) + gy * np.sin(a), -gx * np.sin(a) + gy * np.cos(a)
+
+
+def candidate_layouts(
+    n_turbines: int,
+    rotor_diameter: float,
+    spacings=(3, 4, 5, 6, 7, 8, 10),
+    rotation_step: float = 15.0,
+    max_extent: float | None = None,
+) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """
+    Todas las mallas de `n_turbines` con 1 … n_turbines columnas,
+    separaciones (en diámetros de rotor) de `spacings` en cada eje y giros
+    de 0 a 180° cada `rotation_step`. Con `max_extent` (m) se descartan las
+    mallas cuya extensión (distancia entre las turbinas más alejadas, la
+    diagonal de la malla) no cabe en el terreno. Las mallas que resultan en
+    el mismo conjunto de posiciones (p. ej. una fila girada 90° y una
+    columna) se cuentan una vez. Devuelve (parámetros, X, Y) con X e Y de
+    forma (candidatos, n_turbines).
+    """
+    rows, xs, ys = [], [], []
+    # de filas largas a columnas: al descartar repetidas queda la fila
+    for cols in range(n_turbines, 0, -1):
+        n_rows = -(-n_turbines // cols)
+        for sx in spacings:
+            # con una sola fila (o columna) la otra separación no importa
+            for sy in (spacings if n_rows > 1 else spacings[:1]):
+                if cols == 1 and sx != spacings[0]:
+                    continue
+                # la última fila siempre empieza en la columna 0, así que la
+                # diagonal completa de la malla es la distancia máxima
+                extent = rotor_diameter * np.hypot((cols - 1) * sx, (n_rows - 1) * sy)
+                if max_extent is not None and extent > max_extent:
+                    continue
+                for rot in np.arange(0.0, 180.0, rotation_step):
+                    x, y = grid_layout(n_turbines, cols, sx * rotor_diameter, sy * rotor_diameter, rot)
+                    rows.append({
+                        "Columnas": cols,
+                        "Filas": n_rows,
+                        "Separación en fila (D)": sx if cols > 1 else None,
+                        "Separación entre filas (D)": sy if n_rows > 1 else None,
+                        "Giro (°)": float(rot),
+                        "Extensión (m)": float(extent),
+                    })
+                    xs.append(x)
+                    ys.append(y)
+    if not rows:
+        return pd.DataFrame(rows), np.empty((0, n_turbines)), np.empty((0, n_turbines))
+    X, Y = np.array(xs), np.array(ys)
+
+    # forma canónica: trasladada al origen, redondeada a 1 m y ordenada
+    shape = np.round(X - X.min(axis=1, keepdims=True)) + 1j * np.round(Y - Y.min(axis=1, keepdims=True))
+    _, first = np.unique(np.sort(shape, axis=1), axis=0, return_index=True)
+    keep = np.sort(first)
+    return pd.DataFrame(rows).iloc[keep].reset_index(drop=True), X[keep], Y[keep]
+
+
+def jensen_deficits(
+    x,
+    y,
+    directions,
+    rotor_diameter: float,
+    thrust_coefficient: float = 0.8,
+    wake_decay: float = 0.075,
+) -> np.ndarray:
+    """
+    Déficit de velocidad (fracción) de cada turbina por estela, con el
+    modelo de Jensen (estela de sombrero de copa que se abre con
+    `wake_decay`) y suma cuadrática de las estelas que la alcanzan.
+    - x, y: (arreglos, turbinas) en m
+    - directions: de dónde viene el viento (°, convención meteorológica)
+    Devuelve (arreglos, direcciones, turbinas).
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    theta = np.radians(np.asarray(directions, dtype=float))
+    # dirección hacia donde sopla el viento
+    ux = -np.sin(theta)[None, :, None, None]
+    uy = -np.cos(theta)[None, :, None, None]
+    # dx[l, i, j] = posición de j respecto de i
+    dx = (x[:, None, :] - x[:, :, None])[:, None]
+    dy = (y[:, None, :] - y[:, :, None])[:, None]
+    down = dx * ux + dy * uy
+    cross = np.abs(dx * uy - dy * ux)
+
+    radius = rotor_diameter / 2
+    wake_radius = radius + wake_decay * np.maximum(down, 0)
+    in_wake = (down > 0) & (cross < wake_radius)
+    deficit = np.where(in_wake, (1 - np.sqrt(1 - thrust_coefficient)) * (radius / wake_radius) ** 2, 0.0)
+    return np.minimum(np.sqrt((deficit ** 2).sum(axis=2)), 1.0)
+
+
+def screen_layouts(
+    X,
+    Y,
+    freq,
+    speed_centers,
+    dir_centers,
+    turbine: dict,
+    thrust_coefficient: float = 0.8,
+    wake_decay: float = 0.075,
+    batch: int = 256,
+    progress=None,
+) -> dict:
+    """
+    Energía anual bruta (kWh, sin pérdidas de SAM) de muchos arreglos
+    contra la matriz de frecuencias dirección × velocidad, con
+    jensen_deficits y la curva de potencia; en lotes de `batch` arreglos
+    para acotar la memoria (progress(hechos, total) tras cada lote).
+    Devuelve {"energy", "wake_loss"} por arreglo (la pérdida, en %,
+    respecto a las mismas turbinas sin estelas).
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    curve_v = np.asarray(turbine["wind_speeds"], dtype=float)
+    curve_p = np.asarray(turbine["turbine_powers"], dtype=float)
+    v = np.asarray(speed_centers, dtype=float)
+    freq = np.asarray(freq, dtype=float)
+
+    n = X.shape[1]
+    free = n * 8760 * float((freq * np.interp(v, curve_v, curve_p, left=0, right=0)[None, :]).sum())
+    energy = np.empty(len(X))
+    for start in range(0, len(X), batch):
+        stop = start + batch
+        deficit = jensen_deficits(
+            X[start:stop], Y[start:stop], dir_centers,
+            turbine["rotor_diameter"], thrust_coefficient, wake_decay,
+        )
+        # velocidad efectiva (arreglo, dirección, turbina, clase)
+        v_eff = (1 - deficit)[..., None] * v[None, None, None, :]
+        power = np.interp(v_eff, curve_v, curve_p, left=0, right=0).sum(axis=2)
+        energy[start:stop] = 8760 * (power * freq[None]).sum(axis=(1, 2))
+        if progress is not None:
+            progress(min(stop, len(X)), len(X))
+    return {"energy": energy, "wake_loss": 100 * (1 - energy / free) if free else np.full(len(X), np.nan)}
+
+
+def _hub_frequency_matrix(esolmet_df, hub_height: float, ini_path: str, dir_bins: int):
+    """Matriz dirección × velocidad de la estación a la altura del buje (densidad estándar)."""
+    *_, ws_height, t_height, p_height = load_settings(ini_path)
+    res = hub_resource(
+        esolmet_df["ws"].to_numpy(dtype=float),
+        esolmet_df["tdb"].to_numpy(dtype=float),
+        esolmet_df["p_atm"].to_numpy(dtype=float) * 100,
+        [hub_height],
+        wind_speed_height=ws_height,
+        air_temperature_height=t_height,
+        air_pressure_height=p_height,
+        settings=load_wind_resource_settings(ini_path),
+    )
+    speed = density_equivalent_speed(res["ws"][0], res["density"][0])
+    return frequency_matrix(esolmet_df["wd"].to_numpy(dtype=float), speed, dir_bins)
+
+
+def screen_farm_layouts(
+    esolmet_df,
+    turbine_name: str,
+    n_turbines: int,
+    ini_path: str = "configuration.ini",
+    wind_turbine_file: str = "wind_simulation/wind-turbines.json",
+    wind_inputs_file: str = "wind_simulation/windpower-inputs.json",
+    top: int = 10,
+    max_extent: float | None = None,
+    progress=None,
+) -> dict:
+    """
+    Búsqueda rápida de arreglos para `n_turbines` turbinas `turbine_name`:
+    genera las mallas de candidate_layouts ([wind_farm] spacings,
+    rotation_step y max_extent, o `max_extent` en m si se pasa; 0 = sin
+    límite) y las evalúa
+    con screen_layouts contra la frecuencia dirección × velocidad medida,
+    llevada a la altura del buje. Sin límite de terreno la mejor siempre es
+    la fila más abierta; con él la búsqueda compara separación contra
+    estelas dentro del mismo terreno. A igual energía gana la de menor
+    extensión, y cada malla aparece una vez, con su mejor giro. Devuelve
+    {"ranking": DataFrame con los `top` mejores, "layouts": [(x, y)] en el
+    mismo orden, "candidates": número evaluado} o {"error": ...}.
+    Los mejores se confirman con simulate_farm_layouts (PySAM).
+    """
+    if n_turbines < 1:
+        return {"error": "El parque debe tener al menos una turbina."}
+    try:
+        catalog, _ = _load_catalog_and_inputs(ini_path, wind_turbine_file, wind_inputs_file)
+    except FileNotFoundError as e:
+        return {"error": f"No se encontró el archivo '{e.filename}'"}
+    except ValueError as e:
+        return {"error": f"Catálogo de turbinas inválido: {e}"}
+    if turbine_name not in catalog:
+        return {"error": f"No existe el modelo “{turbine_name}” en '{wind_turbine_file}'"}
+    turbine = catalog.get(turbine_name)
+    settings = load_wind_farm_settings(ini_path)
+
+    try:
+        freq, speed_centers, dir_centers = _hub_frequency_matrix(
+            esolmet_df, turbine["hub_height"], ini_path, settings["dir_bins"]
+        )
+    except Exception as e:
+        return {"error": f"Error al preparar el recurso de viento: {e}"}
+
+    if max_extent is None:
+        max_extent = settings["max_extent"]
+    # 0 = sin límite de terreno
+    max_extent = max_extent or None
+    params, X, Y = candidate_layouts(
+        n_turbines, turbine["rotor_diameter"], settings["spacings"], settings["rotation_step"],
+        max_extent,
+    )
+    if len(X) == 0:
+        smallest = turbine["rotor_diameter"] * min(settings["spacings"]) * min(
+            np.hypot(cols - 1, -(-n_turbines // cols) - 1) for cols in range(1, n_turbines + 1)
+        )
+        return {
+            "error": f"Ningún arreglo de {n_turbines} turbinas cabe en {max_extent:,.0f} m; "
+                     f"el más compacto mide unos {smallest:,.0f} m."
+        }
+    scores = screen_layouts(
+        X, Y, freq, speed_centers, dir_centers, turbine,
+        thrust_coefficient=settings["thrust_coefficient"],
+        wake_decay=settings["wake_decay"],
+        progress=progress,
+    )
+    # a igual energía, el arreglo más compacto; de cada malla (columnas y
+    # separaciones) sólo su mejor giro, así los primeros lugares (los que se
+    # confirman con PySAM) son arreglos distintos y no la misma malla girada
+    order = np.lexsort((params["Extensión (m)"].to_numpy(), -np.round(scores["energy"], 3)))
+    geometry = ["Columnas", "Filas", "Separación en fila (D)", "Separación entre filas (D)"]
+    order = order[~params.iloc[order].duplicated(subset=geometry).to_numpy()][:top]
+
+    ranking = params.iloc[order].reset_index(drop=True)
+    ranking.insert(0, "Lugar", np.arange(1, len(ranking) + 1))
+    ranking["Energía bruta estimada (kWh)"] = scores["energy"][order]
+    ranking["Pérdida por estela estimada (%)"] = scores["wake_loss"][order]
+    return {
+        "ranking": ranking,
+        "layouts": [(X[i], Y[i]) for i in order],
+        "candidates": len(X),
+    }
+
+
+def simulate_farm_layouts(
+    esolmet_df,
+    turbine_name: str,
+    layouts,
+    wake_model: int = 0,
+    ini_path: str = "configuration.ini",
+    wind_turbine_file: str = "wind_simulation/wind-turbines.json",
+    wind_inputs_file: str = "wind_simulation/windpower-inputs.json",
+    resource_mode: str = "timeseries",
+    max_workers: int | None = None,
+    progress=None,
+    background: bool = False,
+) -> dict:
+    """
+    Corre PySAM para cada arreglo de `layouts` ([(x, y)], coordenadas en
+    m, p. ej. los de screen_farm_layouts o unos arbitrarios) con el modelo
+    de estela `wake_model` (WAKE_MODELS), en paralelo y con un solo
+    recurso a la altura del buje (`progress` y `background` como en
+    utils.sam_windpower.simulate_many). Devuelve {"results": DataFrame por
+    arreglo, "errors": {posición: mensaje}} o {"error": ...}.
+    """
+    if wake_model not in WAKE_MODELS:
+        return {"error": f"Modelo de estela desconocido: {wake_model}"}
+    try:
+        catalog, sam_data = _load_catalog_and_inputs(ini_path, wind_turbine_file, wind_inputs_file)
+    except FileNotFoundError as e:
+        return {"error": f"No se encontró el archivo '{e.filename}'"}
+    except ValueError as e:
+        return {"error": f"Catálogo de turbinas inválido: {e}"}
+    if turbine_name not in catalog:
+        return {"error": f"No existe el modelo “{turbine_name}” en '{wind_turbine_file}'"}
+    turbine = catalog[turbine_name]
+    hub = turbine["hub_height"]
+
+    try:
+        resource = _resource_inputs(esolmet_df, [hub], ini_path, resource_mode)[hub]
+    except Exception as e:
+        return {"error": f"Error al preparar el recurso de viento: {e}"}
+
+    shear = load_wind_resource_settings(ini_path)["shear_exponent"]
+    tasks = [
+        (
+            turbine,
+            sam_data,
+            resource,
+            shear,
+            {
+                "wind_farm_xCoordinates": [float(v) for v in x],
+                "wind_farm_yCoordinates": [float(v) for v in y],
+                "wind_farm_wake_model": int(wake_model),
+            },
+        )
+        for x, y in layouts
+    ]
+    results = simulate_many(tasks, max_workers=max_workers, progress=progress, background=background)
+
+    rows, errors = [], {}
+    for i, ((x, _), res) in enumerate(zip(layouts, results), start=1):
+        if "error" in res:
+            errors[i] = res["error"]
+            continue
+        rows.append({
+            "Arreglo": i,
+            "Turbinas": len(x),
+            "Capacidad (kW)": len(x) * turbine["rated_power"],
+            "Energía anual (kWh)": res["Energia Anual (kWh)"],
+            "Factor de capacidad (%)": res["Factor de Capacidad"],
+            "Pérdida por estela (kWh)": res["Perdida por estela (kWh)"],
+        })
+    return {"results": pd.DataFrame(rows), "errors": errors}
+
+
+def search_farm_layouts(
+    esolmet_df,
+    turbine_name: str,
+    n_turbines: int,
+    wake_model: int = 0,
+    max_extent: float | None = None,
+    confirm: int = 3,
+    ini_path: str = "configuration.ini",
+    wind_turbine_file: str = "wind_simulation/wind-turbines.json",
+    wind_inputs_file: str = "wind_simulation/windpower-inputs.json",
+    job=None,
+) -> dict:
+    """
+    Búsqueda completa de arreglos: screen_farm_layouts y confirmación de
+    los `confirm` mejores con simulate_farm_layouts (PySAM). Devuelve el
+    resultado de la búsqueda rápida con "sam" (el de PySAM), o {"error": ...}.
+    `job` (utils.sim_jobs.SimulationJob) es para correr en segundo plano:
+    recibe el avance de cada etapa y la puede cancelar.
+    """
+    screening = screen_farm_layouts(
+        esolmet_df, turbine_name, n_turbines, ini_path, wind_turbine_file, wind_inputs_file,
+        max_extent=max_extent,
+        progress=None if job is None else job.reporter(0.0, 0.5, "Búsqueda rápida de arreglos"),
+    )
+    if "error" in screening:
+        return screening
+    sam = simulate_farm_layouts(
+        esolmet_df, turbine_name, screening["layouts"][:confirm], wake_model,
+        ini_path, wind_turbine_file, wind_inputs_file,
+        progress=None if job is None else job.reporter(0.5, 1.0, "Confirmando con PySAM"),
+        background=job is not None,
+    )
+    return {**screening, "sam": sam}
+
+
+def create_layout_figure(x, y, title: str | None = None):
+    """Posiciones de las turbinas de un arreglo (m), con ejes a la misma escala."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    fig = go.Figure(
+        go.Scatter(
+            x=x,
+            y=y,
+            mode="markers+text",
+            text=[str(i) for i in range(1, len(x) + 1)],
+            textposition="top center",
+            marker=dict(size=12, color="steelblue", symbol="y-up-open", line_width=2),
+            hovertemplate="T%{text}: (%{x:.0f}, %{y:.0f}) m<extra></extra>",
+            showlegend=False,
+        )
+    )
+    fig.update_layout(
+        title=title,
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        xaxis=dict(title_text="Este (m)", showgrid=True, gridcolor="lightgrey", zeroline=False),
+        yaxis=dict(title_text="Norte (m)", showgrid=True, gridcolor="lightgrey", zeroline=False,
+                   scaleanchor="x", scaleratio=1),
+        margin=dict(t=40, b=40, l=40, r=20),
+    )
+    return compact_figure(fig)
@@ -0,0 +1,131 @@
+import numpy as np
+
+# constantes para el perfil vertical y la densidad del aire seco
+STD_DENSITY = 1.225        # kg/m³ (atmósfera estándar al nivel del mar)
+R_DRY = 287.05             # J/(kg·K)
+GRAVITY = 9.80665          # m/s²
+LAPSE_RATE = 0.0065        # K/m
+
+
+def shear_factors(
+    heights,
+    ref_height: float,
+    law: str = "power",
+    exponent: float = 0.14,
+    roughness: float = 0.03,
+) -> np.ndarray:
+    """
+    Cociente v(z) / v(ref_height) para cada altura de `heights`:
+      - law="power": (z / ref)^exponent
+      - law="log":   ln(z / z0) / ln(ref / z0), con z0 = roughness (m)
+    """
+    z = np.asarray(heights, dtype=float)
+    if law == "power":
+        return (z / ref_height) ** exponent
+    if law == "log":
+        if not 0 < roughness < min(ref_height, z.min(initial=np.inf)):
+            raise ValueError("La rugosidad debe ser positiva y menor que las alturas.")
+        return np.log(z / roughness) / np.log(ref_height / roughness)
+    raise ValueError(f"Ley de cortante desconocida: '{law}' (use 'power' o 'log').")
+
+
+def extrapolate_speed(speed, ref_height: float, heights, **law) -> np.ndarray:
+    """
+    Serie de velocidad llevada a cada altura: un solo broadcast
+    (alturas, muestras) en lugar de recalcular la serie por turbina.
+    `law` se pasa a shear_factors (law, exponent, roughness).
+    """
+    factors = shear_factors(heights, ref_height, **law)
+    return factors[:, None] * np.asarray(speed, dtype=float)[None, :]
+
+
+def temperature_at(tdb, ref_height: float, heights) -> np.ndarray:
+    """Temperatura (°C) a cada altura con el gradiente estándar de −6.5 K/km."""
+    dz = np.asarray(heights, dtype=float)[:, None] - ref_height
+    return np.asarray(tdb, dtype=float)[None, :] - LAPSE_RATE * dz
+
+
+def pressure_at(pressure_pa, tdb, ref_height: float, heights) -> np.ndarray:
+    """
+    Presión (Pa) a cada altura por la ecuación hipsométrica, con la
+    temperatura medida como temperatura media de la capa.
+    """
+    dz = np.asarray(heights, dtype=float)[:, None] - ref_height
+    t_k = np.asarray(tdb, dtype=float)[None, :] + 273.15
+    return np.asarray(pressure_pa, dtype=float)[None, :] * np.exp(-GRAVITY * dz / (R_DRY * t_k))
+
+
+def air_density(pressure_pa, tdb) -> np.ndarray:
+    """Densidad del aire seco (kg/m³) = p / (R·T)."""
+    return np.asarray(pressure_pa, dtype=float) / (R_DRY * (np.asarray(tdb, dtype=float) + 273.15))
+
+
+def density_equivalent_speed(speed, density) -> np.ndarray:
+    """
+    Velocidad equivalente a densidad estándar, v·(ρ/ρ₀)^(1/3) (IEC 61400-12),
+    para usar una curva de potencia de 1.225 kg/m³ con otra densidad.
+    Donde falta la densidad se deja la velocidad sin corregir.
+    """
+    ratio = np.asarray(density, dtype=float) / STD_DENSITY
+    return np.asarray(speed, dtype=float) * np.cbrt(np.where(np.isnan(ratio), 1.0, ratio))
+
+
+def hub_resource(
+    speed,
+    tdb,
+    pressure_pa,
+    heights,
+    wind_speed_height: float,
+    air_temperature_height: float,
+    air_pressure_height: float,
+    settings: dict,
+) -> dict:
+    """
+    Recurso a la altura de cada buje, con todas las alturas a la vez:
+    devuelve {"ws", "tdb", "pressure", "density"}, cada uno de forma
+    (len(heights), len(speed)).
+    - settings: load_wind_resource_settings (ley de cortante, exponente y
+      rugosidad)
+    - la presión se lleva primero a la altura del termómetro para que la
+      densidad use temperatura y presión a la misma altura
+    """
+    heights = np.atleast_1d(np.asarray(heights, dtype=float))
+    ws = extrapolate_speed(
+        speed, wind_speed_height, heights,
+        law=settings["shear_law"],
+        exponent=settings["shear_exponent"],
+        roughness=settings["roughness_length"],
+    )
+    t = temperature_at(tdb, air_temperature_height, heights)
+    p_t = pressure_at(pressure_pa, tdb, air_pressure_height, [air_temperature_height])[0]
+    p = pressure_at(p_t, tdb, air_temperature_height, heights)
+    return {"ws": ws, "tdb": t, "pressure": p, "density": air_density(p, t)}
+
+
+def sam_resource_data(
+    speed,
+    direction,
+    temperature,
+    pressure_pa,
+    height: float,
+    latitude: float,
+    longitude: float,
+) -> dict:
+    """
+    Estructura `wind_resource_data` de PySAM.Windpower (recurso en memoria,
+    sin archivo): una fila [temperatura °C, presión atm, velocidad m/s,
+    dirección °] por hora, todas a la altura `height`.
+    """
+    data = np.column_stack([
+        np.asarray(temperature, dtype=float),
+        np.asarray(pressure_pa, dtype=float) / 101_325,
+        np.asarray(speed, dtype=float),
+        np.asarray(direction, dtype=float),
+    ])
+    return {
+        "heights": [float(height)] * 4,
+        "fields": [1, 2, 3, 4],
+        "data": data.tolist(),
+        "lat": float(latitude),
+        "lon": float(longitude),
+    }
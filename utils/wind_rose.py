@@ -4,10 +4,20 @@ import matplotlib.pyplot as plt
 import plotly.express as px
 from utils.data_processing import load_esolmet_data
 import plotly.graph_objects as go
-from utils.config import load_settings
+from utils.config import load_settings, load_gap_settings, load_wind_resource_settings, load_turbine_settings
+from utils.gap_filling import fill_gaps
+from utils.wind_cube import WindCube, speed_edges_for
+from utils.wind_bins import rose_histogram, default_speed_bins
+from utils.solar import day_night_codes, PERIOD_NAMES
+from utils.data_window import DataWindow, as_window
+from utils.typical_year import TypicalYear, typical_year, YEAR_SLOTS, DATES_2001, slot_of as _slot
+from utils.plot_payload import compact_figure, date_ms
+from utils.weibull import sam_resource_inputs
+from utils.wind_resource import hub_resource, density_equivalent_speed, sam_resource_data
+from utils.tmy_cache import cached_frame, cache_key, data_fingerprint
+from utils.sam_windpower import simulate_turbine, simulate_many, submit_simulation
+from utils.turbine_catalog import load_turbine_catalog, load_windpower_inputs
 from pathlib import Path
-import PySAM.Windpower as wp
-import json
 import calendar                     
 from plotly.subplots import make_subplots
 from utils.config import load_settings
@@ -24,19 +34,15 @@ def create_wind_rose_period_plotly(
 ):
     """
     genera una rosa de vientos interactiva (Plotly).
+    `df` puede ser un DataFrame o una DataWindow.
     """
-    df_period = df.copy()
-    if not isinstance(df_period.index, pd.DatetimeIndex):
-        df_period.index = pd.to_datetime(df_period.index)
     if start is not None:
         start = pd.to_datetime(start)
     if end is not None:
         end = pd.to_datetime(end)
-    if start is not None and end is not None:
-        df_period = df_period.loc[start:end]
+    df_period = as_window(df, start, end)
     if df_period.empty:
-        min_d = df.index.min().strftime('%Y-%m-%d')
-        max_d = df.index.max().strftime('%Y-%m-%d')
+        min_d, max_d = (d.strftime('%Y-%m-%d') for d in df_period.data_range())
         raise ValueError(
             f"No hay datos en el rango seleccionado ({start.date()} a {end.date()}). "
             f"Rango disponible: {min_d} a {max_d}."
@@ -62,52 +68,23 @@ def create_wind_rose_by_speed(
     Genera una rosa de vientos interactiva (Plotly) apilada por categorías de velocidad.
 
     Parámetros:
-    - df: DataFrame con índice datetime y columnas de dirección y velocidad.
+    - df: DataFrame (o DataWindow) con índice datetime y columnas de dirección y velocidad.
     - dir_col: nombre de la columna de dirección en grados.
     - speed_col: nombre de la columna de velocidad.
     - dir_bins: número de sectores de dirección.
     - speed_bins: lista de límites para categorizar velocidad. Ej: [0, 2, 4, 6, 8, np.inf].
     - title: título de la gráfica.
     """
-    df2 = df.copy()
-    if not isinstance(df2.index, pd.DatetimeIndex):
-        df2.index = pd.to_datetime(df2.index)
+    win = as_window(df)
+    direction = win.values(dir_col)
+    speed = win.values(speed_col)
+    valid = ~(np.isnan(direction) | np.isnan(speed))
+    if not valid.any():
+        raise ValueError("No hay datos de viento en el rango seleccionado.")
     if speed_bins is None:
-        max_speed = df2[speed_col].max()
-        upper = np.ceil(max_speed / 1.5) * 1.5
-        bins = np.arange(0, upper + 1e-6, 1.5)
-        speed_bins = list(bins)
-    speed_labels = []
-    for i in range(len(speed_bins)-1):
-        low, high = speed_bins[i], speed_bins[i+1]
-        if i < len(speed_bins)-2:
-            speed_labels.append(f"{low:.1f}–{high:.1f}")
-        else:
-            speed_labels.append(f">{low:.1f}")
-
-    df2 = df2[[dir_col, speed_col]].dropna()
-    
-    df2['Velocidad'] = pd.cut(df2[speed_col], bins=speed_bins, labels=speed_labels, right=False)
-    deg_bins = np.linspace(0, 360, dir_bins+1)
-    deg_labels = [(deg_bins[i] + deg_bins[i+1]) / 2 for i in range(dir_bins)]
-    df2['Direccion'] = pd.cut(df2[dir_col] % 360, bins=deg_bins, labels=deg_labels, right=False)
-    df_counts = df2.groupby(['Direccion', 'Velocidad'],observed=True).size().reset_index(name='count')
-    total = df_counts['count'].sum()
-    df_counts['Frecuencia'] = df_counts['count'] / total * 100
-    fig = px.bar_polar(
-        df_counts,
-        r='Frecuencia',
-        theta='Direccion',
-        color='Velocidad',
-        title=title,
-        template=None,
-        category_orders={'Velocidad': speed_labels}
-    )
-    fig.update_traces(hovertemplate='Dirección: %{theta}°<br>Frecuencia: %{r:.1f}%')
-    fig.update_layout(
-        legend_title_text='Velocidad (m/s)'
-    )
-    return fig
+        speed_bins = default_speed_bins(speed[valid])
+    counts = rose_histogram(direction, speed, dir_bins=dir_bins, speed_bins=speed_bins)
+    return _rose_figure_from_counts(counts, speed_bins, title=title)
 
 def create_wind_rose_by_speed_period( #ESTA SI 
     df,
@@ -121,19 +98,15 @@ def create_wind_rose_by_speed_period( #ESTA SI
 ):
     """
     Filtra por rango de fechas y genera una rosa interactiva apilada por velocidad.
+    `df` puede ser un DataFrame o una DataWindow.
     """
-    dfp = df.copy()
-    if not isinstance(dfp.index, pd.DatetimeIndex):
-        dfp.index = pd.to_datetime(dfp.index)
     if start is not None:
         start = pd.to_datetime(start)
     if end is not None:
         end = pd.to_datetime(end)
-    if start is not None and end is not None:
-        dfp = dfp.loc[start:end]
+    dfp = as_window(df, start, end)
     if dfp.empty:
-        min_d = df.index.min().strftime('%Y-%m-%d')
-        max_d = df.index.max().strftime('%Y-%m-%d')
+        min_d, max_d = (d.strftime('%Y-%m-%d') for d in dfp.data_range())
         raise ValueError(
             f"No hay datos en el rango seleccionado ({start.date()} a {end.date()}). "
             f"Rango disponible: {min_d} a {max_d}."
@@ -150,12 +123,106 @@ def create_wind_rose_by_speed_period( #ESTA SI
     )
 
 
+def _rose_figure_from_counts(counts, speed_bins, title=None):
+    """
+    Construye la rosa apilada por velocidad (mismo formato que
+    create_wind_rose_by_speed) a partir de una matriz de conteos
+    (sectores × clases de velocidad) ya agregada.
+    """
+    dir_bins = counts.shape[0]
+    speed_labels = []
+    for i in range(len(speed_bins) - 1):
+        low, high = speed_bins[i], speed_bins[i + 1]
+        if i < len(speed_bins) - 2:
+            speed_labels.append(f"{low:.1f}–{high:.1f}")
+        else:
+            speed_labels.append(f">{low:.1f}")
+    deg_bins = np.linspace(0, 360, dir_bins + 1)
+    deg_labels = [(deg_bins[i] + deg_bins[i + 1]) / 2 for i in range(dir_bins)]
+
+    sector, speed = np.nonzero(counts[:, :len(speed_labels)])
+    df_counts = pd.DataFrame({
+        "Direccion": np.asarray(deg_labels)[sector],
+        "Velocidad": np.asarray(speed_labels)[speed],
+        "count": counts[sector, speed],
+    })
+    total = df_counts["count"].sum()
+    if total == 0:
+        raise ValueError("No hay datos de viento en el rango seleccionado.")
+    df_counts["Frecuencia"] = df_counts["count"] / total * 100
+    fig = px.bar_polar(
+        df_counts,
+        r="Frecuencia",
+        theta="Direccion",
+        color="Velocidad",
+        title=title,
+        template=None,
+        category_orders={"Velocidad": speed_labels},
+    )
+    fig.update_traces(hovertemplate="Dirección: %{theta}°<br>Frecuencia: %{r:.1f}%")
+    fig.update_layout(legend_title_text="Velocidad (m/s)")
+    return fig
+
+
+def create_wind_rose_by_speed_cube(
+    cube: WindCube,
+    start=None,
+    end=None,
+    hours=None,
+    title=None,
+):
+    """
+    Rosa de vientos por velocidad a partir del cubo precalculado: suma las
+    rebanadas de [start, end] (días inclusive) y, si se indica, de ciertas horas.
+    Los límites de velocidad se calculan igual que en create_wind_rose_by_speed.
+    """
+    counts = cube.rose_counts(start, end, hours=hours)
+    speed_bins = speed_edges_for(counts)
+    if title is None and start is not None and end is not None:
+        title = f"Rosa de vientos por velocidad ({pd.to_datetime(start).date()} a {pd.to_datetime(end).date()})"
+    return _rose_figure_from_counts(counts, speed_bins, title=title)
+
+
+def create_wind_rose_period_cube(cube: WindCube, start=None, end=None, title=None):
+    """
+    Rosa de vientos de sólo dirección (porcentajes) a partir del cubo,
+    incluyendo las muestras sin velocidad válida.
+    """
+    counts = cube.rose_counts(start, end).sum(axis=1)
+    total = counts.sum()
+    if total == 0:
+        min_d, max_d = cube.period()
+        raise ValueError(
+            f"No hay datos en el rango seleccionado ({start} a {end}). "
+            f"Rango disponible: {min_d:%Y-%m-%d} a {max_d:%Y-%m-%d}."
+        )
+    bin_edges = np.linspace(0, 360, len(counts) + 1)
+    df_wind = pd.DataFrame({
+        "Frecuencia (%)": counts / total * 100,
+        "Dirección (°)": (bin_edges[:-1] + bin_edges[1:]) / 2,
+    })
+    if title is None and start is not None and end is not None:
+        title = f"Rosa de vientos ({pd.to_datetime(start).date()} a {pd.to_datetime(end).date()})"
+    fig = px.bar_polar(
+        df_wind,
+        r="Frecuencia (%)",
+        theta="Dirección (°)",
+        color="Frecuencia (%)",
+        title=title,
+        template=None
+    )
+    fig.update_traces(hovertemplate="Dirección: %{theta:.0f}°<br>Frecuencia: %{r:.1f}%")
+    fig.update_layout(legend_title_text="Frecuencia (%)")
+    return fig
+
+
 def create_wind_rose_plotly(df, dir_col='WindDir', bins=16, title='Rosa de vientos'):
     """
     Genera una rosa de vientos interactiva (Plotly) a partir de una columna de direcciones en grados,
-    mostrando porcentajes.
+    mostrando porcentajes. `df` puede ser un DataFrame o una DataWindow.
     """
-    values = df[dir_col].dropna().values
+    values = as_window(df).values(dir_col)
+    values = values[~np.isnan(values)]
     if len(values) == 0:
         raise ValueError(f"La columna '{dir_col}' está vacía o no existe en el DataFrame.")
     angles = np.deg2rad(values)
@@ -179,6 +246,18 @@ def create_wind_rose_plotly(df, dir_col='WindDir', bins=16, title='Rosa de vient
     fig.update_layout(legend_title_text='Frecuencia (%)')
     return fig
 
+# estaciones (hemisferio norte) y su código por mes: SEASON_OF_MONTH[mes]
+SEASONS = {
+    "Primavera": [3, 4, 5],
+    "Verano":    [6, 7, 8],
+    "Otoño":     [9, 10, 11],
+    "Invierno":  [12, 1, 2],
+}
+SEASON_OF_MONTH = np.zeros(13, dtype=np.intp)
+for _code, _months in enumerate(SEASONS.values()):
+    SEASON_OF_MONTH[_months] = _code
+
+
 def create_seasonal_wind_roses_plotly(
     df,
     dir_col: str = "WindDir",
@@ -187,25 +266,20 @@ def create_seasonal_wind_roses_plotly(
     """
     Devuelve 4 graficas:
     Primavera (3-5), Verano (6-8), Otoño (9-11), Invierno (12,1,2).
+    `df` puede ser un DataFrame o una DataWindow.
     """
-    if not isinstance(df.index, pd.DatetimeIndex):
-        
-        df.index = pd.to_datetime(df.index)
+    win = as_window(df)
+    direction = win.values(dir_col)
+    month = win.index.month.to_numpy()
 
-    seasons = {
-        "Primavera": [3, 4, 5],
-        "Verano":    [6, 7, 8],
-        "Otoño":     [9, 10, 11],
-        "Invierno":  [12, 1, 2],
-    }
     figs = {}
-    for name, months in seasons.items():
-        df_season = df[df.index.month.isin(months)]
-        if df_season.empty:
+    for name, months in SEASONS.items():
+        in_season = np.isin(month, months)
+        if not in_season.any():
             figs[name] = None
         else:
             figs[name] = create_wind_rose_plotly(
-                df_season,
+                pd.DataFrame({dir_col: direction[in_season]}),
                 dir_col=dir_col,
                 bins=bins,
                 title=f"Rosa de vientos — {name}"
@@ -213,6 +287,26 @@ def create_seasonal_wind_roses_plotly(
     return figs
 
 
+def seasonal_rose_counts(df, dir_col="wd", speed_col="ws", dir_bins=16, speed_bins=None):
+    """
+    Conteos sector × clase de velocidad de las cuatro estaciones con una sola
+    pasada: la estación de cada muestra sale de SEASON_OF_MONTH y entra como
+    grupo en el mismo bincount. Devuelve una matriz (4, dir_bins, clases)
+    en el orden de SEASONS. `df` puede ser un DataFrame o una DataWindow.
+    """
+    win = as_window(df)
+    if speed_bins is None:
+        speed_bins = [0, 2, 4, 6, 8, np.inf]
+    return rose_histogram(
+        win.values(dir_col),
+        win.values(speed_col),
+        dir_bins=dir_bins,
+        speed_bins=speed_bins,
+        groups=SEASON_OF_MONTH[win.index.month.to_numpy()],
+        n_groups=len(SEASONS),
+    )
+
+
 def create_seasonal_wind_roses_by_speed_plotly(#ESTA SI 
     df,
     dir_col='wd',
@@ -222,137 +316,117 @@ def create_seasonal_wind_roses_by_speed_plotly(#ESTA SI
 ):
     """
     Genera un diccionario de rosas de viento interactivas (Plotly) apiladas por velocidad,
-    una por cada estación: Primavera, Verano, Otoño e Invierno.
+    una por cada estación: Primavera, Verano, Otoño e Invierno (None si no hay datos).
+    Los datos se agrupan una sola vez (seasonal_rose_counts) para las cuatro estaciones.
 
     Parámetros:
-    - df: DataFrame con DatetimeIndex y columnas de dirección y velocidad.
+    - df: DataFrame (o DataWindow) con DatetimeIndex y columnas de dirección y velocidad.
     - dir_col: columna de dirección (grados).
     - speed_col: columna de velocidad (ws).
     - dir_bins: número de sectores direccionales.
     """
-    if not isinstance(df.index, pd.DatetimeIndex):
-        df.index = pd.to_datetime(df.index)
     if speed_bins is None:
         speed_bins = [0, 2, 4, 6, 8, np.inf]
-    speed_labels = [f"{speed_bins[i]}–{speed_bins[i+1]}" for i in range(len(speed_bins)-1)]
-    seasons = {
-        'Primavera': [3, 4, 5],
-        'Verano':    [6, 7, 8],
-        'Otoño':     [9, 10, 11],
-        'Invierno':  [12, 1, 2]
-    }
+    counts = seasonal_rose_counts(df, dir_col, speed_col, dir_bins, speed_bins)
     figs = {}
-    for name, months in seasons.items():
-        df_season = df[df.index.month.isin(months)].copy()
-        if df_season.empty:
+    for name, season_counts in zip(SEASONS, counts):
+        if season_counts.sum() == 0:
             figs[name] = None
-        else:
-            figs[name] = create_wind_rose_by_speed_period(
-                df_season,
-                dir_col=dir_col,
-                speed_col=speed_col,
-                dir_bins=dir_bins,
-                speed_bins=speed_bins,
-                title=None
-            )
-            figs[name].update_traces(
-                hovertemplate='Dirección: %{theta}°<br>Frecuencia: %{r:.1f}%'
-            )
-            figs[name].update_layout(
-                legend_title_text='Velocidad (m/s)',
-                polar=dict(angularaxis=dict(rotation=90, direction='clockwise'))
-            )
+            continue
+        fig = _rose_figure_from_counts(season_counts, speed_bins)
+        fig.update_layout(
+            polar=dict(angularaxis=dict(rotation=90, direction='clockwise'))
+        )
+        figs[name] = fig
+    return figs
+
+
+def create_seasonal_wind_roses_cube(cube: WindCube, start=None, end=None):
+    """
+    Las cuatro rosas estacionales por velocidad a partir del cubo
+    precalculado: cada estación es la suma de las rebanadas de sus meses en
+    [start, end] (días inclusive). Las cuatro comparten los límites de
+    velocidad del cubo (speed_edges_for sobre el total) para que se puedan
+    comparar; None si la estación no tiene datos.
+    """
+    counts = {name: cube.rose_counts(start, end, months=meses) for name, meses in SEASONS.items()}
+    speed_bins = speed_edges_for(sum(counts.values()))
+    figs = {}
+    for name, season_counts in counts.items():
+        if season_counts[:, :len(speed_bins) - 1].sum() == 0:
+            figs[name] = None
+            continue
+        fig = _rose_figure_from_counts(season_counts, speed_bins)
+        fig.update_layout(
+            polar=dict(angularaxis=dict(rotation=90, direction='clockwise'))
+        )
+        figs[name] = fig
     return figs
 
+
+def _typical_year_frames(ty: TypicalYear):
+    """
+    Series y tabla del año típico a partir de los acumuladores, con la misma
+    forma que los groupby originales: promedio y desviación por día (sin
+    29-Feb, fechas de 2001), por hora, y tabla Hora × fecha con ceros donde
+    no hay datos.
+    """
+    present = ty.day_present()[YEAR_SLOTS]
+    slots = YEAR_SLOTS[present]
+    dates = pd.DatetimeIndex(DATES_2001[present], name="Date2001")
+    daily_avg = pd.Series(ty.daily_mean()[slots], index=dates)
+    daily_std = pd.Series(ty.daily_std()[slots], index=dates)
+
+    hours = np.flatnonzero(ty.hour_present())
+    hourly_avg = pd.Series(ty.hourly_mean()[hours], index=pd.Index(hours, name="Hour"))
+    hourly_std = pd.Series(ty.hourly_std()[hours], index=pd.Index(hours, name="Hour"))
+
+    pivot_hours = np.flatnonzero(ty.hour_present(slots))
+    z = np.nan_to_num(ty.cell_mean()[np.ix_(slots, pivot_hours)].T, nan=0.0)
+    pivot = pd.DataFrame(z, index=pd.Index(pivot_hours, name="Hour"), columns=dates)
+    return daily_avg, daily_std, hourly_avg, hourly_std, pivot
+
+
 def create_typical_wind_heatmap(
     df,
     speed_col="ws",
     start: str | None = None,
     end:   str | None = None,
 ):
-    df2 = df.copy()
-    if not isinstance(df2.index, pd.DatetimeIndex):
-        df2.index = pd.to_datetime(df2.index)
-    if start:
-        df2 = df2.loc[pd.to_datetime(start):]
-    if end:
-        df2 = df2.loc[:pd.to_datetime(end)]
-
-    df2["Month"] = df2.index.month
-    df2["Day"]   = df2.index.day
-    df2["Hour"]  = df2.index.hour
-# 1) Promedio diario típico
-    daily = (
-        df2
-        .groupby(["Month", "Day"])[speed_col]
-        .mean()
-        .reset_index()
-    )
-    # 2) Desviación estándar diaria
-    daily_std = (
-        df2
-        .groupby(["Month", "Day"])[speed_col]
-        .std()
-        .reset_index()
-    )
+    """Heatmap de año típico de la velocidad del viento (ver create_typical_heatmap)."""
+    return create_typical_heatmap(df, speed_col, start=start, end=end)
 
-    # 3) Filtrar 29-Feb en ambos
-    mask_feb29 = (daily["Month"] == 2) & (daily["Day"] == 29)
-    daily    = daily[~mask_feb29]
-    daily_std = daily_std[~mask_feb29]
 
-    # 4) Crear columna Date2001 en ambos
-    daily["Date2001"] = pd.to_datetime({
-        "year":  2001,
-        "month": daily["Month"],
-        "day":   daily["Day"]
-    })
-    daily_std["Date2001"] = pd.to_datetime({
-        "year":  2001,
-        "month": daily_std["Month"],
-        "day":   daily_std["Day"]
-    })
-
-    # 5) Ordenar por esa fecha y extraer la Serie
-    daily_avg = (
-        daily
-        .sort_values("Date2001")
-        .set_index("Date2001")[speed_col]
-    )
-    daily_std = (
-        daily_std
-        .sort_values("Date2001")
-        .set_index("Date2001")[speed_col]
-    )
+def create_typical_heatmap(
+    df,
+    col="ws",
+    start: str | None = None,
+    end:   str | None = None,
+    label: str = "Velocidad",
+    short: str = "Vel",
+    units: str = "m/s",
+):
+    """
+    Heatmap de año típico (hora × día del año) con su serie diaria típica
+    arriba y el perfil horario típico a la derecha, para cualquier variable
+    (ws, tdb, ghi, rh...). Los promedios salen de una sola pasada de
+    TypicalYear sobre la columna `col` del rango.
+    """
+    ty = typical_year(df, col, start or None, end or None)
+    return typical_heatmap_figure(ty, label=label, short=short, units=units)
 
 
-    hourly = (
-        df2
-        .groupby("Hour")[speed_col]
-        .mean()
-        .reset_index()
-    )
-    hourly_avg = hourly.set_index("Hour")[speed_col]
-    hourly_std = df2.groupby(df2.index.hour)[speed_col].std()
-
-    grp = (
-        df2
-        .groupby(["Month", "Day", "Hour"])[speed_col]
-        .mean()
-        .reset_index()
-    )
-    grp = grp[~((grp["Month"] == 2) & (grp["Day"] == 29))]
-    grp["Date2001"] = pd.to_datetime(dict(
-        year=2001,
-        month=grp["Month"],
-        day=grp["Day"]
-    ))
-
-    pivot = (
-        grp
-        .pivot(index="Hour", columns="Date2001", values=speed_col)
-        .fillna(0.0)
-    )
+def typical_heatmap_figure(
+    ty: TypicalYear,
+    label: str = "Velocidad",
+    short: str = "Vel",
+    units: str = "m/s",
+):
+    """
+    Figura de create_typical_heatmap a partir de acumuladores ya calculados,
+    para compartirlos con los heatmaps estacionales.
+    """
+    daily_avg, daily_std, hourly_avg, hourly_std, pivot = _typical_year_frames(ty)
 
     fig = make_subplots(
         rows=2, cols=2,
@@ -374,7 +448,7 @@ def create_typical_wind_heatmap(
             line=dict(width=0),
             name="+1σ",
             hoverinfo="y",
-            hovertemplate="+1σ: %{y:.2f} m/s<extra></extra>"
+            hovertemplate=f"+1σ: %{{y:.2f}} {units}<extra></extra>"
         ),
         row=1, col=1
     )
@@ -390,7 +464,7 @@ def create_typical_wind_heatmap(
             line=dict(width=0),
             name="-1σ",
             hoverinfo="y",
-            hovertemplate="-1σ: %{y:.2f} m/s<extra></extra>"
+            hovertemplate=f"-1σ: %{{y:.2f}} {units}<extra></extra>"
         ),
         row=1, col=1
     )
@@ -401,51 +475,29 @@ def create_typical_wind_heatmap(
             y=daily_avg.values,
             mode="lines",
             name="Promedio diario típico",
-            hovertemplate="Día: %{x|%b %d}<br>Vel: %{y:.2f} m/s<extra></extra>"
+            hovertemplate=f"Día: %{{x|%b %d}}<br>{short}: %{{y:.2f}} {units}<extra></extra>"
 
         ),
         row=1, col=1
     )
 
+    # un solo heatmap sobre el coloraxis: antes se agregaba dos veces la misma
+    # traza (la primera con su propia colorbar, tapada por la segunda)
     fig.add_trace(
         go.Heatmap(
             z=pivot.values,
-            x=list(pivot.columns),
-            y=list(pivot.index),
+            x=pivot.columns,
+            y=pivot.index.to_numpy(),
             colorscale="Viridis",
-            colorbar=dict(
-                title="Velocidad (m/s)",    # texto del título
-                titleside="bottom",  
-                orientation='h',        # lo coloca al lado derecho
-                len=0.6,                    # ocupa el 70% de la altura del subplot
-                thickness=20,               # 15px de grosor
-                x=0.45,                     # lo saca un poco fuera del plotting area
-                xanchor="center",            # lo ancla al lado izquierdo
-                y=-0.1,    
-                yanchor='top',                 # centro verticalmente
-                titlefont=dict(size=14),    # tamaño de la fuente
-                ticklen=3,                  # largo de las marcas
-            ),
-            hovertemplate="Día: %{x|%b %d}<br>Hora: %{y}:00<br>Vel: %{z:.2f}<extra></extra>"
+            coloraxis="coloraxis",
+            hovertemplate=f"Día: %{{x|%b %d}}<br>Hora: %{{y}}:00<br>{short}: %{{z:.2f}}<extra></extra>"
         ),
         row=2, col=1
     )
-    
-    fig.add_trace(
-    go.Heatmap(
-        z=pivot.values,
-        x=list(pivot.columns),
-        y=list(pivot.index),
-        colorscale="Viridis",
-        coloraxis="coloraxis",          # <— aquí le decimos que use el coloraxis “coloraxis”
-        hovertemplate="Día: %{x|%b %d}<br>Hora: %{y}:00<br>Vel: %{z:.2f}<extra></extra>"
-    ),
-        row=2, col=1
-    )
 
     # 2) en el layout:
     fig.update_layout(
-    coloraxis_colorbar_title="Velocidad (m/s)",
+    coloraxis_colorbar_title=f"{label} ({units})",
     coloraxis_colorbar_title_side="bottom",
     coloraxis_colorbar_orientation="h",
     coloraxis_colorbar_len=0.6,
@@ -467,7 +519,7 @@ def create_typical_wind_heatmap(
             line=dict(width=0),
             name="+1σ",
             hoverinfo="x",
-            hovertemplate="+1σ: %{x:.2f} m/s<extra></extra>"
+            hovertemplate=f"+1σ: %{{x:.2f}} {units}<extra></extra>"
         ),
         row=2, col=2
     )
@@ -483,7 +535,7 @@ def create_typical_wind_heatmap(
             line=dict(width=0),
             name="-1σ",
             hoverinfo="x",
-            hovertemplate="-1σ: %{x:.2f} m/s<extra></extra>"
+            hovertemplate=f"-1σ: %{{x:.2f}} {units}<extra></extra>"
         ),
         row=2, col=2
     )
@@ -495,7 +547,7 @@ def create_typical_wind_heatmap(
             mode="lines",
             orientation="h",
             name="Promedio horario típico",
-            hovertemplate="Hora: %{y}:00<br>Vel: %{y:.2f} m/s<extra></extra>"
+            hovertemplate=f"Hora: %{{y}}:00<br>{short}: %{{y:.2f}} {units}<extra></extra>"
 
         ),
         row=2, col=2
@@ -526,12 +578,12 @@ def create_typical_wind_heatmap(
         gridcolor="lightgrey"
     )
     fig.update_yaxes(
-        title_text="Velocidad (m/s)", 
+        title_text=f"{label} ({units})", 
         row=1, col=1,
         showgrid=True, gridcolor="lightgrey",
     )
     fig.update_xaxes(
-        title_text="Velocidad (m/s)",
+        title_text=f"{label} ({units})",
         row=2, col=2,
         showgrid=True, gridcolor="lightgrey",
     )
@@ -540,7 +592,28 @@ def create_typical_wind_heatmap(
         showgrid=True,
         gridcolor="lightgrey")
 
-    return fig
+    return compact_figure(fig)
+
+
+def _seasonal_frames(ty: TypicalYear, meses):
+    """
+    Como _typical_year_frames para una estación, con la tabla Hora × día del
+    mes: cada celda promedia las medias (mes, día, hora) de los meses de la
+    estación, hasta el día más corto de esos meses.
+    """
+    daily_avg, daily_std, hourly_avg, hourly_std, _ = _typical_year_frames(ty)
+
+    min_days = min(calendar.monthrange(2001, m)[1] for m in meses)
+    grid = np.array([[_slot(m, d) for d in range(1, min_days + 1)] for m in meses])
+    exists = ty.rows[grid] > 0                       # (meses, días, horas)
+    with np.errstate(invalid="ignore"):
+        means = np.nanmean(np.where(exists, ty.cell_mean()[grid], np.nan), axis=0)
+    cell_exists = exists.any(axis=0)                 # (días, horas)
+    days = np.flatnonzero(cell_exists.any(axis=1))
+    hours = np.flatnonzero(cell_exists.any(axis=0))
+    z = np.nan_to_num(means[np.ix_(days, hours)].T, nan=0.0)
+    pivot = pd.DataFrame(z, index=pd.Index(hours, name="Hour"), columns=pd.Index(days + 1, name="Day"))
+    return daily_avg, daily_std, hourly_avg, hourly_std, pivot
 
 
 def create_seasonal_wind_heatmaps(
@@ -548,36 +621,46 @@ def create_seasonal_wind_heatmaps(
     speed_col: str = "ws",
     start: str | None = None,
     end:   str | None = None,
+):
+    """Heatmaps estacionales de la velocidad del viento (ver create_seasonal_heatmaps)."""
+    return create_seasonal_heatmaps(df, speed_col, start=start, end=end)
+
+
+def create_seasonal_heatmaps(
+    df,
+    col: str = "ws",
+    start: str | None = None,
+    end:   str | None = None,
+    label: str = "Velocidad",
+    short: str = "Vel",
+    units: str = "m/s",
 ):
     """
     Igual que antes, pero cada estación sale con:
       • Serie diaria típica arriba
       • Heatmap estacional abajo-izquierda (colorbar horizontal debajo)
       • Serie horaria típica abajo-derecha
+    Las cuatro estaciones salen de los mismos acumuladores TypicalYear
+    (una pasada sobre los datos), restringidos a sus meses.
     """
-    df2 = df.copy()
-    if not isinstance(df2.index, pd.DatetimeIndex):
-        df2.index = pd.to_datetime(df2.index)
-    if start:
-        df2 = df2.loc[pd.to_datetime(start):]
-    if end:
-        df2 = df2.loc[:pd.to_datetime(end)]
-
-    df2["Month"] = df2.index.month
-    df2["Day"]   = df2.index.day
-    df2["Hour"]  = df2.index.hour
-
-    season_months = {
-        "Primavera": [3, 4, 5],
-        "Verano":    [6, 7, 8],
-        "Otoño":     [9, 10, 11],
-        "Invierno":  [12, 1, 2],
-    }
+    ty = typical_year(df, col, start or None, end or None)
+    return seasonal_heatmap_figures(ty, label=label, short=short, units=units)
+
 
+def seasonal_heatmap_figures(
+    ty_all: TypicalYear,
+    label: str = "Velocidad",
+    short: str = "Vel",
+    units: str = "m/s",
+):
+    """
+    Figuras de create_seasonal_heatmaps ({estación: fig}) a partir de los
+    acumuladores del rango completo; son los mismos que usa el heatmap anual.
+    """
     figs = {}
-    for season, meses in season_months.items():
-        df_season = df2[df2["Month"].isin(meses)]
-        if df_season.empty:
+    for season, meses in SEASONS.items():
+        ty = ty_all.months(meses)
+        if not ty.rows.any():
             fig = go.Figure()
             fig.add_annotation(
                 xref="paper", yref="paper",
@@ -588,65 +671,7 @@ def create_seasonal_wind_heatmaps(
             figs[season] = fig
             continue
 
-        daily = (
-            df_season
-            .groupby(["Month","Day"])[speed_col]
-            .mean()
-            .reset_index()
-        )
-        daily = daily[~((daily["Month"]==2)&(daily["Day"]==29))]
-        daily["Date2001"] = pd.to_datetime(dict(
-            year=2001,
-            month=daily["Month"],
-            day=daily["Day"]
-        ))
-        daily = daily.sort_values("Date2001")
-        daily_avg = daily.set_index("Date2001")[speed_col]
-        
-        hourly_avg = (
-            df_season
-            .groupby("Hour")[speed_col]
-            .mean()
-        )
-        daily_std = (
-        df_season
-        .groupby(["Month","Day"])[speed_col]
-        .std()
-        .reset_index()
-    )
-        daily_std = daily_std[~((daily_std["Month"]==2)&(daily_std["Day"]==29))]
-        daily_std["Date2001"] = pd.to_datetime(dict(
-            year=2001,
-            month=daily_std["Month"],
-            day=daily_std["Day"]
-        ))
-        daily_std = (
-            daily_std
-            .sort_values("Date2001")
-            .set_index("Date2001")[speed_col]
-        )
-
-        hourly_std = df_season.groupby("Hour")[speed_col].std()
-
-        grouped = (
-            df_season
-            .groupby(["Month","Day","Hour"])[speed_col]
-            .mean()
-            .reset_index()
-        )
-        grouped = grouped[~((grouped["Month"]==2)&(grouped["Day"]==29))]
-        days_per_month = [calendar.monthrange(2001,m)[1] for m in meses]
-        min_days = min(days_per_month)
-        grouped = grouped[grouped["Day"] <= min_days]
-
-        pivot = (
-            grouped
-            .groupby(["Day","Hour"])[speed_col]
-            .mean()
-            .reset_index()
-            .pivot(index="Hour", columns="Day", values=speed_col)
-            .fillna(0.0)
-        )
+        daily_avg, daily_std, hourly_avg, hourly_std, pivot = _seasonal_frames(ty, meses)
 
         fig = make_subplots(
             rows=2, cols=2,
@@ -665,7 +690,7 @@ def create_seasonal_wind_heatmaps(
                 line=dict(width=0),
                 name="+1σ",
                 hoverinfo="y",
-                hovertemplate="+1σ: %{y:.2f} m/s<extra></extra>"
+                hovertemplate=f"+1σ: %{{y:.2f}} {units}<extra></extra>"
             ),
             row=1, col=1
         )
@@ -679,7 +704,7 @@ def create_seasonal_wind_heatmaps(
                 line=dict(width=0),
                 name="-1σ",
                 hoverinfo="y",
-                hovertemplate="-1σ: %{y:.2f} m/s<extra></extra>"
+                hovertemplate=f"-1σ: %{{y:.2f}} {units}<extra></extra>"
             ),
             row=1, col=1
         )
@@ -689,7 +714,7 @@ def create_seasonal_wind_heatmaps(
                 y=daily_avg.values,
                 mode="lines",
                 name="Promedio diario",
-                hovertemplate="Día: %{x|%b %d}<br>Vel: %{y:.2f} m/s<extra></extra>"
+                hovertemplate=f"Día: %{{x|%b %d}}<br>{short}: %{{y:.2f}} {units}<extra></extra>"
             ),
             row=1, col=1
         )
@@ -697,11 +722,11 @@ def create_seasonal_wind_heatmaps(
         fig.add_trace(
             go.Heatmap(
                 z=pivot.values,
-                x=pivot.columns,
-                y=pivot.index,
+                x=pivot.columns.to_numpy(),
+                y=pivot.index.to_numpy(),
                 colorscale="Viridis",
                 coloraxis="coloraxis",   
-                hovertemplate="Día: %{x}<br>Hora: %{y}:00<br>Vel: %{z:.2f} m/s<extra></extra>"
+                hovertemplate=f"Día: %{{x}}<br>Hora: %{{y}}:00<br>{short}: %{{z:.2f}} {units}<extra></extra>"
             ),
             row=2, col=1
         )
@@ -714,7 +739,7 @@ def create_seasonal_wind_heatmaps(
                 line=dict(width=0),
                 name="+1σ",
                 hoverinfo="x",
-                hovertemplate="+1σ: %{x:.2f} m/s<extra></extra>"
+                hovertemplate=f"+1σ: %{{x:.2f}} {units}<extra></extra>"
             ),
             row=2, col=2
         )
@@ -728,7 +753,7 @@ def create_seasonal_wind_heatmaps(
                 line=dict(width=0),
                 name="-1σ",
                 hoverinfo="x",
-                hovertemplate="-1σ: %{x:.2f} m/s<extra></extra>"
+                hovertemplate=f"-1σ: %{{x:.2f}} {units}<extra></extra>"
             ),
             row=2, col=2
         )
@@ -739,7 +764,7 @@ def create_seasonal_wind_heatmaps(
                 mode="lines",
                 orientation="h",
                 name="Promedio horario",
-                hovertemplate="Hora: %{y}:00<br>Vel: %{x:.2f} m/s<extra></extra>"
+                hovertemplate=f"Hora: %{{y}}:00<br>{short}: %{{x:.2f}} {units}<extra></extra>"
             ),
             row=2, col=2
         )
@@ -748,12 +773,12 @@ def create_seasonal_wind_heatmaps(
             height=550,
             margin=dict(t=30,b=40,l=60,r=20),
             showlegend=False,
-            title_text=f"Heatmap estacional de velocidad — {season}",
+            title_text=f"Heatmap estacional de {label.lower()} — {season}",
 
             # Configuramos el coloraxis para la colorbar
             coloraxis=dict(
                 colorbar=dict(
-                    title="m/s",
+                    title=units,
                     orientation="h",
                     y=-0.15,          # ligeramente debajo del subplot
                     x=0.5,            # centrada
@@ -776,33 +801,18 @@ def create_seasonal_wind_heatmaps(
         fig.update_yaxes(row=1, col=1, showgrid=True, gridcolor="lightgrey")
         fig.update_xaxes(row=2, col=2, showgrid=True, gridcolor="lightgrey")
         fig.update_yaxes(row=2, col=2, showgrid=True, gridcolor="lightgrey")
-        figs[season] = fig
+        figs[season] = compact_figure(fig)
 
     return figs
-def make_sam_wind_csv(
+def build_sam_tmy(
     esolmet: pd.DataFrame,
     ini_path: str = "configuration.ini",
-    output_csv: str = "wind_simulation/sam_wind.csv"
-) -> Path:
+) -> pd.DataFrame:
     """
-    Genera un CSV TMY (8760 h) compatible con PySAM usando la configuración
-    en 'configuration.ini'. Devuelve la ruta al CSV terminado.
+    Año típico (8760 h) para PySAM: Year, Month, Day, Hour, wind_speed,
+    wind_direction, temperature (°C) y pressure (Pa), a las alturas de
+    medición de 'configuration.ini'.
     """
-    (
-        variables,
-        latitude,
-        longitude,
-        gmt,
-        name,
-        alias,
-        site_id,
-        data_tz,
-        wind_speed_height,
-        air_temperature_height,
-        air_pressure_height,
-    ) = load_settings(ini_path)
-
-
     needed_cols = ["ws", "wd", "tdb", "p_atm"]
     df2 = esolmet[needed_cols].copy()
 
@@ -818,12 +828,19 @@ def make_sam_wind_csv(
         "p_atm": "mean",
     })
     df_hourly.columns = ["ws", "ws_std", "wd", "tdb", "p_atm"]
-    df_hourly = df_hourly.ffill()
+
+    # huecos: interpolación corta + climatología mes×hora (no ffill)
+    gaps = load_gap_settings(ini_path)
+    df_hourly, _ = fill_gaps(
+        df_hourly,
+        interp_max_hours=gaps["interp_max_hours"],
+        max_gap_hours=gaps["max_gap_hours"],
+        circular_cols=gaps["circular"],
+    )
 
     df_hourly.index.name = "fecha"
 
     df_hourly = df_hourly[~((df_hourly.index.month == 2) & (df_hourly.index.day == 29))]
-    df_hourly = df_hourly.ffill()
 
     df_hourly["p_atm"] = df_hourly["p_atm"] * 100
 
@@ -848,13 +865,122 @@ def make_sam_wind_csv(
         .mean()
         .reset_index()
     )
-    tmy["Year"] = 2001  
 
-    df_out = tmy[[
+    # horas sin dato en ningún año: climatología del propio año típico
+    tmy_cols = ["wind_speed", "wind_direction", "temperature", "pressure"]
+    tmy_index = pd.to_datetime(dict(year=2001, month=tmy["Month"], day=tmy["Day"], hour=tmy["Hour"]))
+    full_year = pd.date_range("2001-01-01 00:00", periods=8760, freq="h")
+    tmy_filled, _ = fill_gaps(
+        tmy[tmy_cols].set_axis(tmy_index).reindex(full_year),
+        interp_max_hours=gaps["interp_max_hours"],
+        max_gap_hours=None,
+        circular_cols=["wind_direction"],
+    )
+    tmy = tmy_filled.reset_index(drop=True)
+    tmy["Year"] = 2001
+    tmy["Month"] = full_year.month
+    tmy["Day"] = full_year.day
+    tmy["Hour"] = full_year.hour
+    if tmy[tmy_cols].isna().any().any():
+        faltantes = tmy[tmy_cols].isna().sum()
+        raise ValueError(
+            "No hay datos suficientes para construir el año típico: "
+            + ", ".join(f"{c} ({n} h)" for c, n in faltantes.items() if n)
+        )
+
+    return tmy[[
         "Year", "Month", "Day", "Hour",
         "wind_speed", "wind_direction", "temperature", "pressure"
     ]]
 
+
+def cached_sam_tmy(
+    esolmet: pd.DataFrame,
+    ini_path: str = "configuration.ini",
+) -> pd.DataFrame:
+    """
+    build_sam_tmy memoizado en memoria y en disco ([wind_resource]
+    cache_dir). La llave es un hash del contenido de ws, wd, tdb y p_atm
+    (con sus marcas de tiempo) y de la configuración de relleno de huecos:
+    si ni los datos ni configuration.ini cambian, otra simulación (de la
+    misma u otra turbina) no vuelve a remuestrear el historial.
+    """
+    gaps = load_gap_settings(ini_path)
+    key = cache_key(data_fingerprint(esolmet, ["ws", "wd", "tdb", "p_atm"]), {"gap_filling": gaps})
+    return cached_frame(
+        key,
+        lambda: build_sam_tmy(esolmet, ini_path),
+        cache_dir=load_wind_resource_settings(ini_path)["cache_dir"],
+    )
+
+
+def hub_height_tmys(
+    tmy: pd.DataFrame,
+    hub_heights,
+    ini_path: str = "configuration.ini",
+    settings: dict | None = None,
+) -> dict:
+    """
+    Un año típico por altura de buje ({altura: DataFrame}) a partir del de
+    build_sam_tmy: velocidad extrapolada con la ley de [wind_resource]
+    (o la de `settings`, mismo formato), temperatura y presión llevadas a
+    la misma altura. Todas las alturas salen de un solo broadcast de
+    NumPy, sin rehacer el año típico.
+    """
+    *_, ws_height, t_height, p_height = load_settings(ini_path)
+    heights = np.unique(np.asarray(hub_heights, dtype=float))
+    res = hub_resource(
+        tmy["wind_speed"].to_numpy(dtype=float),
+        tmy["temperature"].to_numpy(dtype=float),
+        tmy["pressure"].to_numpy(dtype=float),
+        heights,
+        wind_speed_height=ws_height,
+        air_temperature_height=t_height,
+        air_pressure_height=p_height,
+        settings=settings or load_wind_resource_settings(ini_path),
+    )
+    return {
+        float(h): tmy.assign(
+            wind_speed=res["ws"][i],
+            temperature=res["tdb"][i],
+            pressure=res["pressure"][i],
+        )
+        for i, h in enumerate(heights)
+    }
+
+
+def sam_wind_csv_text(
+    esolmet: pd.DataFrame,
+    ini_path: str = "configuration.ini",
+    hub_height: float | None = None,
+) -> str:
+    """
+    Contenido del CSV TMY (8760 h) en el formato de archivo de recurso de
+    SAM, para descargarlo. La simulación ya no lo necesita: usa el recurso
+    en memoria (ver run_wind_simulation).
+
+    Con `hub_height` el recurso va ya extrapolado a esa altura (ver
+    hub_height_tmys), así SAM no necesita una medición cercana al buje.
+    """
+    (
+        variables,
+        latitude,
+        longitude,
+        gmt,
+        name,
+        alias,
+        site_id,
+        data_tz,
+        wind_speed_height,
+        air_temperature_height,
+        air_pressure_height,
+    ) = load_settings(ini_path)
+
+    df_out = cached_sam_tmy(esolmet, ini_path)
+    if hub_height is not None:
+        df_out = hub_height_tmys(df_out, [hub_height], ini_path)[float(hub_height)]
+        wind_speed_height = air_temperature_height = air_pressure_height = hub_height
+
     header_varnames = [
         "Year", "Month", "Day", "Hour",
         f"wind speed at {int(wind_speed_height)}m (m/s)",
@@ -868,120 +994,313 @@ def make_sam_wind_csv(
         f"Data Timezone,{data_tz},Longitude,{longitude},Latitude,{latitude}\n"
     )
     meta_row = ",".join(header_varnames) + "\n"
+    body = df_out.to_csv(index=False, header=False, sep=",", lineterminator="\n")
+    return loc_row + meta_row + body
 
-    out_path= Path(output_csv)
-    with out_path.open("w", encoding="utf-8") as f:
-        f.write(loc_row)
-        f.write(meta_row)
-    df_out.to_csv(
-        out_path,
-        mode="a",
-        index=False,
-        header=False,
-        sep=",",
-    )
 
+def make_sam_wind_csv(
+    esolmet: pd.DataFrame,
+    ini_path: str = "configuration.ini",
+    output_csv: str = "wind_simulation/sam_wind.csv",
+    hub_height: float | None = None,
+) -> Path:
+    """
+    Escribe el CSV de sam_wind_csv_text en `output_csv` (exportación
+    explícita) y devuelve la ruta.
+    """
+    out_path = Path(output_csv)
+    out_path.write_text(sam_wind_csv_text(esolmet, ini_path, hub_height), encoding="utf-8")
     return out_path
 
+def _load_catalog_and_inputs(ini_path, wind_turbine_file, wind_inputs_file):
+    """Catálogo de turbinas y parámetros base de PySAM, cargados una vez por proceso."""
+    catalog = load_turbine_catalog(wind_turbine_file, load_turbine_settings(ini_path)["library"])
+    return catalog, load_windpower_inputs(wind_inputs_file)
+
+
+def _resource_inputs(
+    esolmet_df,
+    hub_heights,
+    ini_path: str = "configuration.ini",
+    resource_mode: str = "timeseries",
+    settings: dict | None = None,
+) -> dict:
+    """
+    Entradas de recurso de SAM para cada altura de buje ({altura: dict}).
+    `settings` reemplaza a load_wind_resource_settings (ley de cortante).
+    Todas las alturas salen de un solo broadcast sobre el mismo recurso:
+      - "timeseries": año típico memoizado (cached_sam_tmy) en memoria
+        (wind_resource_data)
+      - "distribution": tabla velocidad × dirección de la estación con
+        velocidades equivalentes a densidad estándar
+    """
+    (
+        variables,
+        latitude,
+        longitude,
+        gmt,
+        name,
+        alias,
+        site_id,
+        data_tz,
+        wind_speed_height,
+        air_temperature_height,
+        air_pressure_height,
+    ) = load_settings(ini_path)
+    heights = np.unique(np.asarray(hub_heights, dtype=float))
+
+    if resource_mode == "timeseries":
+        tmys = hub_height_tmys(cached_sam_tmy(esolmet_df, ini_path), heights, ini_path, settings)
+        return {
+            h: {
+                "wind_resource_model_choice": 0,
+                "wind_resource_data": sam_resource_data(
+                    tmy["wind_speed"].to_numpy(),
+                    tmy["wind_direction"].to_numpy(),
+                    tmy["temperature"].to_numpy(),
+                    tmy["pressure"].to_numpy(),
+                    height=h,
+                    latitude=latitude,
+                    longitude=longitude,
+                ),
+            }
+            for h, tmy in tmys.items()
+        }
+
+    res = hub_resource(
+        esolmet_df["ws"].to_numpy(dtype=float),
+        esolmet_df["tdb"].to_numpy(dtype=float),
+        esolmet_df["p_atm"].to_numpy(dtype=float) * 100,
+        heights,
+        wind_speed_height=wind_speed_height,
+        air_temperature_height=air_temperature_height,
+        air_pressure_height=air_pressure_height,
+        settings=settings or load_wind_resource_settings(ini_path),
+    )
+    direction = esolmet_df["wd"].to_numpy(dtype=float)
+    return {
+        float(h): sam_resource_inputs(
+            direction,
+            density_equivalent_speed(res["ws"][i], res["density"][i]),
+            height=h,
+        )
+        for i, h in enumerate(heights)
+    }
+
+
 def run_wind_simulation(  #ESTA SI 
     esolmet_df,
     turbine_name: str,
     ini_path: str = "configuration.ini",
     wind_turbine_file: str = "wind_simulation/wind-turbines.json",
     wind_inputs_file: str = "wind_simulation/windpower-inputs.json",
-    output_csv: str = "wind_simulation/sam_wind.csv",
+    resource_mode: str = "timeseries",
+    layout=None,
+    wake_model: int = 0,
+    job=None,
 ) -> dict:
     """
-    Crea el CSV TMY (vía make_sam_wind_csv), carga PySAM.Windpower,
-    fija los parámetros y ejecuta la simulación para la turbina `turbine_name`.
+    Toma el año típico (cached_sam_tmy), carga PySAM.Windpower, fija los
+    parámetros y ejecuta la simulación para la turbina `turbine_name`. El
+    recurso se pasa en memoria (wind_resource_data) desde los arreglos
+    NumPy: no se escribe ni se vuelve a leer ningún archivo, así que
+    sesiones simultáneas no comparten nada en disco.
+
+    El recurso se prepara ya a la altura del buje de la turbina (ley de
+    cortante de [wind_resource] y densidad del aire con tdb y p_atm), así
+    cualquier turbina del catálogo se simula aunque su buje quede lejos de
+    la altura del anemómetro.
+
+    Con resource_mode="distribution" el recurso es la
+    tabla velocidad × dirección de la estación (utils.weibull) y SAM corre en
+    su modo de distribución (mucho más rápido, pero sin serie horaria: "gen"
+    sale plano). Como ese modo supone densidad estándar, las velocidades se
+    pasan como equivalentes a 1.225 kg/m³.
+
+    Con `layout` = (x, y) (m) se simula un parque de len(x) turbinas con el
+    modelo de estela `wake_model` de SAM (ver utils.wind_farm); por omisión
+    una sola turbina en el origen.
+
+    `job` (utils.sim_jobs.SimulationJob) es para correr en segundo plano:
+    recibe el avance por etapa y PySAM corre en el pool de procesos.
     """
+    if resource_mode not in ("timeseries", "distribution"):
+        return {"error": f"Modo de recurso desconocido: '{resource_mode}'"}
 
     try:
-        csv_path = make_sam_wind_csv(
-            esolmet_df,
-            ini_path=ini_path,
-            output_csv=output_csv,
-        )
-    except Exception as e:
-        return {"error": f"Error al generar el CSV de viento: {e}"}
-
-    wind = wp.new()
-
-    try:
-        with open(wind_inputs_file, "r", encoding="utf-8") as f:
-            sam_data = json.load(f)
-    except FileNotFoundError:
-        return {"error": f"No se encontró el archivo '{wind_inputs_file}'"}
-
-    for key, val in sam_data.items():
-        if key != "wind_resource_filename":
-            wind.value(key, val)
+        catalog, sam_data = _load_catalog_and_inputs(ini_path, wind_turbine_file, wind_inputs_file)
+    except FileNotFoundError as e:
+        return {"error": f"No se encontró el archivo '{e.filename}'"}
+    except ValueError as e:
+        return {"error": f"Catálogo de turbinas inválido: {e}"}
 
-    wind.value("wind_resource_filename", str(csv_path))
-    wind.value("wind_resource_shear", 0.14)
-    wind.value("wind_farm_wake_model", 0)
+    if turbine_name not in catalog:
+        return {"error": f"No existe el modelo “{turbine_name}” en '{wind_turbine_file}'"}
+    selected_turbine = catalog[turbine_name]
+    hub_height = selected_turbine["hub_height"]
 
+    if job is not None:
+        job.report(0.1, "Preparando el recurso de viento")
     try:
-        with open(wind_turbine_file, "r", encoding="utf-8") as f:
-            turbine_list = json.load(f)
-    except FileNotFoundError:
-        return {"error": f"No se encontró el archivo '{wind_turbine_file}'"}
+        resource = _resource_inputs(esolmet_df, [hub_height], ini_path, resource_mode)[hub_height]
+    except Exception as e:
+        return {"error": f"Error al preparar el recurso de viento: {e}"}
 
-    selected_turbine = next((t for t in turbine_list if t["name"] == turbine_name), None)
-    if selected_turbine is None:
-        return {"error": f"No existe el modelo “{turbine_name}” en '{wind_turbine_file}'"}
+    overrides = {"wind_farm_wake_model": int(wake_model)}
+    if layout is not None:
+        x, y = layout
+        if len(x) == 0 or len(x) != len(y):
+            return {"error": "Las coordenadas del parque deben tener el mismo número de turbinas."}
+        overrides["wind_farm_xCoordinates"] = [float(v) for v in x]
+        overrides["wind_farm_yCoordinates"] = [float(v) for v in y]
 
-    wind.value("wind_farm_xCoordinates", [0])
-    wind.value("wind_farm_yCoordinates", [0])
-    wind.value("wind_turbine_rotor_diameter", selected_turbine["rotor_diameter"])
-    wind.value("wind_turbine_powercurve_windspeeds", selected_turbine["wind_speeds"])
-    wind.value("wind_turbine_powercurve_powerout", selected_turbine["turbine_powers"])
-    wind.value("wind_turbine_hub_ht", selected_turbine["hub_height"])
+    shear = load_wind_resource_settings(ini_path)["shear_exponent"]
+    task = (selected_turbine, sam_data, resource, shear, overrides)
+    if job is None:
+        return simulate_turbine(*task)
+    job.report(0.5, "Ejecutando PySAM")
+    return job.wait(submit_simulation(task))
 
-    farm_capacity = 1 * selected_turbine["rated_power"]
-    wind.value("system_capacity", farm_capacity)
 
+def compare_turbines(
+    esolmet_df,
+    turbine_names: list[str] | None = None,
+    ini_path: str = "configuration.ini",
+    wind_turbine_file: str = "wind_simulation/wind-turbines.json",
+    wind_inputs_file: str = "wind_simulation/windpower-inputs.json",
+    resource_mode: str = "timeseries",
+    max_workers: int | None = None,
+    job=None,
+) -> dict:
+    """
+    Simula todas las turbinas de `wind_turbine_file` (o sólo
+    `turbine_names`) contra el mismo recurso, en paralelo (una turbina por
+    proceso, ver utils.sam_windpower.simulate_many). Devuelve:
+      - "ranking": DataFrame ordenado por energía anual, con factor de
+        capacidad, pérdidas y rendimiento específico (kWh/kW)
+      - "monthly": DataFrame 12 × turbinas con la energía mensual (kWh)
+      - "errors": {turbina: mensaje} de las que no se pudieron simular
+    o {"error": ...} si no se pudo preparar la comparación.
+    `job` (utils.sim_jobs.SimulationJob) es para correr en segundo plano:
+    recibe el avance por turbina simulada y la comparación se puede cancelar.
+    """
+    if resource_mode not in ("timeseries", "distribution"):
+        return {"error": f"Modo de recurso desconocido: '{resource_mode}'"}
+    try:
+        catalog, sam_data = _load_catalog_and_inputs(ini_path, wind_turbine_file, wind_inputs_file)
+    except FileNotFoundError as e:
+        return {"error": f"No se encontró el archivo '{e.filename}'"}
+    except ValueError as e:
+        return {"error": f"Catálogo de turbinas inválido: {e}"}
+
+    names = catalog.names
+    if turbine_names:
+        wanted = set(turbine_names)
+        names = [n for n in names if n in wanted]
+    turbine_list = [catalog[n] for n in names]
+    if not turbine_list:
+        return {"error": "No hay turbinas para comparar."}
+
+    if job is not None:
+        job.report(0.05, "Preparando el recurso de viento")
     try:
-        wind.execute()
+        resources = _resource_inputs(
+            esolmet_df, [t["hub_height"] for t in turbine_list], ini_path, resource_mode
+        )
     except Exception as e:
-        msg = str(e)
-        if "closest wind speed measurement height" in msg:
-            return {
-                "error": "No podemos realizar la simulacion con esta turbina debido a las condiciones "
-                         "de medición de viento en este sitio."
-            }
-        return { "error": f"PySAM Windpower execution error: {msg}" }
-
+        return {"error": f"Error al preparar el recurso de viento: {e}"}
+
+    shear = load_wind_resource_settings(ini_path)["shear_exponent"]
+    tasks = [(t, sam_data, resources[float(t["hub_height"])], shear) for t in turbine_list]
+    results = simulate_many(
+        tasks,
+        max_workers=max_workers,
+        progress=None if job is None else job.reporter(0.2, 1.0, "Simulando turbinas con PySAM"),
+        background=job is not None,
+    )
 
-    annual_energy = getattr(wind.Outputs, "annual_energy", None)
-    capacity_factor = getattr(wind.Outputs, "capacity_factor", None)
-    wake_losses = getattr(wind.Outputs, "wake_losses", None)
-    turb_losses = getattr(wind.Outputs, "turb_losses", None)
-    monthly_energy = getattr(wind.Outputs, "monthly_energy", None)
-    gen_hourly = wind.Outputs.gen
+    rows, monthly, errors = [], {}, {}
+    for turbine, res in zip(turbine_list, results):
+        if "error" in res:
+            errors[turbine["name"]] = res["error"]
+            continue
+        ae = res["Energia Anual (kWh)"]
+        rows.append({
+            "Turbina": turbine["name"],
+            "Potencia nominal (kW)": turbine["rated_power"],
+            "Altura de buje (m)": turbine["hub_height"],
+            "Energía anual (kWh)": ae,
+            "Factor de capacidad (%)": res["Factor de Capacidad"],
+            "Pérdida por estela (kWh)": res["Perdida por estela (kWh)"],
+            "Pérdida por turbina (kWh)": res["Perdida por turbina (kWh)"],
+            "Rendimiento específico (kWh/kW)": ae / turbine["rated_power"],
+        })
+        monthly[turbine["name"]] = res["Monthly Energy"]
+
+    ranking = pd.DataFrame(rows)
+    if len(ranking):
+        ranking = ranking.sort_values("Energía anual (kWh)", ascending=False, ignore_index=True)
+        ranking.insert(0, "Lugar", np.arange(1, len(ranking) + 1))
+    monthly = pd.DataFrame(monthly, index=pd.Index(range(1, 13), name="Mes"))
+    return {"ranking": ranking, "monthly": monthly, "errors": errors}
+
+
+def create_turbine_comparison_figure(monthly: pd.DataFrame, ranking: pd.DataFrame | None = None):
+    """
+    Curvas mensuales superpuestas de compare_turbines. Con `ranking` cada
+    curva se normaliza por la potencia nominal (kWh/kW), para comparar
+    turbinas de tamaños muy distintos; sin él se grafican kWh.
+    """
+    meses = ["Ene", "Feb", "Mar", "Abr", "May", "Jun",
+             "Jul", "Ago", "Sep", "Oct", "Nov", "Dic"]
+    rated = {} if ranking is None else dict(zip(ranking["Turbina"], ranking["Potencia nominal (kW)"]))
+    units = "kWh/kW" if rated else "kWh"
+    order = list(ranking["Turbina"]) if ranking is not None else list(monthly.columns)
 
+    fig = go.Figure()
+    for name in order:
+        if name not in monthly:
+            continue
+        y = monthly[name].to_numpy(dtype=float)
+        if rated:
+            y = y / rated[name]
+        fig.add_trace(
+            go.Scatter(
+                x=meses,
+                y=y,
+                mode="lines+markers",
+                name=name,
+                hovertemplate=f"{name}<br>%{{x}}: %{{y:.1f}} {units}<extra></extra>",
+            )
+        )
+    fig.update_layout(
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        xaxis_title="Mes",
+        yaxis=dict(
+            title_text=f"Energía ({units})",
+            showgrid=True,
+            gridcolor="lightgrey",
+            zeroline=False
+        ),
+        legend=dict(orientation="h", y=-0.2),
+        margin=dict(t=40, b=40, l=40, r=20)
+    )
+    return compact_figure(fig)
 
-    if annual_energy is None or capacity_factor is None:
-        return {"error": "No se pudieron leer los resultados de PySAM."}
 
-    return {
-        "Energia Anual (kWh)": annual_energy,
-        "Factor de Capacidad": capacity_factor,
-        "Perdida por estela (kWh)": wake_losses,
-        "Perdida por turbina (kWh)": turb_losses,
-        "Monthly Energy":  monthly_energy,
-        "gen": gen_hourly,
- 
-    }
 def create_monthly_energy_figure(monthly_array): #esta si
     """
-    Dado un arreglo de 12 valores (energía mensual en kWh), construye
-    y devuelve un Plotly.Figure con gráfico de barras:
+    Dado un arreglo de 12 valores (energía mensual en kWh) o un
+    generation_summary, construye y devuelve un Plotly.Figure con gráfico
+    de barras:
       - Fondo blanco
       - Cuadrícula gris claro
       - Eje X: meses (Ene, Feb, …)
       - Eje Y: energía en kWh
     """
+    if isinstance(monthly_array, dict):
+        monthly_array = monthly_array["monthly"]
     if monthly_array is None or len(monthly_array) != 12:
         raise ValueError("El arreglo mensual debe tener exactamente 12 elementos.")
     
@@ -1012,30 +1331,71 @@ def create_monthly_energy_figure(monthly_array): #esta si
     )
     return fig
 
-def create_seasonal_generation_figures(gen_array): #ESTA SI 
+SEASON_MONTHS = {
+    "Primavera": [3, 4, 5],
+    "Verano":    [6, 7, 8],
+    "Otoño":     [9, 10, 11],
+    "Invierno":  [12, 1, 2],
+}
+
+
+def generation_summary(gen_array) -> dict:
     """
-    Dado gen_array (lista o array de 8760 valores horarios de generación),
-    construye un índice datetime para un año no bisiesto (2001) con frecuencia 'H', 
-    filtra los 3 meses de cada estación (Primavera: 3,4,5; Verano: 6,7,8; Otoño: 9,10,11; Invierno: 12,1,2),
-    y para cada estación agrupa por día del mes sumando las 24 h correspondientes para obtener
-    un “mes típico” de 28–31 días.
+    Post-proceso único de la generación horaria de PySAM (8760 valores de
+    un año no bisiesto, 2001, desde las 00:00): se hace un solo reshape a
+    (días, 24) y de esa matriz salen todos los agregados que usan las
+    gráficas de producción:
+      - "hourly": matriz (días, 24) en kWh (NaN si faltan horas al final)
+      - "dates": fecha de cada día
+      - "daily": energía por día
+      - "monthly": 12 energías mensuales
+      - "seasons": {estación: energía por día del mes (1..31) sumando los
+        3 meses de la estación, el “mes típico”}
     """
+    gen = np.asarray(gen_array, dtype=float)
+    n_days = -(-len(gen) // 24)
+    gen = np.pad(gen, (0, n_days * 24 - len(gen)), constant_values=np.nan)
+    hourly = gen.reshape(n_days, 24)
+    daily = np.nansum(hourly, axis=1)
+
+    dates = pd.date_range("2001-01-01", periods=n_days, freq="D")
+    month = dates.month.to_numpy()
+    day = dates.day.to_numpy()
+    monthly = np.bincount(month - 1, weights=daily, minlength=12)[:12]
+
+    seasons = {}
+    for season, meses in SEASON_MONTHS.items():
+        mask = np.isin(month, meses)
+        if not mask.any():
+            seasons[season] = np.empty(0)
+            continue
+        seasons[season] = np.bincount(day[mask] - 1, weights=daily[mask])
+    return {
+        "hourly": hourly,
+        "dates": dates,
+        "daily": daily,
+        "monthly": monthly,
+        "seasons": seasons,
+    }
 
-    index = pd.date_range("2001-01-01 00:00", periods=len(gen_array), freq="h")
-    df = pd.DataFrame({"gen": gen_array}, index=index)
 
-    season_months = {
-        "Primavera": [3, 4, 5],
-        "Verano":    [6, 7, 8],
-        "Otoño":     [9, 10, 11],
-        "Invierno":  [12, 1, 2],
-    }
+def _as_generation_summary(gen) -> dict:
+    """Acepta la serie horaria o un generation_summary ya calculado."""
+    return gen if isinstance(gen, dict) else generation_summary(gen)
 
-    figs = {}
-    for season, meses in season_months.items():
-        df_season = df[df.index.month.isin(meses)].copy()
 
-        if df_season.empty:
+def create_seasonal_generation_figures(gen): #ESTA SI 
+    """
+    Barras del “mes típico” de cada estación (Primavera: 3,4,5; Verano:
+    6,7,8; Otoño: 9,10,11; Invierno: 12,1,2): energía por día del mes
+    sumando las 24 h de los 3 meses. `gen` es la serie de 8760 valores
+    horarios o, mejor, su generation_summary ya calculado.
+    """
+    seasons = _as_generation_summary(gen)["seasons"]
+
+    figs = {}
+    for season, daily in seasons.items():
+        if len(daily) == 0:
             figs[season] = go.Figure().add_annotation(
                 text=f"No hay datos para {season}",
                 showarrow=False,
@@ -1044,28 +1404,11 @@ def create_seasonal_generation_figures(gen_array): #ESTA SI
             )
             continue
 
-        df_season["Día"]  = df_season.index.day
-        df_season["Hora"] = df_season.index.hour
-
-        daily_hourly = (
-            df_season
-            .groupby(["Día", "Hora"])["gen"]
-            .sum()
-            .reset_index()
-        )
-
-        daily = (
-            daily_hourly
-            .groupby("Día")["gen"]
-            .sum()
-            .reset_index(name="energy_kWh")
-        )
-
         fig = go.Figure(
                     data=[
                         go.Bar(
-                            x=daily["Día"].astype(int).astype(str),
-                            y=daily["energy_kWh"],
+                            x=[str(d) for d in range(1, len(daily) + 1)],
+                            y=daily,
                             name=season,
                             marker_color="steelblue",
                             hovertemplate="Día: %{x}<br>Energía: %{y:.0f} kWh<extra></extra>"
@@ -1089,38 +1432,30 @@ def create_seasonal_generation_figures(gen_array): #ESTA SI
             ),
             margin=dict(t=40, b=30, l=40, r=20),
         )
-        figs[season] = fig
+        figs[season] = compact_figure(fig)
 
     return figs
 
-def create_generation_heatmap(gen_array):
+def create_generation_heatmap(gen):
     """
-    Dado gen_array (lista o array de 8760 valores horarios de generación),
-    construye un índice datetime para un año no bisiesto (2001) con frecuencia 'H',
-    luego pinta un heatmap donde:
-      - eje x = cada día del año (formato "Ene 01", "Ene 02", ... "Dic 31")
+    Heatmap de la generación horaria (serie de 8760 valores o su
+    generation_summary) de un año no bisiesto (2001, desde las 00:00):
+      - eje x = cada día del año, como fecha (ticks con formato "Ene 01" ... "Dic 31")
       - eje y = horas del día (0 – 23)
 
     """
 
-    index = pd.date_range("2001-01-01 00:00", periods=len(gen_array), freq="h")
-
-    df = pd.DataFrame({"gen": gen_array}, index=index)
-
-    df["Date"] = df.index.date
-    df["Hour"] = df.index.hour
-
-    pivot = df.pivot(index="Hour", columns="Date", values="gen")
-
-    x_labels = [pd.to_datetime(d).strftime("%b %d") for d in pivot.columns]
-
-    y_vals = pivot.index.tolist()            # [0, 1, 2, ..., 23]
-    z_vals = pivot.values                    
+    # la matriz Hora × día es la de generation_summary transpuesta; el eje x
+    # lleva fechas numéricas y el formato "%b %d" lo pone el eje, no una
+    # cadena por día
+    summary = _as_generation_summary(gen)
+    z_vals = summary["hourly"].T
+    x_vals = date_ms(summary["dates"])
 
     fig = go.Figure(
         data=go.Heatmap(
-            x=x_labels,
-            y=y_vals,
+            x=x_vals,
+            y=np.arange(24),
             z=z_vals,
             colorscale="jet",
             colorbar=dict(
@@ -1133,15 +1468,17 @@ def create_generation_heatmap(gen_array):
                 yanchor="middle",     # centra el gradiente (opcional)
                 y=0.5                 #   "
             ),
-            hovertemplate="Día del año: %{x}<br>Hora: %{y}:00<br>Gen: %{z:.2f} kWh<extra></extra>",
+            hovertemplate="Día del año: %{x|%b %d}<br>Hora: %{y}:00<br>Gen: %{z:.2f} kWh<extra></extra>",
         )
     )
 
     fig.update_layout(
         xaxis=dict(
             title="Día",
-            tickmode="array",
-            tickvals=[x_labels[i] for i in range(0, len(x_labels), 20)],
+            type="date",
+            tickformat="%b %d",
+            tick0="2001-01-01",
+            dtick=20 * 86_400_000,    # una marca cada 20 días, como antes
             tickangle=0,
         ),
         yaxis=dict(
@@ -1153,7 +1490,7 @@ def create_generation_heatmap(gen_array):
         height=500,
     )
 
-    return fig
+    return compact_figure(fig)
     #Si en este heatmap quisiera que el itulo del cbar se mostrara del lado derecho y de manra vertical (acostado, 90grados) como deberia de cambiarlo?
 def _build_rose(#ESTA SI
     df: pd.DataFrame,
@@ -1173,60 +1510,14 @@ def _build_rose(#ESTA SI
 
     """
 
-    df2 = df.copy()
-
-    if not isinstance(df2.index, pd.DatetimeIndex):
-        df2.index = pd.to_datetime(df2.index)
-
-    if speed_bins is None:
-        max_speed = df2[speed_col].max()
-        upper = np.ceil(max_speed / 1.5) * 1.5
-        bins = np.arange(0, upper + 1e-6, 1.5)
-        speed_bins = list(bins)
-
-    speed_labels = []
-    for i in range(len(speed_bins) - 1):
-        low, high = speed_bins[i], speed_bins[i + 1]
-        if i < len(speed_bins) - 2:
-            speed_labels.append(f"{low:.1f}–{high:.1f}")
-        else:
-            speed_labels.append(f">{low:.1f}")
-
-    df2 = df2[[dir_col, speed_col]].dropna()
-
-    df2["Velocidad"] = pd.cut(
-        df2[speed_col],
-        bins=speed_bins,
-        labels=speed_labels,
-        right=False
-    )
-
-    deg_bins = np.linspace(0, 360, dir_bins + 1)
-    deg_labels = [(deg_bins[i] + deg_bins[i + 1]) / 2 for i in range(dir_bins)]
-    df2["Direccion"] = pd.cut(
-        df2[dir_col] % 360,
-        bins=deg_bins,
-        labels=deg_labels,
-        right=False
-    )
-
-    df_counts = df2.groupby(["Direccion", "Velocidad"]).size().reset_index(name="count")
-    total = df_counts["count"].sum()
-    df_counts["Frecuencia"] = df_counts["count"] / total * 100
-
-    fig = px.bar_polar(
-        df_counts,
-        r="Frecuencia",
-        theta="Direccion",
-        color="Velocidad",
+    return create_wind_rose_by_speed(
+        df,
+        dir_col=dir_col,
+        speed_col=speed_col,
+        dir_bins=dir_bins,
+        speed_bins=speed_bins,
         title=title,
-        template=None,
-        category_orders={"Velocidad": speed_labels}
     )
-    fig.update_traces(hovertemplate="Dirección: %{theta}°<br>Frecuencia: %{r:.1f}%")
-    fig.update_layout(legend_title_text="Velocidad (m/s)")
-
-    return fig
 
 
 
@@ -1244,14 +1535,7 @@ def create_wind_rose_by_speed_day(
     """
     Filtra por rango y genera la rosa de viento diurna (06:00–18:00).
     """
-    df2 = df.copy()
-    if not isinstance(df2.index, pd.DatetimeIndex):
-        df2.index = pd.to_datetime(df2.index)
-
-    if start:
-        df2 = df2.loc[pd.to_datetime(start) : ]
-    if end:
-        df2 = df2.loc[ : pd.to_datetime(end)]
+    df2 = as_window(df, start or None, end or None).frame(dir_col, speed_col)
 
     df_day = df2.between_time("06:00", "17:59")
 
@@ -1282,14 +1566,7 @@ def create_wind_rose_by_speed_night(
     """
     Filtra por rango y genera la rosa de viento nocturna (18:00–06:00).
     """
-    df2 = df.copy()
-    if not isinstance(df2.index, pd.DatetimeIndex):
-        df2.index = pd.to_datetime(df2.index)
-
-    if start:
-        df2 = df2.loc[pd.to_datetime(start) : ]
-    if end:
-        df2 = df2.loc[ : pd.to_datetime(end)]
+    df2 = as_window(df, start or None, end or None).frame(dir_col, speed_col)
 
     noche1 = df2.between_time("18:00", "23:59")
     noche2 = df2.between_time("00:00", "05:59")
@@ -1304,3 +1581,67 @@ def create_wind_rose_by_speed_night(
         speed_bins=speed_bins,
         title=title,
     )
+
+
+def create_wind_rose_by_speed_day_night(
+    df,
+    elevation,
+    dir_col="wd",
+    speed_col="ws",
+    *,
+    start: str | None = None,
+    end:   str | None = None,
+    dir_bins: int = 16,
+    speed_bins=None,
+    twilight_deg: float | None = None,
+):
+    """
+    Rosas de viento diurna y nocturna según la posición real del sol, en una
+    sola pasada: cada muestra se clasifica por su elevación solar (calculada
+    una vez con utils.solar.solar_elevation, alineada con el índice de `df`)
+    y entra como grupo en el mismo bincount.
+
+    - start/end: días inclusive; se ubican por búsqueda binaria en el índice
+      ordenado (DataWindow), sin copiar el DataFrame. `elevation` debe estar
+      alineada con el DataFrame base.
+    - twilight_deg: si se indica (p. ej. -6), agrega la rosa "Crepúsculo".
+    - speed_bins=None: límites cada 1.5 m/s hasta la velocidad máxima de
+      cada rosa, como create_wind_rose_by_speed.
+
+    Devuelve {"Día": fig, "Noche": fig[, "Crepúsculo": fig]} (None si una
+    clase no tiene datos).
+    """
+    win = as_window(
+        df,
+        pd.Timestamp(start).normalize() if start else None,
+        end or None,
+        whole_days=True,
+    )
+    direction = win.values(dir_col)
+    speed = win.values(speed_col)
+    codes = day_night_codes(np.asarray(elevation)[win.positions], twilight_deg)
+
+    n_groups = 2 if twilight_deg is None else 3
+    edges = speed_bins
+    if edges is None:
+        finite = speed[~np.isnan(direction) & ~np.isnan(speed)]
+        edges = default_speed_bins(finite) if finite.size else [0, 1.5]
+    counts = rose_histogram(direction, speed, dir_bins, edges, groups=codes, n_groups=n_groups)
+
+    figs = {}
+    for code in range(n_groups):
+        name = PERIOD_NAMES[code]
+        group_counts = counts[code]
+        used = np.flatnonzero(group_counts.sum(axis=0))
+        if used.size == 0:
+            figs[name] = None
+            continue
+        group_edges = edges
+        if speed_bins is None:
+            # recorta las clases vacías por arriba: la última visible es '>x'
+            group_edges = edges[:used[-1] + 2]
+            group_counts = group_counts[:, :used[-1] + 1]
+        figs[name] = _rose_figure_from_counts(
+            group_counts, group_edges, title=f"{name} ({start} — {end})"
+        )
+    return figs
@@ -0,0 +1,422 @@
+import csv
+import itertools
+import os
+import re
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from utils.config import load_gap_settings, load_wind_resource_settings, load_sweep_settings
+from utils.plot_payload import compact_figure
+from utils.sam_windpower import iter_simulations
+from utils.tmy_cache import cache_key, data_fingerprint
+from utils.wind_rose import _load_catalog_and_inputs, _resource_inputs
+
+# parámetros propios del barrido (el resto de las llaves de la malla se
+# pasan tal cual a PySAM, p. ej. "avail_turb_loss")
+SWEEP_PARAMETERS = {
+    "hub_height": "Altura de buje (m)",
+    "shear_exponent": "Exponente de cortante",
+    "loss_scale": "Factor de pérdidas",
+    "wake_model": "Modelo de estela",
+}
+SWEEP_METRICS = [
+    "Energía anual (kWh)",
+    "Factor de capacidad (%)",
+    "Pérdida por estela (kWh)",
+]
+
+
+def parse_grid_values(text: str) -> list[float]:
+    """'0.10, 0.14 0.2' -> [0.1, 0.14, 0.2]; lanza ValueError si algún valor no es número."""
+    values = []
+    for tok in re.split(r"[,;\s]+", str(text).strip()):
+        if not tok:
+            continue
+        try:
+            values.append(float(tok))
+        except ValueError:
+            raise ValueError(f"Valor no numérico en la malla: '{tok}'") from None
+    return values
+
+
+def sweep_combinations(grid: dict) -> list[dict]:
+    """Producto cartesiano de la malla {parámetro: [valores]} como lista de dicts."""
+    names = list(grid)
+    for name in names:
+        if len(grid[name]) == 0:
+            raise ValueError(f"El parámetro '{name}' no tiene valores.")
+    return [dict(zip(names, combo)) for combo in itertools.product(*(grid[n] for n in names))]
+
+
+def _combo_key(params: dict, names) -> tuple:
+    return tuple(round(float(params[n]), 9) for n in names)
+
+
+def _default_value(name: str, turbine: dict, sam_data: dict, settings: dict) -> float:
+    """Valor del parámetro en la simulación normal (sin barrido)."""
+    if name == "hub_height":
+        return float(turbine["hub_height"])
+    if name == "shear_exponent":
+        return float(settings["shear_exponent"])
+    if name == "loss_scale":
+        return 1.0
+    if name == "wake_model":
+        return 0.0
+    return float(sam_data.get(name, np.nan))
+
+
+def sweep_base(grid: dict, turbine: dict, sam_data: dict, settings: dict) -> dict:
+    """
+    Punto base del barrido (centro del tornado): por parámetro, el valor de
+    la malla más cercano al de la simulación normal; si ésta no lo define,
+    la mediana de la malla.
+    """
+    base = {}
+    for name, values in grid.items():
+        values = np.asarray(values, dtype=float)
+        default = _default_value(name, turbine, sam_data, settings)
+        if np.isnan(default):
+            base[name] = float(np.sort(values)[len(values) // 2])
+        else:
+            base[name] = float(values[np.argmin(np.abs(values - default))])
+    return base
+
+
+def _sweep_overrides(params: dict, sam_data: dict, layout) -> dict:
+    overrides = {k: v for k, v in params.items() if k not in SWEEP_PARAMETERS}
+    if "wake_model" in params:
+        overrides["wind_farm_wake_model"] = int(params["wake_model"])
+    if "loss_scale" in params:
+        for key, val in sam_data.items():
+            if key.endswith("_loss"):
+                overrides[key] = float(val) * float(params["loss_scale"])
+    if layout is not None:
+        x, y = layout
+        overrides["wind_farm_xCoordinates"] = [float(v) for v in x]
+        overrides["wind_farm_yCoordinates"] = [float(v) for v in y]
+    return overrides
+
+
+def sweep_store_path(
+    esolmet_df,
+    turbine: dict,
+    sam_data: dict,
+    names,
+    ini_path: str = "configuration.ini",
+    resource_mode: str = "timeseries",
+    layout=None,
+) -> Path | None:
+    """
+    Archivo de resultados parciales del barrido en [sweep] results_dir, o
+    None si no hay carpeta configurada. El nombre es un hash de los datos,
+    la turbina, los parámetros base y los nombres de la malla: un barrido
+    interrumpido con los mismos datos y configuración cae en el mismo
+    archivo, y agregar valores a la malla reaprovecha los ya simulados.
+    """
+    results_dir = load_sweep_settings(ini_path)["results_dir"]
+    if results_dir is None:
+        return None
+    key = cache_key(
+        data_fingerprint(esolmet_df, ["ws", "wd", "tdb", "p_atm"]),
+        {
+            "turbine": turbine,
+            "sam_data": sam_data,
+            "resource_mode": resource_mode,
+            "layout": layout,
+            "wind_resource": load_wind_resource_settings(ini_path),
+            "gap_filling": load_gap_settings(ini_path),
+            "parameters": list(names),
+        },
+    )
+    return Path(results_dir) / f"sweep_{key}.csv"
+
+
+def _read_store(path: Path | None, columns: list[str]) -> pd.DataFrame:
+    """Resultados guardados; se descartan filas incompletas (escritura interrumpida)."""
+    if path is None or not path.exists():
+        return pd.DataFrame(columns=columns)
+    try:
+        stored = pd.read_csv(path)
+    except (OSError, ValueError):
+        return pd.DataFrame(columns=columns)
+    if list(stored.columns) != columns:
+        return pd.DataFrame(columns=columns)
+    done = stored[SWEEP_METRICS[0]].notna() | stored["Error"].notna()
+    return stored[done].reset_index(drop=True)
+
+
+def _rewrite_store(path: Path, columns: list[str], stored: pd.DataFrame) -> None:
+    """
+    Reescribe el archivo sólo con las filas completas de `stored`, de forma
+    atómica (archivo temporal + os.replace): si el proceso muere a la
+    mitad, el archivo anterior queda intacto.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(stored[columns].itertuples(index=False))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def run_sweep(
+    esolmet_df,
+    turbine_name: str,
+    grid: dict,
+    ini_path: str = "configuration.ini",
+    wind_turbine_file: str = "wind_simulation/wind-turbines.json",
+    wind_inputs_file: str = "wind_simulation/windpower-inputs.json",
+    resource_mode: str = "timeseries",
+    layout=None,
+    max_workers: int | None = None,
+    resume: bool = True,
+    job=None,
+) -> dict:
+    """
+    Barrido de sensibilidad de una turbina: simula el producto cartesiano
+    de `grid` ({parámetro: [valores]}) en paralelo (utils.sam_windpower).
+    Parámetros reconocidos (SWEEP_PARAMETERS):
+      - hub_height: altura de buje (m)
+      - shear_exponent: exponente de la ley de potencia, para extrapolar el
+        recurso y para SAM
+      - loss_scale: multiplica todas las pérdidas (*_loss) de
+        windpower-inputs.json
+      - wake_model: wind_farm_wake_model de SAM (sólo cambia algo con
+        varias turbinas en `layout` = (x, y))
+    cualquier otra llave se pasa tal cual a PySAM.
+
+    El año típico se prepara una vez (cached_sam_tmy) y de él salen todas
+    las alturas de cada exponente. Cada resultado se agrega al archivo de
+    sweep_store_path en cuanto termina; con resume=True las combinaciones
+    ya guardadas no se vuelven a simular.
+
+    `job` (utils.sim_jobs.SimulationJob) es para correr en segundo plano:
+    recibe el avance tras cada combinación y, si se cancela, el barrido se
+    detiene ahí con lo ya simulado guardado (se reanuda con resume=True).
+
+    Devuelve {"results": DataFrame ordenado (una fila por combinación, con
+    las métricas de SWEEP_METRICS y "Error"), "base": punto base,
+    "simulated": combinaciones nuevas, "resumed": leídas del archivo}, o
+    {"error": ...}.
+    """
+    if resource_mode not in ("timeseries", "distribution"):
+        return {"error": f"Modo de recurso desconocido: '{resource_mode}'"}
+    if not grid:
+        return {"error": "La malla del barrido está vacía."}
+    try:
+        catalog, sam_data = _load_catalog_and_inputs(ini_path, wind_turbine_file, wind_inputs_file)
+        combos = sweep_combinations(grid)
+    except FileNotFoundError as e:
+        return {"error": f"No se encontró el archivo '{e.filename}'"}
+    except ValueError as e:
+        return {"error": str(e)}
+    if turbine_name not in catalog:
+        return {"error": f"No existe el modelo “{turbine_name}” en '{wind_turbine_file}'"}
+
+    turbine = catalog[turbine_name]
+    settings = load_wind_resource_settings(ini_path)
+    names = list(grid)
+    columns = ["Turbina"] + names + SWEEP_METRICS + ["Error"]
+    store = sweep_store_path(esolmet_df, turbine, sam_data, names, ini_path, resource_mode, layout)
+
+    stored = _read_store(store, columns) if resume else pd.DataFrame(columns=columns)
+    done = {_combo_key(row, names) for row in stored.to_dict("records")}
+    pending = [p for p in combos if _combo_key(p, names) not in done]
+
+    rows = []
+    if pending:
+        if job is not None:
+            job.report(0.05, "Preparando el recurso de viento")
+        # recurso compartido: por exponente, todas las alturas en un broadcast
+        try:
+            resources = {}
+            for shear in sorted({p.get("shear_exponent", settings["shear_exponent"]) for p in pending}):
+                shear_settings = dict(settings)
+                if "shear_exponent" in grid:
+                    shear_settings.update(shear_law="power", shear_exponent=float(shear))
+                heights = {p.get("hub_height", turbine["hub_height"]) for p in pending}
+                for h, res in _resource_inputs(
+                    esolmet_df, sorted(heights), ini_path, resource_mode, shear_settings
+                ).items():
+                    resources[(float(shear), h)] = res
+        except Exception as e:
+            return {"error": f"Error al preparar el recurso de viento: {e}"}
+
+        tasks = []
+        for p in pending:
+            shear = float(p.get("shear_exponent", settings["shear_exponent"]))
+            hub = float(p.get("hub_height", turbine["hub_height"]))
+            tasks.append((
+                {**turbine, "hub_height": hub},
+                sam_data,
+                resources[(shear, hub)],
+                shear,
+                _sweep_overrides(p, sam_data, layout),
+            ))
+
+        # se reescribe lo ya guardado (sin filas truncadas) y se agrega
+        # cada resultado nuevo en cuanto llega
+        f = None
+        if store is not None:
+            _rewrite_store(store, columns, stored)
+            f = open(store, "a", encoding="utf-8", newline="")
+            writer = csv.writer(f)
+        progress = None if job is None else job.reporter(0.1, 1.0, "Barrido con PySAM")
+        sims = iter_simulations(tasks, max_workers=max_workers, background=job is not None)
+        try:
+            for i, res in sims:
+                row = {"Turbina": turbine_name, **pending[i]}
+                if "error" in res:
+                    row.update({m: None for m in SWEEP_METRICS}, Error=res["error"])
+                else:
+                    row.update({
+                        "Energía anual (kWh)": res["Energia Anual (kWh)"],
+                        "Factor de capacidad (%)": res["Factor de Capacidad"],
+                        "Pérdida por estela (kWh)": res["Perdida por estela (kWh)"],
+                        "Error": None,
+                    })
+                rows.append(row)
+                if f is not None:
+                    writer.writerow([row[c] for c in columns])
+                    f.flush()
+                if progress is not None:
+                    progress(len(rows), len(tasks))
+        finally:
+            # al cancelar: se descartan las tareas pendientes del pool
+            sims.close()
+            if f is not None:
+                f.close()
+
+    parts = [df for df in (stored, pd.DataFrame(rows, columns=columns)) if len(df)]
+    results = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+    # sólo las combinaciones de esta malla (el archivo puede tener más)
+    wanted = {_combo_key(p, names) for p in combos}
+    keep = [_combo_key(r, names) in wanted for r in results.to_dict("records")]
+    results = results[keep].sort_values(names, ignore_index=True)
+    return {
+        "results": results,
+        "base": sweep_base(grid, turbine, sam_data, settings),
+        "simulated": len(rows),
+        "resumed": len(combos) - len(pending),
+    }
+
+
+def one_at_a_time(results: pd.DataFrame, base: dict, metric: str = "Energía anual (kWh)") -> dict:
+    """
+    Cortes del barrido alrededor de `base`: {parámetro: DataFrame [valor,
+    métrica]} variando sólo ese parámetro y dejando los demás en su valor
+    base.
+    """
+    ok = results[results[metric].notna()]
+    cuts = {}
+    for name in base:
+        mask = np.ones(len(ok), dtype=bool)
+        for other, value in base.items():
+            if other != name:
+                mask &= np.isclose(ok[other].to_numpy(dtype=float), value)
+        cut = ok.loc[mask, [name, metric]].astype(float).sort_values(name)
+        if len(cut) > 1:
+            cuts[name] = cut.reset_index(drop=True)
+    return cuts
+
+
+def _base_metric(results: pd.DataFrame, base: dict, metric: str) -> float | None:
+    mask = np.ones(len(results), dtype=bool)
+    for name, value in base.items():
+        mask &= np.isclose(results[name].to_numpy(dtype=float), value)
+    vals = results.loc[mask, metric].dropna()
+    return float(vals.iloc[0]) if len(vals) else None
+
+
+def create_sweep_tornado_figure(results: pd.DataFrame, base: dict, metric: str = "Energía anual (kWh)"):
+    """
+    Tornado: cambio (%) de `metric` respecto al punto base al llevar cada
+    parámetro a su mínimo y a su máximo de la malla; el parámetro más
+    influyente queda arriba.
+    """
+    ref = _base_metric(results, base, metric)
+    fig = go.Figure()
+    if not ref:
+        return fig
+    bars = []
+    for name, cut in one_at_a_time(results, base, metric).items():
+        lo, hi = cut.iloc[0], cut.iloc[-1]
+        bars.append((
+            SWEEP_PARAMETERS.get(name, name),
+            100 * (lo[metric] / ref - 1), lo[name],
+            100 * (hi[metric] / ref - 1), hi[name],
+        ))
+    bars.sort(key=lambda b: abs(b[3] - b[1]))
+    labels = [b[0] for b in bars]
+    for label, idx_delta, idx_value, color in (
+        ("Mínimo", 1, 2, "steelblue"),
+        ("Máximo", 3, 4, "darkorange"),
+    ):
+        fig.add_trace(go.Bar(
+            y=labels,
+            x=[b[idx_delta] for b in bars],
+            customdata=[b[idx_value] for b in bars],
+            orientation="h",
+            name=label,
+            marker_color=color,
+            hovertemplate="%{y} = %{customdata:.3g}<br>%{x:+.1f} %<extra></extra>",
+        ))
+    fig.update_layout(
+        barmode="overlay",
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        xaxis=dict(
+            title_text=f"Cambio en {metric} (%) respecto a {ref:,.0f}",
+            showgrid=True,
+            gridcolor="lightgrey",
+            zeroline=True,
+            zerolinecolor="black",
+        ),
+        legend=dict(orientation="h", y=-0.25),
+        margin=dict(t=40, b=40, l=40, r=20),
+    )
+    return compact_figure(fig)
+
+
+def create_sweep_sensitivity_figure(results: pd.DataFrame, base: dict, metric: str = "Energía anual (kWh)"):
+    """Un panel por parámetro: `metric` contra el valor del parámetro, con los demás en su valor base."""
+    cuts = one_at_a_time(results, base, metric)
+    fig = make_subplots(
+        rows=1,
+        cols=max(len(cuts), 1),
+        shared_yaxes=True,
+        subplot_titles=[SWEEP_PARAMETERS.get(n, n) for n in cuts],
+    )
+    for col, (name, cut) in enumerate(cuts.items(), start=1):
+        fig.add_trace(
+            go.Scatter(
+                x=cut[name],
+                y=cut[metric],
+                mode="lines+markers",
+                marker_color="steelblue",
+                showlegend=False,
+                hovertemplate=f"{name} = %{{x}}<br>%{{y:,.0f}}<extra></extra>",
+            ),
+            row=1,
+            col=col,
+        )
+        fig.add_vline(x=base[name], line_dash="dot", line_color="grey", row=1, col=col)
+    fig.update_yaxes(title_text=metric, row=1, col=1)
+    fig.update_yaxes(showgrid=True, gridcolor="lightgrey")
+    fig.update_layout(
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        margin=dict(t=40, b=40, l=40, r=20),
+    )
+    return compact_figure(fig)
@@ -0,0 +1,246 @@
+import calendar
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from utils.config import load_settings, load_gap_settings, load_wind_resource_settings, load_multi_year_settings
+from utils.gap_filling import fill_gaps
+from utils.plot_payload import compact_figure
+from utils.sam_windpower import simulate_many
+from utils.tmy_cache import cached_frame, cache_key, data_fingerprint
+from utils.wind_resource import sam_resource_data
+from utils.wind_rose import cached_sam_tmy, hub_height_tmys, _load_catalog_and_inputs
+
+HOURS = 8760
+_RESOURCE_COLS = ["wind_speed", "wind_direction", "temperature", "pressure"]
+# probabilidades de excedencia que se reportan
+EXCEEDANCE = (50, 75, 90)
+
+
+def build_sam_years(
+    esolmet: pd.DataFrame,
+    ini_path: str = "configuration.ini",
+) -> pd.DataFrame:
+    """
+    Un recurso de 8760 h por año calendario del registro (desde
+    [multi_year] first_year y con al menos min_coverage de horas medidas),
+    en formato largo: Year, Month, Day, Hour, wind_speed, wind_direction,
+    temperature (°C), pressure (Pa), coverage (fracción de horas con ws
+    medido en ese año).
+
+    Los huecos se rellenan como en build_sam_tmy ([gap_filling]); lo que
+    quede sin dato (huecos mayores a max_gap_hours) toma el valor del año
+    típico a la misma hora. Todos los años salen de un solo reindexado a
+    la malla (años × 8760) sin 29 de febrero.
+    """
+    settings = load_multi_year_settings(ini_path)
+    gaps = load_gap_settings(ini_path)
+
+    df2 = esolmet[["ws", "wd", "tdb", "p_atm"]].apply(pd.to_numeric, errors="coerce")
+    hourly = df2.resample("1h").mean()
+    measured = hourly["ws"].notna()
+    hourly, _ = fill_gaps(
+        hourly,
+        interp_max_hours=gaps["interp_max_hours"],
+        max_gap_hours=gaps["max_gap_hours"],
+        circular_cols=gaps["circular"],
+    )
+
+    counts = measured.groupby(measured.index.year).sum()
+    coverage = counts / (24 * np.where([calendar.isleap(y) for y in counts.index], 366, 365))
+    years = coverage.index[
+        (coverage.index >= settings["first_year"]) & (coverage >= settings["min_coverage"])
+    ].to_numpy()
+    if len(years) == 0:
+        raise ValueError(
+            f"Ningún año desde {settings['first_year']} tiene al menos "
+            f"{settings['min_coverage']:.0%} de horas con velocidad medida."
+        )
+
+    grid = pd.date_range(f"{years.min()}-01-01", f"{years.max()}-12-31 23:00", freq="h")
+    grid = grid[~((grid.month == 2) & (grid.day == 29)) & grid.year.isin(years)]
+    values = hourly.reindex(grid).to_numpy(dtype=float, copy=True).reshape(len(years), HOURS, 4)
+    values[..., 3] *= 100  # hPa → Pa
+
+    tmy = cached_sam_tmy(esolmet, ini_path)[_RESOURCE_COLS].to_numpy(dtype=float)
+    values = np.where(np.isnan(values), tmy[None, :, :], values)
+
+    out = pd.DataFrame(values.reshape(-1, 4), columns=_RESOURCE_COLS)
+    out.insert(0, "Year", grid.year)
+    out.insert(1, "Month", grid.month)
+    out.insert(2, "Day", grid.day)
+    out.insert(3, "Hour", grid.hour)
+    out["coverage"] = np.repeat(coverage.loc[years].to_numpy(dtype=float), HOURS)
+    return out
+
+
+def cached_sam_years(
+    esolmet: pd.DataFrame,
+    ini_path: str = "configuration.ini",
+) -> pd.DataFrame:
+    """build_sam_years memoizado igual que cached_sam_tmy (memoria y disco)."""
+    key = cache_key(
+        data_fingerprint(esolmet, ["ws", "wd", "tdb", "p_atm"]),
+        {
+            "years": load_multi_year_settings(ini_path),
+            "gap_filling": load_gap_settings(ini_path),
+        },
+    )
+    return cached_frame(
+        key,
+        lambda: build_sam_years(esolmet, ini_path),
+        cache_dir=load_wind_resource_settings(ini_path)["cache_dir"],
+    )
+
+
+def exceedance_levels(annual_energy, levels=EXCEEDANCE) -> dict:
+    """
+    Energía con probabilidad de excedencia P50/P75/P90: con la
+    variabilidad interanual supuesta normal, Pxx = media − z(xx)·σ (σ con
+    n − 1). Con un solo año sólo hay P50.
+    """
+    e = np.asarray(annual_energy, dtype=float)
+    mean = float(e.mean())
+    std = float(e.std(ddof=1)) if len(e) > 1 else float("nan")
+    out = {
+        "Años": len(e),
+        "Media (kWh)": mean,
+        "Desviación estándar (kWh)": std,
+        "Coeficiente de variación (%)": 100 * std / mean if mean else float("nan"),
+    }
+    for p in levels:
+        out[f"P{p} (kWh)"] = mean - NormalDist().inv_cdf(p / 100) * std if p != 50 else mean
+    return out
+
+
+def run_multi_year_simulation(
+    esolmet_df,
+    turbine_name: str,
+    ini_path: str = "configuration.ini",
+    wind_turbine_file: str = "wind_simulation/wind-turbines.json",
+    wind_inputs_file: str = "wind_simulation/windpower-inputs.json",
+    max_workers: int | None = None,
+    job=None,
+) -> dict:
+    """
+    Simula `turbine_name` con cada año del registro por separado (un
+    proceso por año, utils.sam_windpower.simulate_many), en lugar del año
+    típico promedio que suaviza la variabilidad. Devuelve:
+      - "years": DataFrame por año con cobertura, energía anual y factor
+        de capacidad
+      - "summary": exceedance_levels de la energía anual (P50/P75/P90)
+      - "monthly": DataFrame 12 × años con la energía mensual (kWh)
+      - "errors": {año: mensaje}
+    o {"error": ...}.
+
+    `job` (utils.sim_jobs.SimulationJob) es para correr en segundo plano:
+    recibe el avance (recurso y cada año simulado) y lo puede cancelar.
+    """
+    try:
+        catalog, sam_data = _load_catalog_and_inputs(ini_path, wind_turbine_file, wind_inputs_file)
+    except FileNotFoundError as e:
+        return {"error": f"No se encontró el archivo '{e.filename}'"}
+    except ValueError as e:
+        return {"error": f"Catálogo de turbinas inválido: {e}"}
+    if turbine_name not in catalog:
+        return {"error": f"No existe el modelo “{turbine_name}” en '{wind_turbine_file}'"}
+    turbine = catalog[turbine_name]
+    hub = turbine["hub_height"]
+
+    if job is not None:
+        job.report(0.05, "Preparando el recurso de cada año")
+    try:
+        record = cached_sam_years(esolmet_df, ini_path)
+        at_hub = hub_height_tmys(record, [hub], ini_path)[hub]
+    except Exception as e:
+        return {"error": f"Error al preparar el recurso de viento: {e}"}
+
+    _, latitude, longitude, *_ = load_settings(ini_path)
+    years = record["Year"].to_numpy()[::HOURS]
+    coverage = record["coverage"].to_numpy()[::HOURS]
+    values = at_hub[_RESOURCE_COLS].to_numpy(dtype=float).reshape(len(years), HOURS, 4)
+    shear = load_wind_resource_settings(ini_path)["shear_exponent"]
+    tasks = [
+        (
+            turbine,
+            sam_data,
+            {
+                "wind_resource_model_choice": 0,
+                "wind_resource_data": sam_resource_data(
+                    v[:, 0], v[:, 1], v[:, 2], v[:, 3],
+                    height=hub, latitude=latitude, longitude=longitude,
+                ),
+            },
+            shear,
+        )
+        for v in values
+    ]
+    results = simulate_many(
+        tasks,
+        max_workers=max_workers,
+        progress=None if job is None else job.reporter(0.3, 1.0, "Simulando años con PySAM"),
+        background=job is not None,
+    )
+
+    rows, monthly, errors = [], {}, {}
+    for year, cov, res in zip(years, coverage, results):
+        if "error" in res:
+            errors[int(year)] = res["error"]
+            continue
+        rows.append({
+            "Año": int(year),
+            "Cobertura (%)": 100 * cov,
+            "Energía anual (kWh)": res["Energia Anual (kWh)"],
+            "Factor de capacidad (%)": res["Factor de Capacidad"],
+        })
+        monthly[int(year)] = res["Monthly Energy"]
+
+    if not rows:
+        return {"error": "No se pudo simular ningún año.", "errors": errors}
+    table = pd.DataFrame(rows)
+    return {
+        "years": table,
+        "summary": exceedance_levels(table["Energía anual (kWh)"]),
+        "monthly": pd.DataFrame(monthly, index=pd.Index(range(1, 13), name="Mes")),
+        "errors": errors,
+    }
+
+
+def create_annual_energy_figure(years: pd.DataFrame, summary: dict):
+    """Barras de energía anual por año con líneas horizontales en P50/P75/P90."""
+    fig = go.Figure(
+        go.Bar(
+            x=years["Año"].astype(str),
+            y=years["Energía anual (kWh)"],
+            customdata=years["Cobertura (%)"],
+            marker_color="steelblue",
+            hovertemplate="%{x}: %{y:,.0f} kWh<br>cobertura %{customdata:.0f} %<extra></extra>",
+            showlegend=False,
+        )
+    )
+    for p, dash in zip(EXCEEDANCE, ("solid", "dash", "dot")):
+        value = summary.get(f"P{p} (kWh)")
+        if value is None or np.isnan(value):
+            continue
+        fig.add_hline(
+            y=value,
+            line_dash=dash,
+            line_color="darkorange",
+            annotation_text=f"P{p}: {value:,.0f} kWh",
+            annotation_position="top left",
+        )
+    fig.update_layout(
+        plot_bgcolor="white",
+        paper_bgcolor="white",
+        xaxis_title="Año",
+        yaxis=dict(
+            title_text="Energía anual (kWh)",
+            showgrid=True,
+            gridcolor="lightgrey",
+            zeroline=False,
+        ),
+        margin=dict(t=40, b=40, l=40, r=20),
+    )
+    return compact_figure(fig)